@@ -43,41 +43,143 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // --- 4. 处理学生答案提交的逻辑 ---
-    answerForm.addEventListener('submit', function(event) {
-        event.preventDefault();
-        const studentAnswer = studentAnswerTextarea.value;
-        const studentId = studentIdInput.value;
-        if (!studentAnswer.trim()) return;
+    function showFeedbackResult(data) {
+        loader.style.display = 'none';
+        feedbackResult.innerText = data.feedback;
+        feedbackContainer.style.display = 'block';
+        if (data.response_id) {
+            currentResponseId = data.response_id;
+            ratingForm.style.display = 'block';
+            ratingThanks.style.display = 'none';
+            ratingContainer.style.display = 'block';
+        }
+    }
 
-        loader.style.display = 'block';
-        feedbackContainer.style.display = 'none';
+    function showFeedbackError(message) {
+        loader.style.display = 'none';
+        feedbackResult.innerText = message;
+        feedbackContainer.style.display = 'block';
         ratingContainer.style.display = 'none';
+    }
 
+    // 非流式评估（浏览器不支持流式读取时使用）
+    function evaluateWithoutStreaming(payload) {
        const apiUrl = 'https://ai-stats-book.onrender.com/api/evaluate';
 
-        fetch(apiUrl, {
+        return fetch(apiUrl, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                answer: studentAnswer,
-                student_id: studentId,
-                prompt_id: promptId
-            })
+            body: JSON.stringify(payload)
         })
         .then(response => response.json())
-        .then(data => {
-            loader.style.display = 'none';
-            feedbackResult.innerText = data.feedback;
-            feedbackContainer.style.display = 'block';
-            if (data.response_id) {
-                currentResponseId = data.response_id;
-                ratingForm.style.display = 'block';
-                ratingThanks.style.display = 'none';
-                ratingContainer.style.display = 'block';
-            }
+        .then(data => data.job_id && data.feedback === undefined ? pollEvaluation(data.job_id) : data)
+        .then(showFeedbackResult);
+    }
+
+    // 流式评估: 通过 SSE 逐段显示反馈，不必等整段反馈生成完。
+    // 抛出的错误带有 receivedBytes，调用者据此判断能否改用非流式评估重新提交
+    async function evaluateWithStreaming(payload) {
+        const streamUrl = 'https://ai-stats-book.onrender.com/api/evaluate-stream';
+        const response = await fetch(streamUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
         });
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            const error = new Error(data.error || `Request failed (${response.status}).`);
+            error.receivedBytes = true;
+            throw error;
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let receivedBytes = false;
+        let finished = false;
+        feedbackResult.innerText = '';
+
+        try {
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                receivedBytes = receivedBytes || value.length > 0;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                events.forEach(block => {
+                    const eventLine = block.split('\n').find(line => line.startsWith('event: '));
+                    const dataLine = block.split('\n').find(line => line.startsWith('data: '));
+                    if (!eventLine || !dataLine) return;
+                    const data = JSON.parse(dataLine.slice(6));
+                    if (eventLine.slice(7) === 'token') {
+                        loader.style.display = 'none';
+                        feedbackContainer.style.display = 'block';
+                        feedbackResult.innerText += data.text;
+                    } else if (eventLine.slice(7) === 'done') {
+                        finished = true;
+                        showFeedbackResult(data);
+                    } else if (eventLine.slice(7) === 'error') {
+                        finished = true;
+                        showFeedbackError(`Sorry, an error occurred while getting feedback: ${data.error}`);
+                    }
+                });
+            }
+        } catch (error) {
+            error.receivedBytes = receivedBytes;
+            throw error;
+        }
+        if (!finished) {
+            const error = new Error('The connection was interrupted before the feedback was complete.');
+            error.receivedBytes = receivedBytes;
+            throw error;
+        }
+    }
+
+    answerForm.addEventListener('submit', function(event) {
+        event.preventDefault();
+        const studentAnswer = studentAnswerTextarea.value;
+        const studentId = studentIdInput.value;
+        if (!studentAnswer.trim()) return;
+
+        loader.style.display = 'block';
+        feedbackContainer.style.display = 'none';
+        ratingContainer.style.display = 'none';
+
+        const payload = {
+            answer: studentAnswer,
+            student_id: studentId,
+            prompt_id: promptId
+        };
+        const supportsStreaming = window.ReadableStream && window.TextDecoder;
+        if (supportsStreaming) {
+            // 服务器已开始返回数据时，回答可能已经保存，不再重新提交，直接提示错误
+            evaluateWithStreaming(payload).catch(error => {
+                if (error.receivedBytes) {
+                    showFeedbackError(`Sorry, an error occurred while getting feedback: ${error.message}`);
+                } else {
+                    evaluateWithoutStreaming(payload)
+                        .catch(() => showFeedbackError('Sorry, an error occurred while getting feedback.'));
+                }
+            });
+        } else {
+            evaluateWithoutStreaming(payload);
+        }
     });
 
+    // 异步评估模式下，轮询任务状态直到反馈生成完成
+    function pollEvaluation(jobId, delayMs = 1000) {
+        const statusUrl = `https://ai-stats-book.onrender.com/api/evaluation-status/${encodeURIComponent(jobId)}`;
+        return new Promise(resolve => setTimeout(resolve, delayMs))
+            .then(() => fetch(statusUrl))
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === 'pending' || data.status === 'processing') {
+                    return pollEvaluation(jobId, Math.min(delayMs * 1.5, 5000));
+                }
+                return data;
+            });
+    }
+
     // --- 5. 处理评分提交的逻辑 ---
     ratingForm.addEventListener('submit', function(event) {
         event.preventDefault();
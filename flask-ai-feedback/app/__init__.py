@@ -3,9 +3,6 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_cors import CORS
-from authlib.integrations.flask_client import OAuth
-import cloudinary
-import google.generativeai as genai
 from flask_migrate import Migrate
 
 from config import Config
@@ -13,7 +10,6 @@ from config import Config
 # 初始化插件
 db = SQLAlchemy()
 login_manager = LoginManager()
-oauth = OAuth()
 cors = CORS()
 migrate = Migrate()
 
@@ -32,36 +28,20 @@ def create_app(config_class=Config):
     migrate.init_app(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
-    oauth.init_app(app)
     cors.init_app(app)
 
     # --- 配置第三方服务 ---
-    oauth.register(
-        name='google',
-        client_id=app.config['GOOGLE_CLIENT_ID'],
-        client_secret=app.config['GOOGLE_CLIENT_SECRET'],
-        access_token_url='https://accounts.google.com/o/oauth2/token',
-        access_token_params=None,
-        authorize_url='https://accounts.google.com/o/oauth2/auth',
-        authorize_params=None,
-        api_base_url='https://www.googleapis.com/oauth2/v1/',
-        userinfo_endpoint='https://openidconnect.googleapis.com/v1/userinfo',
-        client_kwargs={'scope': 'openid email profile'},
-        jwks_uri="https://www.googleapis.com/oauth2/v3/certs",
-    )
+    # Gemini、Cloudinary 和 Google OAuth 的 SDK 导入很慢，只记录配置，第一次使用时再初始化（见 clients.py）
+    from . import clients
+    clients.init_app(app)
 
-    # --- ↓↓↓ 这是修复的部分 ↓↓↓ ---
-    # 确保使用关键字参数来调用 config 函数
-    cloudinary.config(
-        cloud_name=app.config["CLOUDINARY_CLOUD_NAME"],
-        api_key=app.config["CLOUDINARY_API_KEY"],
-        api_secret=app.config["CLOUDINARY_API_SECRET"]
-    )
-    
-    try:
-        genai.configure(api_key=app.config['GEMINI_API_KEY'])
-    except Exception as e:
-        print(f"Gemini API configuration failed: {e}")
+    from . import cache, question_cache, ai_detection, rate_limiter, metrics, services
+    services.init_app(app)
+    cache.init_app(app)
+    question_cache.init_app(app)
+    ai_detection.init_app(app)
+    rate_limiter.init_app(app)
+    metrics.init_app(app)
 
     # --- 注册蓝图 ---
     from .blueprints.auth_views import auth_bp
@@ -70,6 +50,19 @@ def create_app(config_class=Config):
     app.register_blueprint(auth_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
 
+    # --- 注册命令行工具 ---
+    from .cli import register_commands
+    register_commands(app)
+
+    # --- 可选: 启动后在后台提前初始化第三方 SDK ---
+    if app.config.get('WARMUP_ON_START'):
+        clients.start_warm_up(app)
+
+    # --- 在后台恢复崩溃遗留的异步任务（JOBS_EAGER 时任务都在当前线程内完成，不需要） ---
+    if not app.config.get('JOBS_EAGER'):
+        from . import jobs
+        jobs.start_recovery_sweep(app)
+
     print(f"--- DATABASE URI IN USE: {app.config['SQLALCHEMY_DATABASE_URI']} ---")
 
     return app
@@ -0,0 +1,264 @@
+"""
+AI 生成答案的本地预筛选（只用 CPU，不调用模型）
+
+特征:
+- 文体特征: 词数、平均词长、句长变化（burstiness）、口语化标记、典型 AI 写作标记（套话、Markdown）
+- 压缩率: zlib 压缩后长度 / 原长度
+- 字符 trigram 困惑度: 相对于同一题目下学生答案语料的比值
+
+特征按权重合成 0~1 的分数；低于 human 阈值判为人写，高于 ai 阈值判为 AI，
+介于两者之间的交给模型判断。过短的答案直接判为人写。
+score_many 一次处理一批答案，供离线重新评分整个 responses 表使用。
+
+权重和阈值是手工设定的，还没有用真实数据校准，所以预筛选默认关闭（AI_DETECTION_PREFILTER=false）。
+开启前先校准:
+1. 在关闭预筛选的情况下运行一段时间，让 responses 表积累由模型给出的标签
+2. 运行 `flask rescore-ai-detection`（只读），查看本地判断与已保存标签的一致率和可跳过的比例
+3. 一致率不够高时，收紧 AI_DETECTION_HUMAN_THRESHOLD / AI_DETECTION_AI_THRESHOLD
+   （或调整 AI_DETECTION_MIN_WORDS、WEIGHTS、BIAS）后重新运行；结果满意后再开启预筛选
+"""
+import math
+import re
+import statistics
+import threading
+import time
+import zlib
+from collections import Counter
+from flask import current_app
+from . import db
+from .models import Response
+
+HUMAN = 'human'
+AI = 'ai'
+
+FEATURE_NAMES = ['words', 'avg_word_length', 'burstiness', 'informal_markers', 'ai_markers',
+                 'compression_ratio', 'perplexity_ratio']
+# 手工设定的权重（正数表示更像 AI）；bias 使普通长度的学生答案落在 0.2 左右
+WEIGHTS = {
+    'words': 0.012,
+    'avg_word_length': 0.9,
+    'burstiness': -1.5,
+    'informal_markers': -0.8,
+    'ai_markers': 2.0,
+    'compression_ratio': -2.0,
+    'perplexity_ratio': 0.8,
+}
+BIAS = -4.2
+
+_WORD_RE = re.compile(r"[A-Za-z']+")
+_SENTENCE_RE = re.compile(r'[^.!?\n]+')
+_INFORMAL_RE = re.compile(r"\b(i|idk|lol|kinda|gonna|wanna|dunno|ok|yeah)\b|\b\w+n't\b|\?\?|!!|\.\.\.")
+_AI_MARKER_RE = re.compile(
+    r"in conclusion|furthermore|moreover|additionally|overall,|it is important to note|it's important to note"
+    r"|this highlights|in summary|plays a crucial role|^\s*[-*•]\s|\*\*|^#+\s|—",
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+class CharNgramModel:
+    """带加一平滑的字符 n-gram 语言模型"""
+
+    def __init__(self, texts, n=3):
+        self.n = n
+        self.counts = Counter()
+        self.context_counts = Counter()
+        vocab = set()
+        for text in texts:
+            padded = self._pad(text)
+            vocab.update(padded)
+            for i in range(len(padded) - n + 1):
+                gram = padded[i:i + n]
+                self.counts[gram] += 1
+                self.context_counts[gram[:-1]] += 1
+        self.vocab_size = len(vocab) + 1
+        self._neg_log_p = {}
+        perplexities = [self.perplexity(t) for t in texts]
+        self.median_perplexity = statistics.median(perplexities) if perplexities else None
+
+    def _pad(self, text):
+        return ' ' * (self.n - 1) + text.lower()
+
+    def perplexity(self, text):
+        padded = self._pad(text)
+        cache = self._neg_log_p
+        total, count = 0.0, len(padded) - self.n + 1
+        for i in range(count):
+            gram = padded[i:i + self.n]
+            value = cache.get(gram)
+            if value is None:
+                # 同一个 n-gram 的概率只计算一次
+                value = cache[gram] = -math.log(
+                    (self.counts[gram] + 1) / (self.context_counts[gram[:-1]] + self.vocab_size))
+            total += value
+        return math.exp(total / count) if count > 0 else 0.0
+
+
+def extract_features(text, corpus_model=None):
+    """返回与 FEATURE_NAMES 对应的特征列表"""
+    words = _WORD_RE.findall(text)
+    sentence_lengths = [len(_WORD_RE.findall(s)) for s in _SENTENCE_RE.findall(text)]
+    sentence_lengths = [n for n in sentence_lengths if n]
+    # 句长的变异系数；statistics.pstdev 在批量评分时太慢，直接计算
+    if len(sentence_lengths) > 1:
+        mean = sum(sentence_lengths) / len(sentence_lengths)
+        variance = sum((n - mean) ** 2 for n in sentence_lengths) / len(sentence_lengths)
+        burstiness = math.sqrt(variance) / mean
+    else:
+        burstiness = 0.5
+    encoded = text.encode('utf-8')
+    compression_ratio = len(zlib.compress(encoded)) / len(encoded) if encoded else 1.0
+
+    perplexity_ratio = 0.0
+    if corpus_model is not None and corpus_model.median_perplexity:
+        perplexity_ratio = math.log(corpus_model.perplexity(text) / corpus_model.median_perplexity)
+
+    return [
+        len(words),
+        sum(len(w) for w in words) / len(words) - 4.7 if words else 0.0,
+        burstiness,
+        min(len(_INFORMAL_RE.findall(text.lower())), 3),
+        min(len(_AI_MARKER_RE.findall(text)), 4),
+        compression_ratio,
+        perplexity_ratio,
+    ]
+
+
+def score_many(texts, corpus_model=None):
+    """批量计算分数（0~1，越大越像 AI）"""
+    if not texts:
+        return []
+    # 按列（特征）计算加权和
+    columns = zip(*[extract_features(text, corpus_model) for text in texts])
+    logits = [BIAS] * len(texts)
+    for name, column in zip(FEATURE_NAMES, columns):
+        weight = WEIGHTS[name]
+        logits = [z + weight * value for z, value in zip(logits, column)]
+    return [1 / (1 + math.exp(-z)) for z in logits]
+
+
+def decide(text, score, config):
+    """根据分数给出本地判断；无法确定时返回 None"""
+    if len(_WORD_RE.findall(text)) < config.get('AI_DETECTION_MIN_WORDS', 12):
+        return HUMAN
+    if score <= config.get('AI_DETECTION_HUMAN_THRESHOLD', 0.15):
+        return HUMAN
+    if score >= config.get('AI_DETECTION_AI_THRESHOLD', 0.9):
+        return AI
+    return None
+
+
+def build_corpus_model(prompt_id, limit):
+    """用该题目最近的、被判为人写的答案训练 n-gram 模型；语料太少时返回 None"""
+    rows = db.session.query(Response.student_answer) \
+        .filter(Response.question == prompt_id, Response.is_ai_generated == False) \
+        .order_by(Response.id.desc()).limit(limit).all()
+    texts = [r.student_answer for r in rows if r.student_answer]
+    return CharNgramModel(texts) if len(texts) >= 20 else None
+
+
+class Detector:
+    """保存每道题的语料模型（定期重建）和预筛选统计"""
+
+    def __init__(self, corpus_size=500, corpus_ttl=600):
+        self.corpus_size = corpus_size
+        self.corpus_ttl = corpus_ttl
+        self._models = {}
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def corpus_model(self, prompt_id):
+        with self._lock:
+            entry = self._models.get(prompt_id)
+        if entry and time.monotonic() - entry[0] < self.corpus_ttl:
+            return entry[1]
+        model = build_corpus_model(prompt_id, self.corpus_size)
+        with self._lock:
+            self._models[prompt_id] = (time.monotonic(), model)
+        return model
+
+    def prefilter(self, prompt_id, text):
+        """返回 True/False（本地已确定）或 None（需要调用模型）"""
+        config = current_app.config
+        text = text or ''
+        score = score_many([text], self.corpus_model(prompt_id))[0]
+        decision = decide(text, score, config)
+        with self._lock:
+            self.counts[decision or 'escalated'] += 1
+        if decision is None:
+            return None
+        return decision == AI
+
+    def stats(self):
+        with self._lock:
+            local_human, local_ai, escalated = self.counts[HUMAN], self.counts[AI], self.counts['escalated']
+        total = local_human + local_ai + escalated
+        return {
+            'local_human': local_human,
+            'local_ai': local_ai,
+            'escalated': escalated,
+            'skip_rate': round((local_human + local_ai) / total, 4) if total else 0.0
+        }
+
+
+def init_app(app):
+    """AI_DETECTION_PREFILTER 为 False 时不创建检测器，所有答案都交给模型"""
+    if app.config.get('AI_DETECTION_PREFILTER', False):
+        app.extensions['ai_detector'] = Detector(
+            corpus_size=app.config.get('AI_DETECTION_CORPUS_SIZE', 500),
+            corpus_ttl=app.config.get('AI_DETECTION_CORPUS_TTL', 600),
+        )
+    else:
+        app.extensions['ai_detector'] = None
+
+
+def get_detector():
+    return current_app.extensions.get('ai_detector')
+
+
+def rescore_responses(prompt_id=None, batch_size=1000):
+    """
+    用本地预筛选重新评估 responses 表（不修改数据），返回报告:
+    各判断的数量、跳过模型调用的比例，以及本地判断与已保存标签的一致率。
+    """
+    config = current_app.config
+    started = time.monotonic()
+    query = db.session.query(Response.id, Response.question, Response.student_answer, Response.is_ai_generated)
+    if prompt_id:
+        query = query.filter(Response.question == prompt_id)
+    counts, agree, decided = Counter(), 0, 0
+    models = {}
+
+    def flush(current_prompt, rows):
+        nonlocal agree, decided
+        if current_prompt not in models:
+            models[current_prompt] = build_corpus_model(current_prompt, config.get('AI_DETECTION_CORPUS_SIZE', 500))
+        model = models[current_prompt]
+        texts = [r.student_answer or '' for r in rows]
+        for row, text, score in zip(rows, texts, score_many(texts, model)):
+            decision = decide(text, score, config)
+            counts[decision or 'escalated'] += 1
+            if decision is not None and row.is_ai_generated is not None:
+                decided += 1
+                agree += (decision == AI) == bool(row.is_ai_generated)
+
+    current_prompt, rows = None, []
+    streamed = query.order_by(Response.question, Response.id).execution_options(yield_per=batch_size)
+    for row in streamed:
+        if row.question != current_prompt or len(rows) >= batch_size:
+            if rows:
+                flush(current_prompt, rows)
+            current_prompt, rows = row.question, []
+        rows.append(row)
+    if rows:
+        flush(current_prompt, rows)
+
+    total = sum(counts.values())
+    return {
+        'total': total,
+        'local_human': counts[HUMAN],
+        'local_ai': counts[AI],
+        'escalated': counts['escalated'],
+        'skip_rate': round((counts[HUMAN] + counts[AI]) / total, 4) if total else 0.0,
+        'agreement_with_stored': round(agree / decided, 4) if decided else None,
+        'elapsed_seconds': round(time.monotonic() - started, 3),
+    }
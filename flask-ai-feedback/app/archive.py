@@ -0,0 +1,304 @@
+"""
+冷热分离: 把旧回答移出 responses 表，写入压缩的归档分区
+
+- 分区按 (题目, 月份) 划分；归档一个已结束的学期时可以指定学期名称，代替月份作为分区键
+- 每个分区是归档目录 partitions/ 下的一个 JSONL.gz 文件（每批追加一个 gzip member），
+  archive_partitions 表记录分区的行数、id 和时间范围，读取时据此跳过无关的分区
+- 每批在一个短事务中: 追加写入分区文件，更新清单，从 responses 表删除这些行。
+  清单中的 size_bytes 是已提交的文件长度，事务失败或进程崩溃时多写的部分在读取时被忽略、
+  下次追加前被截掉，因此每行只会出现在热表或归档中的一处
+- 导出和搜索在 include_archived 时会同时读取归档数据
+同一时间只应运行一个归档过程（CLI 命令）。清除任务（清空题目、清空全部、删除题目）在删除热表中的行之后，
+会通过 drop_partitions 删除同一范围的归档分区。
+"""
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import func
+from . import db
+from . import queries
+from . import purge
+from . import summarizer
+from . import clustering
+from .models import Response, ArchivePartition
+
+# 仍在评估中的回答不归档
+ARCHIVABLE_STATUSES = ('done', 'failed')
+
+_archive_lock = threading.Lock()
+
+
+def partition_root(app=None):
+    return os.path.join(purge.archive_dir(app), 'partitions')
+
+
+def _naive(value):
+    return value.replace(tzinfo=None) if value is not None and value.tzinfo else value
+
+
+def _partition_path(prompt_id, period):
+    """题目 id 可能包含任意字符: 文件名使用安全的前缀加上哈希"""
+    safe = re.sub(r'[^A-Za-z0-9_.-]+', '_', prompt_id)[:60]
+    digest = hashlib.sha1(prompt_id.encode('utf-8')).hexdigest()[:10]
+    # 学期名称作为目录名: 去掉开头的点，"." 或 ".." 不能跳出分区根目录
+    period_dir = re.sub(r'[^A-Za-z0-9_.-]+', '_', period).lstrip('.') or '_'
+    return f"{period_dir}/{safe}-{digest}.jsonl.gz"
+
+
+def _get_partition(prompt_id, period):
+    partition = ArchivePartition.query.filter_by(prompt_id=prompt_id, period=period).first()
+    if partition is None:
+        partition = ArchivePartition(prompt_id=prompt_id, period=period, path=_partition_path(prompt_id, period),
+                                     row_count=0, size_bytes=0)
+        db.session.add(partition)
+        db.session.flush()
+    return partition
+
+
+def _append(partition, rows, root):
+    """截掉未提交的尾部，把这批行作为一个 gzip member 追加到分区文件，并更新清单（由调用者提交）"""
+    path = os.path.join(root, partition.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = ''.join(json.dumps(purge._archive_record(row), ensure_ascii=False) + '\n' for row in rows)
+    data = gzip.compress(lines.encode('utf-8'))
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.truncate(partition.size_bytes)
+        f.seek(partition.size_bytes)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    timestamps = [_naive(row.timestamp) for row in rows]
+    partition.size_bytes += len(data)
+    partition.row_count += len(rows)
+    partition.min_id = min(filter(None, [partition.min_id, rows[0].id]))
+    partition.max_id = max(filter(None, [partition.max_id, rows[-1].id]))
+    partition.min_timestamp = min(filter(None, [partition.min_timestamp] + timestamps))
+    partition.max_timestamp = max(filter(None, [partition.max_timestamp] + timestamps))
+
+
+def archive_responses(before=None, start=None, prompt_id=None, term=None, batch_size=None):
+    """
+    把符合条件的回答（timestamp < before、timestamp >= start、属于 prompt_id）移到归档分区。
+    term 不为空时这些行写入以学期命名的分区，否则按月份分区。返回 {'archived', 'partitions'}
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('ARCHIVE_BATCH_SIZE', 1000)
+    pause = config.get('PURGE_BATCH_PAUSE', 0.05)
+    root = partition_root()
+
+    scope = Response.query.filter(Response.status.in_(ARCHIVABLE_STATUSES))
+    if before is not None:
+        scope = scope.filter(Response.timestamp < before)
+    if start is not None:
+        scope = scope.filter(Response.timestamp >= start)
+    if prompt_id:
+        scope = scope.filter(Response.question == prompt_id)
+
+    archived, touched, last_id = 0, set(), 0
+    with _archive_lock:
+        while True:
+            rows = scope.filter(Response.id > last_id).order_by(Response.id).limit(batch_size).all()
+            if not rows:
+                break
+            groups = defaultdict(list)
+            for row in rows:
+                groups[(row.question, term or row.timestamp.strftime('%Y-%m'))].append(row)
+            for (question, period), members in groups.items():
+                _append(_get_partition(question, period), members, root)
+                touched.add((question, period))
+
+            ids = [row.id for row in rows]
+            db.session.execute(Response.__table__.delete().where(Response.id.in_(ids)))
+            db.session.commit()
+            for row in rows:
+                db.session.expunge(row)
+            archived += len(ids)
+            last_id = ids[-1]
+            if pause:
+                time.sleep(pause)
+
+    # 被移走的回答不再出现在摘要和聚类中
+    for question in sorted({question for question, _ in touched}):
+        summarizer.invalidate_summaries(question)
+        db.session.commit()
+        clustering.reset_clusters(question)
+        clustering.update_clusters(question)
+    return {'archived': archived, 'partitions': len(touched)}
+
+
+def default_cutoff():
+    """ARCHIVE_AFTER_DAYS 天前的 UTC 时间（不带时区，与数据库中保存的 timestamp 一致）"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now - timedelta(days=current_app.config.get('ARCHIVE_AFTER_DAYS', 365))
+
+
+class _BoundedReader:
+    """只读取文件的前 limit 个字节（已提交的部分）"""
+
+    def __init__(self, raw, limit):
+        self.raw = raw
+        self.remaining = limit
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.raw.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def read_partition(partition, root=None):
+    """逐行读取一个分区中已提交的记录"""
+    path = os.path.join(root or partition_root(), partition.path)
+    if not partition.size_bytes or not os.path.exists(path):
+        return
+    with open(path, 'rb') as raw:
+        with gzip.GzipFile(fileobj=_BoundedReader(raw, partition.size_bytes)) as f:
+            for line in io.TextIOWrapper(f, encoding='utf-8'):
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _record_filter(args):
+    """与 queries.apply_response_filters 相同的筛选条件，作用在归档记录（字典）上；参数不合法时抛出 ValueError"""
+    checks = []
+    status = args.get('status')
+    if status and status != 'all':
+        checks.append(lambda r: r.get('status') == status)
+    grade = args.get('grade')
+    if grade:
+        checks.append(lambda r: r.get('performance_grade') == grade)
+    rating = args.get('rating')
+    if rating:
+        try:
+            rating_value = int(rating)
+        except ValueError:
+            raise ValueError(f"Invalid rating: {rating}")
+        checks.append(lambda r: r.get('rating') == rating_value)
+    is_ai = args.get('is_ai_generated')
+    if is_ai:
+        if is_ai.lower() not in ('true', 'false'):
+            raise ValueError(f"Invalid is_ai_generated: {is_ai}")
+        expected = is_ai.lower() == 'true'
+        checks.append(lambda r: bool(r.get('is_ai_generated')) == expected)
+
+    start = _naive(queries._parse_datetime(args['start'], 'start')) if args.get('start') else None
+    end = _naive(queries._parse_datetime(args['end'], 'end', end_of_day=True)) if args.get('end') else None
+    if start or end:
+        def in_range(record):
+            timestamp = _naive(datetime.fromisoformat(record['timestamp']))
+            return (start is None or timestamp >= start) and (end is None or timestamp < end)
+        checks.append(in_range)
+    return (lambda record: all(check(record) for check in checks)), start, end
+
+
+def _partitions(prompt_id=None, start=None, end=None):
+    """按清单中的题目和时间范围挑出可能包含匹配记录的分区"""
+    query = ArchivePartition.query
+    if prompt_id and prompt_id != 'all':
+        query = query.filter(ArchivePartition.prompt_id == prompt_id)
+    if start is not None:
+        query = query.filter(ArchivePartition.max_timestamp >= start)
+    if end is not None:
+        query = query.filter(ArchivePartition.min_timestamp < end)
+    return query.order_by(ArchivePartition.min_id).all()
+
+
+def archived_rows(args, fields):
+    """
+    返回归档中符合筛选条件的记录迭代器（只包含 fields 中的列，按分区、分区内按 id 排序）。
+    筛选参数在调用时就校验，清单也在调用时读取，返回的迭代器可以在请求上下文之外使用
+    """
+    matches, start, end = _record_filter(args)
+    root = partition_root()
+    partitions = _partitions(args.get('prompt_id'), start, end)
+
+    def generate():
+        for partition in partitions:
+            for record in read_partition(partition, root):
+                if matches(record):
+                    yield {field: record.get(field) for field in fields}
+    return generate()
+
+
+def scan_archived(terms, prompt_id=None, limit=20):
+    """
+    在归档中按子串匹配查找（terms 是小写的词，都要出现在回答或反馈中），返回最多 limit 个 (score, record)，
+    按命中次数、再按 id 从新到旧排序。归档是冷数据，这里是对相关分区的顺序扫描
+    """
+    root = partition_root()
+    best = []
+    for partition in _partitions(prompt_id):
+        for record in read_partition(partition, root):
+            text = f"{record.get('student_answer') or ''}\n{record.get('ai_feedback') or ''}".lower()
+            if all(term in text for term in terms):
+                item = (sum(text.count(term) for term in terms), record['id'], record)
+                if len(best) < limit:
+                    heapq.heappush(best, item)
+                elif item[:2] > best[0][:2]:
+                    heapq.heapreplace(best, item)
+    return [(score, record) for score, _, record in sorted(best, key=lambda item: item[:2], reverse=True)]
+
+
+def drop_partitions(prompt_id=None, copy_to=None, chunk_size=1000):
+    """
+    删除题目（None 时全部题目）的归档分区，返回删除的记录数。
+    copy_to 不为空时先把分区中的记录追加到这个 JSONL.gz 文件（清除任务的归档）。
+    先删除清单并提交，再删除文件；中途失败时留下的只是没有清单引用的文件，读取时不会用到
+    """
+    root = partition_root()
+    with _archive_lock:
+        partitions = _partitions(prompt_id)
+        if copy_to:
+            for partition in partitions:
+                chunk = []
+                for record in read_partition(partition, root):
+                    chunk.append(record)
+                    if len(chunk) >= chunk_size:
+                        purge.append_records(copy_to, chunk)
+                        chunk = []
+                if chunk:
+                    purge.append_records(copy_to, chunk)
+        dropped = sum(partition.row_count for partition in partitions)
+        paths = [os.path.join(root, partition.path) for partition in partitions]
+        for partition in partitions:
+            db.session.delete(partition)
+        db.session.commit()
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return dropped
+
+
+def describe(partition):
+    """分区清单的 JSON 表示"""
+    return {
+        'id': partition.id,
+        'prompt_id': partition.prompt_id,
+        'period': partition.period,
+        'row_count': partition.row_count,
+        'size_bytes': partition.size_bytes,
+        'min_timestamp': partition.min_timestamp.isoformat() if partition.min_timestamp else None,
+        'max_timestamp': partition.max_timestamp.isoformat() if partition.max_timestamp else None,
+    }
+
+
+def partition_totals(prompt_id=None):
+    """(归档行数, 压缩后字节数)"""
+    query = db.session.query(func.coalesce(func.sum(ArchivePartition.row_count), 0),
+                             func.coalesce(func.sum(ArchivePartition.size_bytes), 0))
+    if prompt_id:
+        query = query.filter(ArchivePartition.prompt_id == prompt_id)
+    return tuple(query.one())
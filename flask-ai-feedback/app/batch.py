@@ -0,0 +1,201 @@
+"""
+批量评估 (student_id, prompt_id, answer) 记录
+
+- 相同题目下规范化后相同的答案只评估一次
+- 在有界线程池中并行评估；任一调用暂时失败（例如触发配额限制）时，
+  所有线程一起暂停一段时间（指数退避）再继续。重试只在这一层进行，模型客户端只尝试一次，
+  题目不存在等永久错误不重试
+- 成功的结果用一条批量 INSERT 写入；run_in_chunks 按块评估并提交，中断时已完成的块不会丢失
+- 已经保存过的记录（student_id、prompt_id、答案都相同）会被跳过，
+  因此失败后用同样的输入重新运行即可从断点继续
+- 报告中的 errors 按输入位置列出每条不合法或评估失败的记录及原因
+"""
+import random
+import threading
+import time
+from concurrent.futures import as_completed
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import insert
+from . import db
+from . import services
+from . import clustering
+from .cache import normalize_answer
+from .llm_client import llm_single_attempt
+from .models import Response
+
+
+class _SharedBackoff:
+    """所有工作线程共享的退避状态：出错后大家一起等待"""
+
+    def __init__(self, base_delay):
+        self.base_delay = base_delay
+        self.failures = 0
+        self.pause_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.pause_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            delay = self.base_delay * (2 ** min(self.failures - 1, 6))
+            self.pause_until = max(self.pause_until, time.monotonic() + delay + random.uniform(0, delay))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+
+def _evaluate_with_retry(app, prompt_id, answer, backoff, max_attempts):
+    for _ in range(max_attempts):
+        backoff.wait()
+        with llm_single_attempt():
+            result = services._call_in_app_context(app, services.evaluate_answer, prompt_id, answer)
+        status = services.result_status(result)
+        if status != services.TRANSIENT:
+            backoff.record_success()
+            return result
+        backoff.record_failure()
+    return result
+
+
+def _existing_keys(records):
+    """返回数据库中已存在的 (student_id, prompt_id, answer) 集合"""
+    prompt_ids = {r['prompt_id'] for r in records}
+    student_ids = {r['student_id'] for r in records}
+    rows = db.session.query(Response.student_id, Response.question, Response.student_answer) \
+        .filter(Response.question.in_(prompt_ids), Response.student_id.in_(student_ids)).all()
+    return {(r.student_id, r.question, r.student_answer) for r in rows}
+
+
+def _invalid_reason(record):
+    """返回记录不合法的原因，合法时返回 None"""
+    if not isinstance(record, dict):
+        return 'Record must be an object.'
+    if not record.get('prompt_id') or not isinstance(record['prompt_id'], str):
+        return 'A prompt_id must be provided.'
+    if not isinstance(record.get('answer'), str) or not record['answer'].strip():
+        return 'A non-empty answer must be provided.'
+    if record.get('student_id') is not None and not isinstance(record['student_id'], str):
+        return 'student_id must be a string.'
+    return None
+
+
+def run_batch(records, max_workers=None, skip_existing=True, progress=None, offset=0):
+    """
+    评估一批记录并写入数据库，返回报告字典。
+    records 是包含 prompt_id、answer 和可选 student_id 的字典列表；
+    progress(done, total) 在每个不同的答案评估完成后调用；
+    offset 是这批记录在完整输入中的起始位置，用于报告 errors 中的 index。
+    """
+    config = current_app.config
+    max_workers = max_workers or config.get('BATCH_MAX_WORKERS', 4)
+    started = time.monotonic()
+
+    valid, invalid, errors = [], [], []
+    for index, record in enumerate(records, start=offset):
+        reason = _invalid_reason(record)
+        if reason:
+            invalid.append(record)
+            errors.append({'index': index, 'error': reason})
+        else:
+            valid.append({
+                'index': index,
+                'student_id': record.get('student_id') or 'anonymous',
+                'prompt_id': record['prompt_id'],
+                'answer': record['answer'],
+            })
+
+    skipped = 0
+    if skip_existing and valid:
+        existing = _existing_keys(valid)
+        pending = [r for r in valid if (r['student_id'], r['prompt_id'], r['answer']) not in existing]
+        skipped = len(valid) - len(pending)
+        valid = pending
+
+    # 按 (题目, 规范化答案) 去重
+    groups = {}
+    for record in valid:
+        groups.setdefault((record['prompt_id'], normalize_answer(record['answer'])), []).append(record)
+
+    app = current_app._get_current_object()
+    backoff = _SharedBackoff(config.get('BATCH_RETRY_BASE_DELAY', 1.0))
+    max_attempts = config.get('BATCH_MAX_ATTEMPTS', 3)
+    results = {}
+    with services.ContextThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-eval') as executor:
+        futures = {
+            executor.submit(_evaluate_with_retry, app, key[0], members[0]['answer'], backoff, max_attempts): key
+            for key, members in groups.items()
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress:
+                progress(done, len(futures))
+
+    rows, failed = [], []
+    now = datetime.now(timezone.utc)
+    for key, members in groups.items():
+        is_ai, feedback, grade = results[key]
+        if services.result_status(results[key]) != services.OK:
+            failed.extend(records[m['index'] - offset] for m in members)
+            errors.extend({'index': m['index'], 'error': feedback} for m in members)
+            continue
+        rows.extend({
+            'student_id': m['student_id'],
+            'question': m['prompt_id'],
+            'student_answer': m['answer'],
+            'ai_feedback': feedback,
+            'is_ai_generated': is_ai,
+            'performance_grade': grade,
+            'timestamp': now,
+            'updated_at': now,
+        } for m in members)
+
+    if rows:
+        db.session.execute(insert(Response), rows)
+        db.session.commit()
+        for prompt_id in sorted({row['question'] for row in rows}):
+            clustering.schedule_update(prompt_id)
+
+    elapsed = time.monotonic() - started
+    return {
+        'submitted': len(records),
+        'invalid': invalid,
+        'skipped_existing': skipped,
+        'unique_answers': len(groups),
+        'inserted': len(rows),
+        'failed': failed,
+        'errors': sorted(errors, key=lambda e: e['index']),
+        'elapsed_seconds': round(elapsed, 3),
+        'answers_per_second': round(len(groups) / elapsed, 2) if elapsed else None,
+    }
+
+
+def run_in_chunks(records, chunk_size, max_workers=None, skip_existing=True, progress=None):
+    """
+    每次评估并提交 chunk_size 条记录，返回合并后的报告。
+    中途超时或进程退出时，已经提交的块保留在数据库中，重新提交同一批数据会跳过它们。
+    progress(offset, size, done, total) 报告当前块（从 offset 开始的 size 条）的进度。
+    """
+    report = {'submitted': len(records), 'invalid': [], 'skipped_existing': 0, 'unique_answers': 0,
+              'inserted': 0, 'failed': [], 'errors': [], 'elapsed_seconds': 0.0}
+    for offset in range(0, len(records), chunk_size):
+        chunk = records[offset:offset + chunk_size]
+        chunk_progress = None
+        if progress:
+            def chunk_progress(done, total, offset=offset, size=len(chunk)):
+                progress(offset, size, done, total)
+        chunk_report = run_batch(chunk, max_workers=max_workers, skip_existing=skip_existing,
+                                 progress=chunk_progress, offset=offset)
+        for key in ('skipped_existing', 'unique_answers', 'inserted', 'elapsed_seconds'):
+            report[key] += chunk_report[key]
+        for key in ('invalid', 'failed', 'errors'):
+            report[key].extend(chunk_report[key])
+    elapsed = report['elapsed_seconds']
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['answers_per_second'] = round(report['unique_answers'] / elapsed, 2) if elapsed else None
+    return report
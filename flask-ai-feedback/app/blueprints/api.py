@@ -1,12 +1,29 @@
 import re
+import json
+import time
+import hashlib
 from datetime import datetime
-import cloudinary.uploader
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response as HTTPResponse, stream_with_context
 from flask_login import login_required
 from .. import db
-from ..models import Question, Response
+from ..models import Question, Response, AnswerCluster, PurgeJob, ArchivePartition
 from .. import services  # 导入我们的服务模块
-import google.generativeai as genai
+from .. import jobs
+from .. import queries
+from .. import summarizer
+from .. import export
+from .. import batch
+from .. import ai_detection
+from .. import metrics
+from .. import clients
+from .. import search
+from .. import clustering
+from .. import purge
+from .. import archive
+from ..cache import get_result_cache
+from ..rate_limiter import get_rate_limiter
+from ..llm_client import llm_deadline
+from ..question_cache import get_question, get_questions, bump_questions_version, invalidate_questions
 
 # 创建一个名为 'api' 的蓝图
 api_bp = Blueprint('api', __name__)
@@ -22,9 +39,13 @@ def handle_evaluation():
 
     if not prompt_id:
         return jsonify({'error': 'A prompt_id must be provided.'}), 400
-    
-    is_ai = services.is_answer_ai_generated(student_answer)
-    ai_feedback, performance_grade = services.get_feedback_and_grade(prompt_id, student_answer)
+
+    # 异步模式: 先保存待评估的记录，立即返回任务 id，由后台队列完成评分
+    if data.get('async', current_app.config.get('EVALUATION_ASYNC', False)):
+        job = jobs.enqueue_evaluation(student_id, prompt_id, student_answer)
+        return jsonify({'job_id': job.job_key, 'response_id': job.id, 'status': job.status}), 202
+
+    is_ai, ai_feedback, performance_grade = services.evaluate_answer(prompt_id, student_answer)
 
     new_response = Response(
         student_id=student_id,
@@ -36,8 +57,115 @@ def handle_evaluation():
     )
     db.session.add(new_response)
     db.session.commit()
+    clustering.schedule_update(prompt_id)
     return jsonify({'feedback': ai_feedback, 'response_id': new_response.id})
 
+def _sse(event, data):
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_bp.route('/evaluate-stream', methods=['POST'])
+def handle_evaluation_stream():
+    """
+    与 /evaluate 相同，但通过 SSE 逐段推送反馈:
+    event: token -> {'text': ...}，最后 event: done -> {'feedback', 'response_id'}；
+    超过 LLM_STREAM_TIMEOUT 或分块之间等待过久时最后改为 event: error -> {'error', 'response_id'}
+    """
+    data = request.get_json()
+    student_answer = data.get('answer')
+    student_id = data.get('student_id', 'anonymous')
+    prompt_id = data.get('prompt_id')
+
+    if not prompt_id:
+        return jsonify({'error': 'A prompt_id must be provided.'}), 400
+
+    def generate():
+        error = None
+        cached = services.get_cached_evaluation(prompt_id, student_answer)
+        if cached:
+            is_ai, ai_feedback, performance_grade = cached
+            yield _sse('token', {'text': ai_feedback})
+        else:
+            # AI 检测与流式评分同时进行
+            app = current_app._get_current_object()
+            executor = services.get_llm_executor(app.config.get('LLM_EXECUTOR_MAX_WORKERS', 8))
+            with llm_deadline(app.config.get('LLM_CALL_TIMEOUT')):
+                detection = executor.submit(services._call_in_app_context, app,
+                                            services.detect_ai_generated, prompt_id, student_answer)
+            ai_feedback, performance_grade = "Sorry, an error occurred while getting feedback.", "Error"
+            status = services.TRANSIENT
+            with llm_deadline(app.config.get('LLM_STREAM_TIMEOUT')):
+                for kind, payload in services.stream_feedback_and_grade(prompt_id, student_answer):
+                    if kind == 'token':
+                        yield _sse('token', {'text': payload})
+                    elif kind == 'error':
+                        error = payload
+                    else:
+                        ai_feedback, performance_grade = payload
+                        status = services.result_status(payload)
+            try:
+                is_ai = detection.result(timeout=app.config.get('LLM_CALL_TIMEOUT'))
+            except Exception as e:
+                print(f"AI detection error: {e}")
+                is_ai = False
+            services.store_evaluation(prompt_id, student_answer,
+                                      services.Result((is_ai, ai_feedback, performance_grade), status))
+
+        new_response = Response(
+            student_id=student_id,
+            question=prompt_id,
+            student_answer=student_answer,
+            ai_feedback=ai_feedback,
+            is_ai_generated=is_ai,
+            performance_grade=performance_grade
+        )
+        db.session.add(new_response)
+        db.session.commit()
+        clustering.schedule_update(prompt_id)
+        if error:
+            yield _sse('error', {'error': error, 'response_id': new_response.id})
+        else:
+            yield _sse('done', {'feedback': ai_feedback, 'response_id': new_response.id})
+
+    return HTTPResponse(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api_bp.route('/evaluate-batch', methods=['POST'])
+@login_required
+def handle_batch_evaluation():
+    """
+    批量评估: {'records': [{'student_id', 'prompt_id', 'answer'}, ...]}。
+    每 BATCH_COMMIT_SIZE 条提交一次，请求超时前已完成的结果不会丢失。
+    返回处理报告，其中 failed 列出评估失败的记录，errors 按位置给出每条失败或不合法记录的原因；
+    重新提交同一批数据即可继续（已保存的会被跳过）。
+    """
+    data = request.get_json(silent=True)
+    records = data.get('records') if isinstance(data, dict) else None
+    if not isinstance(records, list) or not records:
+        return jsonify({'error': 'A non-empty list of records must be provided.'}), 400
+    limit = current_app.config.get('BATCH_MAX_RECORDS', 2000)
+    if len(records) > limit:
+        return jsonify({'error': f'At most {limit} records can be submitted at once.'}), 400
+
+    report = batch.run_in_chunks(records, current_app.config.get('BATCH_COMMIT_SIZE', 100),
+                                 skip_existing=data.get('skip_existing', True))
+    return jsonify(report)
+
+@api_bp.route('/evaluation-status/<job_key>', methods=['GET'])
+def get_evaluation_status(job_key):
+    """查询异步评估任务的状态，完成后返回反馈；只接受提交时返回的随机 job_id"""
+    job = jobs.get_job(job_key)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    result = {'job_id': job.job_key, 'response_id': job.id, 'status': job.status}
+    if job.status in (jobs.DONE, jobs.FAILED):
+        result['feedback'] = job.ai_feedback
+    return jsonify(result)
+
 @api_bp.route('/rate-feedback', methods=['POST'])
 def rate_feedback():
     data = request.get_json()
@@ -53,17 +181,55 @@ def rate_feedback():
         return jsonify({'status': 'success'}), 200
     return jsonify({'status': 'error', 'message': 'Response not found'}), 404
 
+def _question_details(question):
+    return {
+        'title': question.title,
+        'question_text': question.question_text,
+        'image_src': question.image_url
+    }
+
+def _conditional_json(payload, versions):
+    """返回带 ETag / Last-Modified / Cache-Control 的 JSON，客户端缓存仍有效时返回 304"""
+    versions = [v for v in versions if v]
+    fingerprint = json.dumps([payload, [v.isoformat() for v in versions]], sort_keys=True)
+    response = jsonify(payload)
+    response.set_etag(hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:32])
+    if versions:
+        response.last_modified = max(versions)
+
+    config = current_app.config
+    response.cache_control.public = True
+    response.cache_control.max_age = config.get('QUESTION_DETAILS_MAX_AGE', 300)
+    stale_while_revalidate = config.get('QUESTION_DETAILS_STALE_WHILE_REVALIDATE', 0)
+    if stale_while_revalidate:
+        response.cache_control.stale_while_revalidate = stale_while_revalidate
+    return response.make_conditional(request)
+
 @api_bp.route('/question-details/<string:prompt_id>')
 def get_question_details(prompt_id):
-    question = Question.query.filter_by(prompt_id=prompt_id).first()
+    question = get_question(prompt_id)
     if question:
-        return jsonify({
-            'title': question.title,
-            'question_text': question.question_text,
-            'image_src': question.image_url
-        })
+        return _conditional_json(_question_details(question),
+                                 [question.updated_at or question.created_at])
     return jsonify({'error': 'Question details not found'}), 404
 
+@api_bp.route('/question-details')
+def get_question_details_batch():
+    """一次返回多个题目的详情，例如 ?prompt_ids=a,b,c"""
+    prompt_ids = [p.strip() for p in request.args.get('prompt_ids', '').split(',') if p.strip()]
+    if not prompt_ids:
+        return jsonify({'error': 'At least one prompt_id must be provided.'}), 400
+    limit = current_app.config.get('QUESTION_DETAILS_BATCH_LIMIT', 50)
+    if len(prompt_ids) > limit:
+        return jsonify({'error': f'At most {limit} prompt_ids can be requested at once.'}), 400
+
+    found = get_questions(prompt_ids)
+    payload = {
+        'questions': {pid: _question_details(q) for pid, q in found.items()},
+        'missing': [pid for pid in prompt_ids if pid not in found]
+    }
+    return _conditional_json(payload, [q.updated_at or q.created_at for q in found.values()])
+
 # --- Admin Panel API ---
 
 @api_bp.route('/get-unique-problems', methods=['GET'])
@@ -84,64 +250,315 @@ def get_unique_problems():
 @api_bp.route('/get-all-feedback', methods=['GET'])
 @login_required
 def get_all_feedback():
-    prompt_id_filter = request.args.get('prompt_id')
-    query = Response.query
-    if prompt_id_filter:
-        query = query.filter(Response.question == prompt_id_filter)
-    
-    responses = query.order_by(Response.timestamp.desc()).all()
-    output = [{
-        'id': r.id, 'student_id': r.student_id, 'question': r.question,
-        'student_answer': r.student_answer, 'ai_feedback': r.ai_feedback,
-        'timestamp': r.timestamp.isoformat(), 'rating': r.rating,
-        'feedback_comment': r.feedback_comment, 'is_ai_generated': r.is_ai_generated,
-        'performance_grade': r.performance_grade
-    } for r in responses]
-    return jsonify(output)
+    """
+    返回学生回答。支持 fields= 字段投影和 grade / rating / is_ai_generated / start / end 筛选。
+    带 limit 或 cursor 参数时按 (timestamp, id) 游标分页，返回 {'items', 'next_cursor'}；
+    否则与原来一样返回全部行组成的列表。
+    """
+    args = request.args
+    try:
+        fields = queries.parse_fields(args.get('fields'))
+        # 游标需要 timestamp 和 id，即使调用方没有请求这两个字段
+        selected = list(dict.fromkeys(fields + ['timestamp', 'id']))
+        query = db.session.query(*[queries.RESPONSE_COLUMNS[f].label(f) for f in selected])
+        query = queries.apply_response_filters(query, args)
+        if args.get('cursor'):
+            query = queries.apply_cursor(query, args['cursor'])
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = query.order_by(Response.timestamp.desc(), Response.id.desc())
+    if limit is None and not args.get('cursor'):
+        return jsonify([queries.serialize_row(r, fields) for r in query.all()])
+
+    config = current_app.config
+    limit = max(1, min(limit or config['FEEDBACK_PAGE_SIZE_DEFAULT'], config['FEEDBACK_PAGE_SIZE_MAX']))
+    rows = query.limit(limit + 1).all()
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = queries.encode_cursor(page[-1].timestamp, page[-1].id)
+    return jsonify({
+        'items': [queries.serialize_row(r, fields) for r in page],
+        'next_cursor': next_cursor
+    })
+
+@api_bp.route('/feedback-changes', methods=['GET'])
+@login_required
+def get_feedback_changes():
+    """返回 ?since= 游标之后新插入或被评分/更新的回答；不带 since 时只返回当前游标"""
+    prompt_id = request.args.get('prompt_id')
+    since = request.args.get('since')
+    if not since:
+        return jsonify({'items': [], 'cursor': queries.latest_change_cursor(prompt_id)})
+    try:
+        items, cursor = queries.changes_since(since, prompt_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': items, 'cursor': cursor})
+
+@api_bp.route('/feedback-stream', methods=['GET'])
+@login_required
+def feedback_stream():
+    """
+    用 SSE 推送新的或被修改的回答（轮询数据库）。每条 change 事件的 id 就是游标，
+    连接在 FEEDBACK_STREAM_MAX_SECONDS 后关闭，浏览器通过 Last-Event-ID 从断点继续。
+    连接期间会一直占用一个 worker，只有 FEEDBACK_STREAM_ENABLED（异步 worker）时才开放。
+    """
+    if not current_app.config.get('FEEDBACK_STREAM_ENABLED', False):
+        return jsonify({'error': 'The change stream is disabled; poll /api/feedback-changes instead.'}), 404
+    prompt_id = request.args.get('prompt_id')
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        if cursor:
+            queries.decode_cursor(cursor)
+        else:
+            cursor = queries.latest_change_cursor(prompt_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    config = current_app.config
+    poll_interval = config.get('FEEDBACK_STREAM_POLL_INTERVAL', 2)
+    deadline = time.monotonic() + config.get('FEEDBACK_STREAM_MAX_SECONDS', 55)
+
+    def generate(cursor):
+        yield "retry: 3000\n\n"
+        sent = {}
+        while True:
+            last_id = cursor
+            items, cursor = queries.changes_since(cursor, prompt_id)
+            # 结束本次读事务，下一轮轮询才能看到新提交的数据
+            db.session.rollback()
+            # 重叠窗口内重新读到、已经推送过的版本不再推送
+            items = [item for item in items if sent.get(item['id']) != item['cursor']]
+            for item in items:
+                sent[item['id']] = item['cursor']
+                # 事件 id 只前进不后退，重连时从已推送的最新位置继续
+                if last_id is None or queries.decode_cursor(item['cursor']) > queries.decode_cursor(last_id):
+                    last_id = item['cursor']
+                yield f"id: {last_id}\n" + _sse('change', item)
+            if not items:
+                yield ": keep-alive\n\n"
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(poll_interval)
+
+    return HTTPResponse(
+        stream_with_context(generate(cursor)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api_bp.route('/feedback-stats', methods=['GET'])
+@login_required
+def get_feedback_stats():
+    """仪表盘统计：按评级、评分、AI 标记、日期和题目汇总（支持与 get-all-feedback 相同的筛选）"""
+    try:
+        return jsonify(queries.feedback_stats(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api_bp.route('/search-responses', methods=['GET'])
+@login_required
+def search_responses():
+    """
+    全文搜索学生回答和 AI 反馈: ?q=y-axis&prompt_id=...&limit=20&offset=0
+    按相关性排序，answer_snippet / feedback_snippet 中的命中词用 <mark> 标出（其余内容已转义）；
+    ?include_archived=1 时在热表的结果之后继续返回归档中的命中（archived 为 true）
+    """
+    config = current_app.config
+    try:
+        limit = int(request.args.get('limit', config['SEARCH_PAGE_SIZE_DEFAULT']))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers.'}), 400
+    limit = max(1, min(limit, config['SEARCH_PAGE_SIZE_MAX']))
+    try:
+        result = search.search_responses(request.args.get('q'), request.args.get('prompt_id'),
+                                         limit=limit, offset=max(0, offset),
+                                         include_archived=request.args.get('include_archived') in ('1', 'true'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@api_bp.route('/export-responses', methods=['GET'])
+@login_required
+def export_responses():
+    """
+    流式导出回答: ?format=csv|ndjson&gzip=1，支持与 get-all-feedback 相同的筛选和 fields= 参数；
+    ?include_archived=1 时先输出归档分区中符合条件的回答
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    compress = request.args.get('gzip') in ('1', 'true')
+    try:
+        query, fields = export.build_export_query(request.args)
+        archived = None
+        if request.args.get('include_archived') in ('1', 'true'):
+            archived = archive.archived_rows(request.args, fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    mimetype, extension = export.FORMATS[fmt]
+    filename = f"responses.{extension}" + ('.gz' if compress else '')
+    body = export.generate_export(query, fields, fmt, compress,
+                                  batch_size=current_app.config.get('EXPORT_BATCH_SIZE', 1000),
+                                  archived=archived)
+    return HTTPResponse(
+        stream_with_context(body),
+        mimetype='application/gzip' if compress else mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 @api_bp.route('/get-summary', methods=['GET'])
 @login_required
 def get_summary():
+    """
+    返回班级摘要。没有新答案时直接返回已保存的摘要，有新答案时只总结新增部分；
+    ?refresh=1 强制重新生成，?sample=N 总结按评级分层抽样的 N 条答案。
+    """
     prompt_id_filter = request.args.get('prompt_id')
-    query = Response.query.filter(Response.is_ai_generated == False)
-    if prompt_id_filter and prompt_id_filter != 'all':
-        query = query.filter(Response.question == prompt_id_filter)
-    
-    responses = query.all()
-    if not responses:
-        return jsonify({'summary': 'Not enough data to generate a summary.'})
-
-    all_answers_text = "\n\n---\n\n".join([res.student_answer for res in responses])
-    summary = services.get_summary_from_ai(all_answers_text)
-    return jsonify({'summary': summary})
+    try:
+        sample_size = int(request.args.get('sample', current_app.config.get('SUMMARY_SAMPLE_SIZE', 0)))
+    except ValueError:
+        return jsonify({'error': 'sample must be an integer.'}), 400
+    refresh = request.args.get('refresh') in ('1', 'true')
+
+    with metrics.llm_labels(prompt_id_filter or 'all'):
+        result = summarizer.get_or_update_summary(prompt_id_filter, sample_size=sample_size, refresh=refresh)
+    return jsonify(result)
+
+@api_bp.route('/answer-clusters', methods=['GET'])
+@login_required
+def get_answer_clusters():
+    """
+    近似重复答案的聚类: ?prompt_id=...&min_size=2&limit=50。只读取已有的聚类（新答案由后台任务分配），
+    按大小倒序返回每个聚类的代表答案、聚类后需要阅读的答案数，以及还没有分配聚类的答案数
+    """
+    prompt_id = request.args.get('prompt_id')
+    if not prompt_id or prompt_id == 'all':
+        return jsonify({'error': 'A prompt_id must be provided.'}), 400
+    try:
+        min_size = int(request.args.get('min_size', 1))
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'min_size and limit must be integers.'}), 400
+
+    clusters = clustering.cluster_sizes(prompt_id, min_size=max(1, min_size), limit=max(1, limit))
+    total, cluster_count = clustering.prompt_totals(prompt_id)
+    return jsonify({
+        'prompt_id': prompt_id,
+        'total_responses': total,
+        'cluster_count': cluster_count,
+        'unclustered': clustering.unclustered_count(prompt_id),
+        'clusters': [{
+            'id': cluster.id,
+            'size': size,
+            'representative_id': cluster.representative_id,
+            'representative_answer': cluster.representative_answer,
+        } for cluster, size in clusters],
+    })
+
+@api_bp.route('/answer-clusters/<int:cluster_id>', methods=['GET'])
+@login_required
+def get_answer_cluster_members(cluster_id):
+    """一个聚类中的全部回答（用于抄袭审查），按提交时间排序"""
+    cluster = db.session.get(AnswerCluster, cluster_id)
+    if not cluster:
+        return jsonify({'error': 'Cluster not found'}), 404
+    members = db.session.query(Response.id, Response.student_id, Response.student_answer, Response.timestamp) \
+        .filter(Response.question == cluster.prompt_id, Response.cluster_id == cluster_id) \
+        .order_by(Response.timestamp, Response.id).all()
+    return jsonify({
+        'id': cluster.id,
+        'prompt_id': cluster.prompt_id,
+        'representative_answer': cluster.representative_answer,
+        'members': [{
+            'id': m.id,
+            'student_id': m.student_id,
+            'student_answer': m.student_answer,
+            'timestamp': m.timestamp.isoformat() if m.timestamp else None,
+        } for m in members],
+    })
 
 @api_bp.route('/clear-problem-feedback', methods=['POST'])
 @login_required
 def clear_problem_feedback():
+    """
+    在后台分批删除一个题目的全部回答；请求体中 "archive": true 时先归档，
+    "drop_archived": true 时同时删除该题目的归档分区（默认保留）
+    """
     data = request.get_json()
     prompt_id = data.get('prompt_id')
     if not prompt_id:
         return jsonify({'status': 'error', 'message': 'A prompt_id must be provided.'}), 400
 
     try:
-        Response.query.filter_by(question=prompt_id).delete()
-        db.session.commit()
-        return jsonify({'status': 'success', 'message': f'Data for {prompt_id} cleared.'}), 200
+        job = purge.start_purge(prompt_id, archive=data.get('archive'),
+                                drop_archived=data.get('drop_archived') is True)
+        return _purge_started(job, f'Data for {prompt_id} cleared.')
     except Exception as e:
         db.session.rollback()
         return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def _purge_started(job, done_message):
+    """清除任务已完成（JOBS_EAGER）时返回 200，否则返回 202 和查询进度的地址"""
+    body = {'purge_job_id': job.id, 'status_url': f'/api/purge-jobs/{job.id}', 'purge': purge.describe(job)}
+    if job.status == purge.DONE:
+        return jsonify({'status': 'success', 'message': done_message, **body}), 200
+    return jsonify({'status': 'accepted', 'message': 'Deletion is running in the background.', **body}), 202
+
 @api_bp.route('/clear-all-feedback', methods=['POST'])
 @login_required
 def clear_all_feedback():
-    """Deletes all records from the 'responses' table."""
+    """
+    Deletes all records from the 'responses' table (in background batches).
+    Archived partitions are kept unless the body contains "drop_archived": true.
+    """
+    data = request.get_json(silent=True) or {}
     try:
-        db.session.query(Response).delete()
-        db.session.commit()
-        return jsonify({'status': 'success', 'message': 'All feedback data has been cleared.'}), 200
+        job = purge.start_purge(archive=data.get('archive'), drop_archived=data.get('drop_archived') is True)
+        return _purge_started(job, 'All feedback data has been cleared.')
     except Exception as e:
         db.session.rollback()
         print(f"Error clearing all data: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@api_bp.route('/purge-jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_purge_job(job_id):
+    """清除任务的状态和进度"""
+    job = db.session.get(PurgeJob, job_id)
+    if not job:
+        return jsonify({'error': 'Purge job not found'}), 404
+    return jsonify(purge.describe(job))
+
+@api_bp.route('/purge-jobs', methods=['GET'])
+@login_required
+def list_purge_jobs():
+    """最近的清除任务（最新的在前）"""
+    recent = PurgeJob.query.order_by(PurgeJob.id.desc()).limit(20).all()
+    return jsonify([purge.describe(job) for job in recent])
+
+@api_bp.route('/archive-partitions', methods=['GET'])
+@login_required
+def list_archive_partitions():
+    """归档分区清单: ?prompt_id=...，附带归档的总行数和压缩后的大小"""
+    prompt_id = request.args.get('prompt_id')
+    if prompt_id == 'all':
+        prompt_id = None
+    query = ArchivePartition.query
+    if prompt_id:
+        query = query.filter(ArchivePartition.prompt_id == prompt_id)
+    partitions = query.order_by(ArchivePartition.prompt_id, ArchivePartition.period).all()
+    rows, size = archive.partition_totals(prompt_id)
+    return jsonify({
+        'total_rows': rows,
+        'total_bytes': size,
+        'partitions': [archive.describe(p) for p in partitions],
+    })
 @api_bp.route('/create-question', methods=['POST'])
 @login_required
 def create_question():
@@ -156,7 +573,8 @@ def create_question():
     image_url = None
     if image_file:
         try:
-            upload_result = cloudinary.uploader.upload(image_file)
+            with metrics.span('cloudinary_upload'):
+                upload_result = clients.get_cloudinary_uploader().upload(image_file)
             image_url = upload_result.get('secure_url')
         except Exception as e:
             return jsonify({'status': 'error', 'message': f'Image upload failed: {e}'}), 500
@@ -169,7 +587,9 @@ def create_question():
         ai_prompt=ai_prompt, image_url=image_url
     )
     db.session.add(new_question)
+    bump_questions_version()
     db.session.commit()
+    invalidate_questions()
 
     return jsonify({
         'status': 'success',
@@ -209,10 +629,18 @@ def update_question(prompt_id):
         image_file = request.files.get('image')
         if image_file:
             # 如果上传了新图片，则上传到 Cloudinary 并更新 URL
-            upload_result = cloudinary.uploader.upload(image_file)
+            with metrics.span('cloudinary_upload'):
+                upload_result = clients.get_cloudinary_uploader().upload(image_file)
             question.image_url = upload_result.get('secure_url')
 
+        bump_questions_version()
         db.session.commit()
+        invalidate_questions()
+
+        # 题目被修改后，旧的评估结果缓存不再有效
+        result_cache = get_result_cache()
+        if result_cache:
+            result_cache.invalidate_prompt(prompt_id)
         return jsonify({'status': 'success', 'message': 'Question updated successfully!'}), 200
     except Exception as e:
         db.session.rollback()
@@ -226,21 +654,56 @@ def delete_question(prompt_id):
         return jsonify({'status': 'error', 'message': 'Question not found'}), 404
 
     try:
-        # 1. 删除所有与该问题相关的回答
-        Response.query.filter_by(question=prompt_id).delete()
-        
-        # 2. 删除问题本身
+        # 1. 删除问题本身（提交事务，同时递增题目缓存版本号）
         db.session.delete(question)
-        
-        # 3. 提交事务
+        bump_questions_version()
         db.session.commit()
-        
-        return jsonify({'status': 'success', 'message': 'Question and all associated responses have been deleted.'}), 200
+        invalidate_questions()
+
+        result_cache = get_result_cache()
+        if result_cache:
+            result_cache.invalidate_prompt(prompt_id)
+
+        # 2. 在后台分批删除所有与该问题相关的回答（?archive=1 时先归档，?drop_archived=1 时同时删除归档分区）
+        job = purge.start_purge(prompt_id, archive=request.args.get('archive') in ('1', 'true') or None,
+                                drop_archived=request.args.get('drop_archived') in ('1', 'true'))
+        return _purge_started(job, 'Question and all associated responses have been deleted.')
     except Exception as e:
         db.session.rollback()
         print(f"Error deleting question {prompt_id}: {e}")
         return jsonify({'status': 'error', 'message': f'An error occurred: {e}'}), 500
 
+@api_bp.route('/cache-stats', methods=['GET'])
+@login_required
+def get_cache_stats():
+    """返回 LLM 结果缓存的命中/未命中统计（仅当前 worker 进程）"""
+    result_cache = get_result_cache()
+    if not result_cache:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **result_cache.stats()})
+
+@api_bp.route('/llm-stats', methods=['GET'])
+@login_required
+def get_llm_stats():
+    """
+    返回每个模型的熔断器状态和延迟分位数，以及重试/对冲/备用模型的次数（仅当前 worker 进程），
+    和所有 worker 共享的限流桶中剩余的配额
+    """
+    if not services.model:
+        return jsonify({'enabled': False})
+    limiter = get_rate_limiter()
+    return jsonify({'enabled': True, **services.model.stats(),
+                    'rate_limit': limiter.levels() if limiter else None})
+
+@api_bp.route('/ai-detection-stats', methods=['GET'])
+@login_required
+def get_ai_detection_stats():
+    """返回本地预筛选的判断次数和跳过模型调用的比例（仅当前 worker 进程）"""
+    detector = ai_detection.get_detector()
+    if not detector:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **detector.stats()})
+
 @api_bp.route('/test-ai-connection', methods=['GET'])
 def test_ai_connection():
     """
@@ -248,10 +711,9 @@ def test_ai_connection():
     它会尝试列出所有可用的模型。
     """
     try:
-        # genai 库需要在应用启动时通过 API 密钥进行配置。
-        # 我们假设这已经完成。
+        # get_genai() 在第一次使用时导入 genai 库并配置 API 密钥。
         # list_models() 是一个轻量级的调用，非常适合用来测试基础连接。
-        models = list(genai.list_models())
+        models = list(clients.get_genai().list_models())
         available_model_names = [m.name.replace('models/', '') for m in models]
         # 我们可以检查一下列表中是否包含我们需要的模型
 
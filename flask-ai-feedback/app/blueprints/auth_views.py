@@ -1,7 +1,7 @@
 import traceback # 新增导入
 from flask import Blueprint, render_template, redirect, url_for, flash, session, current_app
 from flask_login import login_user, logout_user, login_required
-from .. import oauth
+from ..clients import get_oauth
 from ..models import User
 
 # 创建一个名为 'auth' 的蓝图
@@ -10,11 +10,12 @@ auth_bp = Blueprint('auth', __name__)
 @auth_bp.route('/login')
 def login():
     redirect_uri = url_for('auth.authorize', _external=True)
-    return oauth.google.authorize_redirect(redirect_uri)
+    return get_oauth().google.authorize_redirect(redirect_uri)
 
 @auth_bp.route('/auth')
 def authorize():
     try:
+        oauth = get_oauth()
         token = oauth.google.authorize_access_token()
         user_info = oauth.google.get('userinfo').json()
         user_email = user_info.get('email')
@@ -44,7 +45,10 @@ def logout():
 @auth_bp.route('/dashboard')
 @login_required
 def dashboard():
-    return render_template('dashboard.html')
+    config = current_app.config
+    return render_template('dashboard.html',
+                           feedback_stream_enabled=config.get('FEEDBACK_STREAM_ENABLED', False),
+                           feedback_poll_interval=config.get('FEEDBACK_CHANGES_POLL_INTERVAL', 5))
 
 @auth_bp.route('/create')
 @login_required
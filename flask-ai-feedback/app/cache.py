@@ -0,0 +1,140 @@
+"""
+LLM 评估结果缓存
+
+缓存键是 (题目 ai_prompt, 规范化后的答案, 模型名称) 的哈希，
+因此只要评分标准或模型变化，旧的缓存自然不会再被命中。
+后端可选:
+- 'memory':   进程内 LRU + TTL（cachetools.TTLCache）
+- 'database': llm_result_cache 表，重启后依然有效
+- 'none':     关闭缓存
+"""
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from cachetools import TTLCache
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .models import LLMResultCache
+
+
+def normalize_answer(text):
+    """规范化答案文本：统一 Unicode 形式、大小写和空白"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+def make_cache_key(ai_prompt, student_answer, model_name):
+    payload = json.dumps([ai_prompt, normalize_answer(student_answer), model_name])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryBackend:
+    """进程内 LRU 缓存，条目在 ttl 秒后过期"""
+
+    def __init__(self, maxsize=10000, ttl=86400):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+        return entry[1] if entry else None
+
+    def set(self, key, prompt_id, value):
+        with self._lock:
+            self._cache[key] = (prompt_id, value)
+
+    def invalidate_prompt(self, prompt_id):
+        with self._lock:
+            stale_keys = [k for k, (pid, _) in self._cache.items() if pid == prompt_id]
+            for k in stale_keys:
+                del self._cache[k]
+        return len(stale_keys)
+
+
+class DatabaseBackend:
+    """保存在 llm_result_cache 表中的缓存，可在多个 worker 和重启之间共享"""
+
+    def __init__(self, ttl=86400):
+        self.ttl = ttl
+
+    def get(self, key):
+        row = db.session.get(LLMResultCache, key)
+        if row is None:
+            return None
+        created_at = row.created_at.replace(tzinfo=row.created_at.tzinfo or timezone.utc)
+        if self.ttl and created_at < datetime.now(timezone.utc) - timedelta(seconds=self.ttl):
+            return None
+        return json.loads(row.value)
+
+    def set(self, key, prompt_id, value):
+        try:
+            db.session.merge(LLMResultCache(
+                key=key, prompt_id=prompt_id, value=json.dumps(value),
+                created_at=datetime.now(timezone.utc)
+            ))
+            db.session.commit()
+        except IntegrityError:
+            # 另一个 worker 刚好写入了同一个键
+            db.session.rollback()
+
+    def invalidate_prompt(self, prompt_id):
+        count = LLMResultCache.query.filter_by(prompt_id=prompt_id).delete()
+        db.session.commit()
+        return count
+
+
+class ResultCache:
+    """包装具体后端，并统计命中/未命中次数"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, prompt_id, value):
+        self.backend.set(key, prompt_id, value)
+
+    def invalidate_prompt(self, prompt_id):
+        return self.backend.invalidate_prompt(prompt_id)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def init_app(app):
+    """根据配置创建结果缓存，保存在 app.extensions 中"""
+    backend_name = app.config.get('RESULT_CACHE_BACKEND', 'memory')
+    ttl = app.config.get('RESULT_CACHE_TTL', 86400)
+    if backend_name == 'memory':
+        backend = MemoryBackend(maxsize=app.config.get('RESULT_CACHE_MAXSIZE', 10000), ttl=ttl)
+    elif backend_name == 'database':
+        backend = DatabaseBackend(ttl=ttl)
+    else:
+        backend = None
+    app.extensions['result_cache'] = ResultCache(backend) if backend else None
+
+
+def get_result_cache():
+    """返回当前应用的结果缓存；未启用时返回 None"""
+    return current_app.extensions.get('result_cache')
@@ -0,0 +1,156 @@
+"""
+通过 `flask <command>` 使用的运维命令
+"""
+import csv
+import json
+import sys
+import click
+from . import jobs
+from . import purge
+from . import export
+from . import batch
+from . import ai_detection
+from . import search
+from . import clustering
+from . import archive
+from . import queries
+
+
+def register_commands(app):
+    """把所有命令注册到应用上"""
+
+    @app.cli.command('recover-jobs')
+    def recover_jobs_command():
+        """重新提交崩溃前没有完成的异步评估任务"""
+        count = jobs.recover_unfinished_jobs()
+        click.echo(f"Re-queued {count} unfinished evaluation job(s).")
+
+    @app.cli.command('resume-purges')
+    def resume_purges_command():
+        """在当前进程中继续执行被中断的后台清除任务"""
+        app.config['JOBS_EAGER'] = True
+        count = purge.recover_unfinished_purges()
+        click.echo(f"Resumed {count} interrupted purge job(s).")
+
+    @app.cli.command('export-responses')
+    @click.option('--format', 'fmt', type=click.Choice(list(export.FORMATS)), default='csv')
+    @click.option('--gzip', 'compress', is_flag=True, help='Compress the output with gzip.')
+    @click.option('--output', '-o', type=click.Path(dir_okay=False), help='Output file (default: stdout).')
+    @click.option('--prompt-id', help='Only export responses to this prompt.')
+    @click.option('--start', help='Only responses at or after this ISO date/time.')
+    @click.option('--end', help='Only responses before this ISO date/time (a bare date includes that day).')
+    @click.option('--fields', help='Comma-separated list of columns to export.')
+    @click.option('--include-archived', is_flag=True, help='Also export matching responses from archive partitions.')
+    def export_responses_command(fmt, compress, output, prompt_id, start, end, fields, include_archived):
+        """流式导出全部回答（CSV 或 NDJSON）"""
+        args = {k: v for k, v in {'prompt_id': prompt_id, 'start': start, 'end': end, 'fields': fields}.items() if v}
+        try:
+            query, selected = export.build_export_query(args)
+            archived = archive.archived_rows(args, selected) if include_archived else None
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+
+        chunks = export.generate_export(query, selected, fmt, compress,
+                                        batch_size=app.config.get('EXPORT_BATCH_SIZE', 1000), archived=archived)
+        stream = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+        finally:
+            if output:
+                stream.close()
+
+    @app.cli.command('grade-batch')
+    @click.argument('input_file', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--workers', type=int, help='Number of answers evaluated in parallel.')
+    @click.option('--chunk-size', type=int, default=500, show_default=True,
+                  help='Records evaluated and committed per round; finished rounds survive an interruption.')
+    @click.option('--failed-output', type=click.Path(dir_okay=False),
+                  help='Write records that could not be graded to this JSONL file.')
+    def grade_batch_command(input_file, workers, chunk_size, failed_output):
+        """
+        离线批量评分。INPUT_FILE 是带 student_id,prompt_id,answer 列的 CSV，或每行一个对象的 JSONL。
+        中断或部分失败后，用同一个文件重新运行即可继续（已保存的记录会被跳过）。
+        """
+        with open(input_file, newline='', encoding='utf-8') as f:
+            if input_file.endswith('.csv'):
+                records = list(csv.DictReader(f))
+            else:
+                records = [json.loads(line) for line in f if line.strip()]
+
+        def progress(offset, size, done, total):
+            click.echo(f"\rRecords {offset + 1}-{offset + size} of {len(records)}: "
+                       f"graded {done}/{total} unique answers", nl=False, err=True)
+
+        totals = batch.run_in_chunks(records, chunk_size, max_workers=workers, progress=progress)
+        failed, invalid = totals['failed'], totals['invalid']
+        click.echo('', err=True)
+
+        rate = totals['answers_per_second'] or 0
+        click.echo(f"Inserted {totals['inserted']} response(s), skipped {totals['skipped_existing']} already saved, "
+                   f"{len(failed)} failed, {len(invalid)} invalid. "
+                   f"Graded {totals['unique_answers']} unique answer(s) in {totals['elapsed_seconds']:.1f}s "
+                   f"({rate:.2f}/s).")
+        if failed and failed_output:
+            with open(failed_output, 'w', encoding='utf-8') as f:
+                for record in failed:
+                    f.write(json.dumps(record) + '\n')
+            click.echo(f"Failed records written to {failed_output}; re-run with that file to retry them.")
+
+    @app.cli.command('rescore-ai-detection')
+    @click.option('--prompt-id', help='Only rescore responses to this prompt.')
+    def rescore_ai_detection_command(prompt_id):
+        """用本地预筛选重新评估已保存的回答，报告能跳过多少模型调用（不修改数据）"""
+        report = ai_detection.rescore_responses(prompt_id)
+        agreement = report['agreement_with_stored']
+        click.echo(f"Scored {report['total']} response(s) in {report['elapsed_seconds']:.2f}s: "
+                   f"{report['local_human']} human, {report['local_ai']} AI decided locally, "
+                   f"{report['escalated']} would go to the model (skip rate {report['skip_rate']:.1%}).")
+        if agreement is not None:
+            click.echo(f"Local decisions agree with the stored labels for {agreement:.1%} of decided responses.")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """创建（如果缺失）并重建回答的全文搜索索引"""
+        backend = search.rebuild_index()
+        if backend == 'like':
+            click.echo("No full-text index is available on this database; search falls back to LIKE.")
+        else:
+            click.echo(f"Full-text search index is ready ({backend}).")
+
+    @app.cli.command('cluster-answers')
+    @click.option('--prompt-id', help='Only cluster responses to this prompt.')
+    @click.option('--rebuild', is_flag=True, help='Discard existing clusters and cluster every response again.')
+    def cluster_answers_command(prompt_id, rebuild):
+        """把还没有聚类的回答分配到近似重复聚类中（例如导入历史数据之后）"""
+        if rebuild:
+            clustering.reset_clusters(prompt_id)
+        count = clustering.update_clusters(prompt_id)
+        click.echo(f"Clustered {count} response(s).")
+
+    @app.cli.command('archive-responses')
+    @click.option('--before', help='Archive responses older than this ISO date/time.')
+    @click.option('--default-cutoff', is_flag=True, help='Archive responses older than ARCHIVE_AFTER_DAYS days.')
+    @click.option('--all', 'archive_all', is_flag=True,
+                  help='Archive every matching response regardless of age (e.g. a finished term with --term).')
+    @click.option('--start', help='Only responses at or after this ISO date/time (e.g. the start of a term).')
+    @click.option('--prompt-id', help='Only archive responses to this prompt.')
+    @click.option('--term', help='Store the rows in partitions named after this finished term instead of by month.')
+    def archive_responses_command(before, default_cutoff, archive_all, start, prompt_id, term):
+        """
+        把旧回答（或一个已结束学期的回答）从 responses 表移到压缩的归档分区。
+        必须用 --before、--default-cutoff 或 --all 之一明确指定范围，避免误把最近的回答移走。
+        """
+        if sum(map(bool, (before, default_cutoff, archive_all))) != 1:
+            raise click.UsageError('Pass exactly one of --before DATE, --default-cutoff or --all.')
+        try:
+            cutoff = queries._parse_datetime(before, 'before') if before else None
+            start_at = queries._parse_datetime(start, 'start') if start else None
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        if default_cutoff:
+            cutoff = archive.default_cutoff()
+
+        report = archive.archive_responses(before=cutoff, start=start_at, prompt_id=prompt_id, term=term)
+        click.echo(f"Archived {report['archived']} response(s) into {report['partitions']} partition(s) "
+                   f"under {archive.partition_root()}.")
@@ -0,0 +1,102 @@
+"""
+第三方 SDK（Gemini、Cloudinary、Google OAuth）的延迟初始化
+
+这些库导入很慢（google.generativeai 约 0.8 秒），而很多 worker 只处理 question-details 之类的轻量请求。
+create_app 只记录配置；SDK 在第一次使用时才导入和配置。
+WARMUP_ON_START 为 True 时，启动后在后台线程中提前完成初始化，第一个真实请求不必等待。
+"""
+import threading
+from flask import current_app
+
+_lock = threading.RLock()
+_settings = {}
+_genai = None
+_cloudinary_uploader = None
+
+
+def init_app(app):
+    """记录第三方服务的配置，不导入任何 SDK"""
+    _settings.update(
+        gemini_api_key=app.config.get('GEMINI_API_KEY'),
+        cloudinary=dict(
+            cloud_name=app.config.get("CLOUDINARY_CLOUD_NAME"),
+            api_key=app.config.get("CLOUDINARY_API_KEY"),
+            api_secret=app.config.get("CLOUDINARY_API_SECRET"),
+        ),
+    )
+
+
+def start_warm_up(app):
+    """在后台线程中提前初始化，不阻塞启动"""
+    threading.Thread(target=warm_up, args=(app,), name='warm-up', daemon=True).start()
+
+
+def get_genai():
+    """返回已配置 API 密钥的 google.generativeai 模块"""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                try:
+                    genai.configure(api_key=_settings.get('gemini_api_key'))
+                except Exception as e:
+                    print(f"Gemini API configuration failed: {e}")
+                _genai = genai
+    return _genai
+
+
+def get_cloudinary_uploader():
+    """返回已配置好的 cloudinary.uploader 模块"""
+    global _cloudinary_uploader
+    if _cloudinary_uploader is None:
+        with _lock:
+            if _cloudinary_uploader is None:
+                import cloudinary
+                import cloudinary.uploader
+                # 确保使用关键字参数来调用 config 函数
+                cloudinary.config(**_settings.get('cloudinary', {}))
+                _cloudinary_uploader = cloudinary.uploader
+    return _cloudinary_uploader
+
+
+def get_oauth():
+    """返回当前应用的 OAuth 客户端（第一次登录时才创建并注册 google）"""
+    app = current_app._get_current_object()
+    oauth = app.extensions.get('oauth_client')
+    if oauth is None:
+        with _lock:
+            oauth = app.extensions.get('oauth_client')
+            if oauth is None:
+                from authlib.integrations.flask_client import OAuth
+                oauth = OAuth(app)
+                oauth.register(
+                    name='google',
+                    client_id=app.config['GOOGLE_CLIENT_ID'],
+                    client_secret=app.config['GOOGLE_CLIENT_SECRET'],
+                    access_token_url='https://accounts.google.com/o/oauth2/token',
+                    access_token_params=None,
+                    authorize_url='https://accounts.google.com/o/oauth2/auth',
+                    authorize_params=None,
+                    api_base_url='https://www.googleapis.com/oauth2/v1/',
+                    userinfo_endpoint='https://openidconnect.googleapis.com/v1/userinfo',
+                    client_kwargs={'scope': 'openid email profile'},
+                    jwks_uri="https://www.googleapis.com/oauth2/v3/certs",
+                )
+                app.extensions['oauth_client'] = oauth
+    return oauth
+
+
+def warm_up(app):
+    """提前导入 SDK 并创建模型客户端；失败只打印，不影响正常请求"""
+    try:
+        with app.app_context():
+            get_genai()
+            get_cloudinary_uploader()
+            get_oauth()
+            from . import services
+            if services.model:
+                services.model.warm_up()
+        print("Warm-up finished.")
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
@@ -0,0 +1,265 @@
+"""
+按题目对学生回答做近似重复聚类（MinHash + LSH）
+
+- 回答规范化（小写、去标点）后切成 5 字符的 shingle，计算 64 个值的 MinHash 签名。
+  使用单次置换哈希（one-permutation hashing）: 每个 shingle 只哈希一次，按高位分到 64 个桶中取最小值，
+  空桶向右借最近的非空桶。比 64 个独立哈希函数快约 25 倍（每条回答约 0.1 毫秒），估计精度相当
+- 签名分成 16 段（每段 4 个值），每段哈希成一个 LSH 桶；Jaccard 相似度约 0.5 以上的回答大概率落入同一个桶
+- 与同桶聚类代表答案的估计相似度不低于 ANSWER_CLUSTER_THRESHOLD 时加入该聚类，否则新建聚类
+
+聚类是增量计算的: responses.cluster_id 为空的回答就是新回答，update_clusters 只处理这些。
+保存新回答的路径（评估接口、任务队列、批量评估）调用 schedule_update，由后台线程分配聚类；
+聚类列表和摘要只读取已有的聚类，不在 GET 请求中写数据库。其他方式导入的回答用 `flask cluster-answers` 处理。
+每个聚类只保存代表答案、256 字节的签名和 16 个桶；聚类大小由 GROUP BY cluster_id 实时统计。
+多个进程同时更新同一题目时可能把一组重复答案分成两个聚类，只影响压缩率，不影响正确性。
+"""
+import hashlib
+import re
+import threading
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import bindparam, distinct, func
+from . import db
+from .models import Response, AnswerCluster, AnswerClusterBucket
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+_MASK64 = (1 << 64) - 1
+_MAX_HASH = (1 << 32) - 1
+# 固定的乘法哈希常数，保证不同进程、不同版本计算出的签名一致
+_MULTIPLIER = 0x9E3779B97F4A7C15
+_BORROW_OFFSET = 0x9E3779B1
+_lock = threading.Lock()
+
+# 后台聚类任务: 同一题目同时只排队一次
+_executor = None
+_executor_lock = threading.Lock()
+_scheduled = set()
+
+
+def normalize(text):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', (text or '').lower()).split())
+
+
+def shingles(text):
+    """规范化文本的 5 字符 shingle 的 32 位哈希集合"""
+    normalized = normalize(text).encode('utf-8')
+    if len(normalized) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalized)}
+    return {zlib.crc32(normalized[i:i + SHINGLE_SIZE]) for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    bins = [None] * NUM_PERM
+    for h in shingles(text):
+        mixed = ((h + 1) * _MULTIPLIER) & _MASK64
+        # 高 6 位选桶，中间 32 位作为值（乘法哈希的低位混合得不好）
+        index, value = mixed >> 58, (mixed >> 26) & _MAX_HASH
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    values = list(bins)
+    for i in range(NUM_PERM):
+        if bins[i] is None:
+            distance = 1
+            while bins[(i + distance) % NUM_PERM] is None:
+                distance += 1
+            values[i] = (bins[(i + distance) % NUM_PERM] + distance * _BORROW_OFFSET) & _MAX_HASH
+    return array('I', values)
+
+
+def similarity(sig_a, sig_b):
+    """估计的 Jaccard 相似度: 两个签名中相等位置的比例"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def band_buckets(sig):
+    """每一段签名的 64 位有符号哈希（带段号，不同段不会互相碰撞）"""
+    buckets = []
+    for band in range(BANDS):
+        part = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + part, digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big', signed=True))
+    return buckets
+
+
+class _PromptIndex:
+    """一个题目已有聚类的内存索引（桶 -> 聚类，聚类 -> 签名）"""
+
+    def __init__(self, prompt_id):
+        self.prompt_id = prompt_id
+        self.signatures = {}
+        self.buckets = {}
+        self.exact = {}
+        for cluster_id, raw in db.session.query(AnswerCluster.id, AnswerCluster.signature) \
+                .filter(AnswerCluster.prompt_id == prompt_id):
+            self.signatures[cluster_id] = array('I', raw)
+        for bucket, cluster_id in db.session.query(AnswerClusterBucket.bucket, AnswerClusterBucket.cluster_id) \
+                .filter(AnswerClusterBucket.prompt_id == prompt_id):
+            self.buckets.setdefault(bucket, []).append(cluster_id)
+
+    def assign(self, response_id, answer, threshold):
+        """返回回答所属的聚类 id，没有足够相似的聚类时新建一个"""
+        # 规范化后完全相同的回答很常见，直接复用，不必计算签名
+        key = normalize(answer)
+        if key in self.exact:
+            return self.exact[key]
+
+        sig = signature(answer)
+        buckets = band_buckets(sig)
+        best_id, best_score = None, threshold
+        for candidate in {c for bucket in buckets for c in self.buckets.get(bucket, ())}:
+            score = similarity(sig, self.signatures[candidate])
+            if score >= best_score:
+                best_id, best_score = candidate, score
+
+        if best_id is None:
+            cluster = AnswerCluster(prompt_id=self.prompt_id, representative_id=response_id,
+                                    representative_answer=answer, signature=sig.tobytes())
+            db.session.add(cluster)
+            db.session.flush()
+            best_id = cluster.id
+            self.signatures[best_id] = sig
+            for bucket in set(buckets):
+                self.buckets.setdefault(bucket, []).append(best_id)
+                db.session.add(AnswerClusterBucket(prompt_id=self.prompt_id, bucket=bucket, cluster_id=best_id))
+        self.exact[key] = best_id
+        return best_id
+
+
+def update_clusters(prompt_id=None, batch_size=1000):
+    """
+    把还没有聚类的回答分配到聚类中（prompt_id 为 None 或 'all' 时处理所有题目）。
+    返回本次处理的回答数。
+    """
+    threshold = current_app.config.get('ANSWER_CLUSTER_THRESHOLD', 0.6)
+    pending = db.session.query(Response.question).filter(Response.cluster_id.is_(None))
+    if prompt_id and prompt_id != 'all':
+        pending = pending.filter(Response.question == prompt_id)
+    prompt_ids = [row.question for row in pending.distinct()]
+
+    # 只更新 cluster_id，updated_at 保持不变（否则仪表盘的变更流会把所有回答当作修改过）
+    table = Response.__table__
+    assign = table.update().where(table.c.id == bindparam('response_id')) \
+        .values(cluster_id=bindparam('assigned_cluster'), updated_at=table.c.updated_at)
+
+    processed = 0
+    with _lock:
+        for prompt in prompt_ids:
+            index = None
+            while True:
+                rows = db.session.query(Response.id, Response.student_answer) \
+                    .filter(Response.question == prompt, Response.cluster_id.is_(None)) \
+                    .order_by(Response.id).limit(batch_size).all()
+                if not rows:
+                    break
+                index = index or _PromptIndex(prompt)
+                assignments = [{'response_id': row.id,
+                                'assigned_cluster': index.assign(row.id, row.student_answer, threshold)}
+                               for row in rows]
+                db.session.execute(assign, assignments)
+                db.session.commit()
+                processed += len(rows)
+    return processed
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='answer-clusters')
+    return _executor
+
+
+def _run_update(app, prompt_id):
+    # 先移出排队集合: 执行期间保存的新回答会再提交一次，不会漏掉
+    with _executor_lock:
+        _scheduled.discard(prompt_id)
+    with app.app_context():
+        try:
+            update_clusters(prompt_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Clustering answers for {prompt_id} failed: {e}")
+
+
+def schedule_update(prompt_id=None):
+    """保存新回答后调用: 在后台为这些回答分配聚类（JOBS_EAGER 时在当前线程中执行）"""
+    app = current_app._get_current_object()
+    prompt_id = prompt_id or 'all'
+    if app.config.get('JOBS_EAGER'):
+        update_clusters(prompt_id)
+        return
+    with _executor_lock:
+        if prompt_id in _scheduled:
+            return
+        _scheduled.add(prompt_id)
+    _get_executor().submit(_run_update, app, prompt_id)
+
+
+def cluster_sizes(prompt_id, min_size=1, limit=None):
+    """按大小倒序返回 [(聚类, 回答数)]"""
+    size = func.count(Response.id)
+    query = db.session.query(Response.cluster_id, size) \
+        .filter(Response.question == prompt_id, Response.cluster_id.isnot(None)) \
+        .group_by(Response.cluster_id).having(size >= min_size) \
+        .order_by(size.desc(), Response.cluster_id)
+    if limit:
+        query = query.limit(limit)
+    counts = query.all()
+    clusters = {c.id: c for c in AnswerCluster.query.filter(AnswerCluster.id.in_([c for c, _ in counts]))}
+    return [(clusters[cluster_id], count) for cluster_id, count in counts if cluster_id in clusters]
+
+
+def prompt_totals(prompt_id):
+    """返回 (回答数, 聚类数)；两者之差就是聚类后不必再读的重复答案数"""
+    return db.session.query(func.count(Response.id), func.count(distinct(Response.cluster_id))) \
+        .filter(Response.question == prompt_id).one()
+
+
+def unclustered_count(prompt_id):
+    """还没有分配聚类的回答数（后台任务尚未处理）"""
+    return db.session.query(func.count(Response.id)) \
+        .filter(Response.question == prompt_id, Response.cluster_id.is_(None)).scalar()
+
+
+def collapse_duplicates(rows):
+    """
+    把 (student_answer, cluster_id) 列表压缩为每个聚类一条: 第一条回答作为代表，
+    多于一条时前面加上 "[N similar answers]"，供摘要提示词使用
+    """
+    groups = {}
+    for answer, cluster_id in rows:
+        key = cluster_id if cluster_id is not None else ('single', len(groups))
+        if key in groups:
+            groups[key][1] += 1
+        else:
+            groups[key] = [answer, 1]
+    return [answer if count == 1 else f"[{count} similar answers] {answer}" for answer, count in groups.values()]
+
+
+def clear_clusters(prompt_id=None):
+    """删除题目（None 时全部题目）的聚类；回答被清空后调用"""
+    for model in (AnswerClusterBucket, AnswerCluster):
+        query = model.query
+        if prompt_id:
+            query = query.filter(model.prompt_id == prompt_id)
+        query.delete(synchronize_session=False)
+
+
+def reset_clusters(prompt_id=None):
+    """
+    删除聚类并把回答标记为未聚类，下次 update_clusters 时全部重新计算（例如修改阈值后）。
+    调用者负责随后调用 update_clusters 或 schedule_update
+    """
+    clear_clusters(prompt_id)
+    table = Response.__table__
+    reset = table.update().values(cluster_id=None, updated_at=table.c.updated_at)
+    if prompt_id:
+        reset = reset.where(table.c.question == prompt_id)
+    db.session.execute(reset)
+    db.session.commit()
@@ -0,0 +1,71 @@
+"""
+流式导出 responses（CSV 或 NDJSON，可选 gzip）
+
+使用服务器端游标（stream_results + yield_per）分批读取，逐行写出，
+无论表有多大，内存占用都保持平稳。
+"""
+import csv
+import io
+import itertools
+import json
+import zlib
+from . import db
+from . import queries
+from .models import Response
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def build_export_query(args):
+    """根据筛选参数构建导出查询，返回 (query, fields)；参数不合法时抛出 ValueError"""
+    fields = queries.parse_fields(args.get('fields'))
+    query = db.session.query(*[queries.RESPONSE_COLUMNS[f].label(f) for f in fields])
+    query = queries.apply_response_filters(query, args)
+    return query.order_by(Response.id), fields
+
+
+def iter_rows(query, fields, batch_size=1000):
+    streamed = query.execution_options(stream_results=True, yield_per=batch_size)
+    for row in streamed:
+        yield queries.serialize_row(row, fields)
+
+
+def iter_csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        # 每写满一段就输出，避免在内存中累积
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip 格式
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def generate_export(query, fields, fmt='csv', compress=False, batch_size=1000, archived=None):
+    """返回导出内容的 bytes 迭代器；archived 是归档中的记录（archive.archived_rows），写在热表的行之前"""
+    rows = iter_rows(query, fields, batch_size)
+    if archived is not None:
+        rows = itertools.chain(archived, rows)
+    text_chunks = iter_csv(rows, fields) if fmt == 'csv' else iter_ndjson(rows)
+    encoded = (chunk.encode('utf-8') for chunk in text_chunks if chunk)
+    return iter_gzip(encoded) if compress else encoded
@@ -0,0 +1,196 @@
+"""
+异步评估任务队列
+
+responses 表本身就是队列：待评估的答案先以 status='pending' 写入，
+再交给本进程的线程池处理。
+- 通过带条件的 UPDATE 领取任务，多个 gunicorn worker 不会重复处理同一行
+- 暂时性失败（模型不可用、超时）按指数退避（带随机抖动）重试：任务放回 pending，由计时器延迟后重新提交，
+  等待期间不占用线程池；题目不存在等永久错误不重试，直接标记为 failed。
+  重试只在这一层进行，评估时模型客户端只尝试一次（llm_single_attempt）
+- 进程崩溃后遗留的任务由后台巡检线程重新入队（启动时一次，之后每 JOB_RECOVERY_INTERVAL 秒一次），
+  也可以手动执行 `flask recover-jobs`
+- 任务状态只能凭随机生成的 job_key 查询，自增的行 id 不会暴露给调用方
+"""
+import random
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import and_, or_, update
+from . import db
+from .models import Response
+from . import services
+from . import clustering
+from .llm_client import llm_single_attempt
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+DONE = 'done'
+FAILED = 'failed'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    """返回任务线程池"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=app.config.get('JOB_QUEUE_WORKERS', 4),
+                    thread_name_prefix='eval-job'
+                )
+    return _executor
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def submit(job_id):
+    """把任务交给线程池（JOBS_EAGER 时在当前线程内直接执行）"""
+    app = current_app._get_current_object()
+    if app.config.get('JOBS_EAGER'):
+        process_job(job_id)
+        return
+    _get_executor(app).submit(_run_job, app, job_id)
+
+
+def enqueue_evaluation(student_id, prompt_id, student_answer):
+    """保存一条待评估的 Response 并入队，返回该行"""
+    job = Response(
+        student_id=student_id,
+        question=prompt_id,
+        student_answer=student_answer,
+        ai_feedback='',
+        status=PENDING,
+        job_key=secrets.token_urlsafe(24)
+    )
+    db.session.add(job)
+    db.session.commit()
+    submit(job.id)
+    return db.session.get(Response, job.id)
+
+
+def _run_job(app, job_id):
+    with app.app_context():
+        try:
+            process_job(job_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Evaluation job {job_id} crashed: {e}")
+
+
+def claim_job(job_id):
+    """原子地领取任务；只有 pending 或租约已过期的任务才能被领取"""
+    lease_cutoff = _now() - timedelta(seconds=current_app.config.get('JOB_LEASE_SECONDS', 300))
+    result = db.session.execute(
+        update(Response)
+        .where(Response.id == job_id)
+        .where(or_(
+            Response.status == PENDING,
+            and_(Response.status == PROCESSING, Response.locked_at < lease_cutoff)
+        ))
+        .values(status=PROCESSING, locked_at=_now())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _retry_later(app, job_id, delay):
+    """delay 秒后把任务重新交给线程池；进程在此之前退出时，由 recover_unfinished_jobs 接手"""
+    timer = threading.Timer(delay, lambda: _get_executor(app).submit(_run_job, app, job_id))
+    timer.daemon = True
+    timer.start()
+
+
+def process_job(job_id):
+    """领取并执行一个评估任务，暂时性失败时按退避策略重试"""
+    if not claim_job(job_id):
+        return
+
+    job = db.session.get(Response, job_id)
+    config = current_app.config
+    max_attempts = config.get('JOB_MAX_ATTEMPTS', 3)
+    base_delay = config.get('JOB_RETRY_BASE_DELAY', 1.0)
+
+    while True:
+        job.attempts = (job.attempts or 0) + 1
+        with llm_single_attempt():
+            result = services.evaluate_answer(job.question, job.student_answer)
+        status = services.result_status(result)
+        if status != services.TRANSIENT or job.attempts >= max_attempts:
+            break
+        delay = base_delay * (2 ** (job.attempts - 1))
+        delay += random.uniform(0, delay)
+        if not config.get('JOBS_EAGER'):
+            job.status = PENDING
+            job.locked_at = None
+            db.session.commit()
+            _retry_later(current_app._get_current_object(), job_id, delay)
+            return
+        db.session.commit()
+        time.sleep(delay)
+
+    job.is_ai_generated, job.ai_feedback, job.performance_grade = result
+    job.status = DONE if status == services.OK else FAILED
+    job.locked_at = None
+    db.session.commit()
+    clustering.schedule_update(job.question)
+
+
+def get_job(job_key):
+    """按 job_key 查找评估任务，找不到时返回 None"""
+    if not job_key:
+        return None
+    return Response.query.filter_by(job_key=job_key).first()
+
+
+def recover_unfinished_jobs(pending_grace=0):
+    """
+    重新提交崩溃前没有完成的任务，返回重新入队的数量。
+    pending_grace > 0 时只接手超过这么多秒没有更新的 pending 任务，
+    不去抢本进程里刚入队或正在等待退避重试的任务
+    """
+    now = _now()
+    lease_cutoff = now - timedelta(seconds=current_app.config.get('JOB_LEASE_SECONDS', 300))
+    pending = Response.status == PENDING
+    if pending_grace:
+        pending = and_(pending, Response.updated_at < now - timedelta(seconds=pending_grace))
+    stale_ids = [row.id for row in db.session.query(Response.id).filter(or_(
+        pending,
+        and_(Response.status == PROCESSING, Response.locked_at < lease_cutoff)
+    )).all()]
+    for job_id in stale_ids:
+        submit(job_id)
+    return len(stale_ids)
+
+
+def _recover_all(app, pending_grace):
+    """在应用上下文中恢复评估任务和清除任务，出错只打印"""
+    from . import purge
+    with app.app_context():
+        try:
+            recover_unfinished_jobs(pending_grace)
+            purge.recover_unfinished_purges(pending_grace)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Job recovery sweep failed: {e}")
+
+
+def _recovery_loop(app):
+    interval = app.config.get('JOB_RECOVERY_INTERVAL', 60)
+    # 启动时接手所有遗留任务；之后只接手长时间没有进展的任务
+    _recover_all(app, 0)
+    while interval > 0:
+        time.sleep(interval)
+        _recover_all(app, app.config.get('JOB_LEASE_SECONDS', 300))
+
+
+def start_recovery_sweep(app):
+    """在后台线程中恢复崩溃遗留的任务，不阻塞启动"""
+    threading.Thread(target=_recovery_loop, args=(app,), name='job-recovery', daemon=True).start()
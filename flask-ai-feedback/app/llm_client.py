@@ -0,0 +1,388 @@
+"""
+带容错能力的 LLM 客户端，接口与 genai.GenerativeModel.generate_content 相同
+
+- 每次尝试都有超时（LLM_REQUEST_TIMEOUT），不会让 worker 无限阻塞
+- 失败后按带抖动的指数退避重试
+- 每个模型一个熔断器：连续失败达到阈值后直接跳过该模型，冷却后放行一次试探请求
+- 可选的对冲请求：超过 LLM_HEDGE_AFTER 秒还没返回时再发一个相同的请求，取先完成的
+- 主模型不可用时按 LLM_FALLBACK_MODELS 的顺序换用备用模型
+- 每次请求前先向本地限流器申请配额（见 rate_limiter.py），对冲请求只在有空闲配额时发出
+- 调用方用 llm_deadline() 设置整体截止时间：每次尝试的超时、退避和等待配额都不会超过剩余时间，
+  时间用完后不再重试；流式调用在两个分块之间等待超过 LLM_STREAM_IDLE_TIMEOUT 或截止时间时按超时失败处理；自己负责重试的调用方（任务队列、批量评估）用 llm_single_attempt() 关闭客户端重试
+设置在每次调用时从 current_app.config 读取（没有应用上下文时使用默认值）。
+"""
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait, TimeoutError as FutureTimeoutError
+from flask import current_app, has_app_context
+from .rate_limiter import get_rate_limiter, current_priority, estimate_tokens, RateLimitExceeded
+from . import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULTS = {
+    'LLM_REQUEST_TIMEOUT': 20.0,
+    'LLM_MAX_RETRIES': 2,
+    'LLM_RETRY_BASE_DELAY': 0.5,
+    'LLM_BREAKER_FAILURE_THRESHOLD': 5,
+    'LLM_BREAKER_RESET_SECONDS': 30.0,
+    'LLM_HEDGE_AFTER': 0.0,
+    'LLM_RATE_EXPECTED_OUTPUT_TOKENS': 500,
+    'LLM_STREAM_IDLE_TIMEOUT': 20.0,
+}
+
+_END = object()
+
+
+class LLMUnavailableError(Exception):
+    """所有模型都失败或处于熔断状态"""
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config.get(name, DEFAULTS[name])
+    return DEFAULTS[name]
+
+
+# 整体截止时间（time.monotonic()）和是否只尝试一次；通过 ContextThreadPoolExecutor 传到工作线程
+_deadline = contextvars.ContextVar('llm_deadline', default=None)
+_single_attempt = contextvars.ContextVar('llm_single_attempt', default=False)
+
+
+@contextmanager
+def llm_deadline(seconds):
+    """在 seconds 秒内完成其中的所有模型调用（包括重试）；嵌套时取较早的截止时间"""
+    if not seconds:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(min(deadline, outer) if outer is not None else deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """距截止时间的秒数；没有设置截止时间时返回 None"""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+@contextmanager
+def llm_single_attempt():
+    """其中的模型调用失败后不在客户端重试（备用模型仍会尝试），由调用方决定何时重试"""
+    token = _single_attempt.set(True)
+    try:
+        yield
+    finally:
+        _single_attempt.reset(token)
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self, reset_seconds):
+        """是否允许发出请求；熔断冷却结束后只放行一个试探请求"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= reset_seconds:
+                self.state = HALF_OPEN
+                return True
+            return self.state == CLOSED
+
+    def release(self):
+        """
+        allow() 放行后没有真正发出请求（退避超过截止时间、限流、流被放弃等）时调用:
+        归还试探名额，下次 allow() 时重新放行；已关闭的熔断器不受影响
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self, threshold):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class LatencyTracker:
+    """保存最近若干次成功调用的耗时，用于计算分位数"""
+
+    def __init__(self, size=1000):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentiles(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {'count': 0, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+
+        def pick(q):
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1)
+        return {'count': len(samples), 'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+
+
+def _wait_budget(limiter, priority, remaining):
+    """等待配额的时间不超过截止时间；没有截止时间时使用该优先级的默认预算"""
+    budget = limiter.wait_budgets.get(priority, 0.0)
+    return budget if remaining is None else min(budget, remaining)
+
+
+class ResilientModel:
+    """按顺序尝试 model_names 中的模型；factory(name) 创建底层模型（默认 genai.GenerativeModel）"""
+
+    def __init__(self, model_names, factory, max_workers=16):
+        self._factory = factory
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self.breakers = {}
+        self.latency = {}
+        self.counters = {'calls': 0, 'retries': 0, 'hedged': 0, 'fallbacks': 0, 'rejected': 0, 'deadline': 0}
+        self._counters_lock = threading.Lock()
+        self._executor = None
+        self.configure(model_names, max_workers)
+
+    def configure(self, model_names, max_workers=16):
+        """设置要尝试的模型和线程池大小（应用启动时按配置调用）；已有模型的熔断器和耗时统计保留"""
+        self.model_names = list(model_names)
+        for name in self.model_names:
+            self.breakers.setdefault(name, CircuitBreaker())
+            self.latency.setdefault(name, LatencyTracker())
+        if self._executor is None or self._executor._max_workers != max_workers:
+            old, self._executor = self._executor, ThreadPoolExecutor(max_workers=max_workers,
+                                                                     thread_name_prefix='llm-client')
+            if old is not None:
+                old.shutdown(wait=False)
+
+    def _count(self, name):
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def _get_model(self, name):
+        with self._models_lock:
+            if name not in self._models:
+                self._models[name] = self._factory(name)
+            return self._models[name]
+
+    def warm_up(self):
+        """提前创建所有底层模型客户端"""
+        for name in self.model_names:
+            self._get_model(name)
+
+    def _attempt(self, model, prompt, kwargs, timeout, hedge_after, can_hedge):
+        """发出一次请求（可能带一个对冲请求），超时抛出 TimeoutError"""
+        started = time.monotonic()
+        futures = [self._executor.submit(model.generate_content, prompt, **kwargs)]
+        if hedge_after and (not timeout or hedge_after < timeout):
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done and can_hedge():
+                self._count('hedged')
+                futures.append(self._executor.submit(model.generate_content, prompt, **kwargs))
+        remaining = timeout - (time.monotonic() - started) if timeout else None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), time.monotonic() - started
+            # 对冲请求中先完成的失败了，继续等另一个
+            error = next(iter(done)).exception()
+            if remaining is not None:
+                remaining = timeout - (time.monotonic() - started)
+        else:
+            raise error
+        # 超时的线程无法被取消，只是不再等待它的结果
+        raise TimeoutError(f"Model call exceeded {timeout}s")
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self._count('calls')
+        if stream:
+            return self._generate_stream(prompt, **kwargs)
+
+        request_timeout = _setting('LLM_REQUEST_TIMEOUT')
+        max_retries = 0 if _single_attempt.get() else _setting('LLM_MAX_RETRIES')
+        base_delay = _setting('LLM_RETRY_BASE_DELAY')
+        threshold = _setting('LLM_BREAKER_FAILURE_THRESHOLD')
+        reset_seconds = _setting('LLM_BREAKER_RESET_SECONDS')
+        hedge_after = _setting('LLM_HEDGE_AFTER')
+        limiter = get_rate_limiter()
+        priority = current_priority()
+        tokens = estimate_tokens(prompt, _setting('LLM_RATE_EXPECTED_OUTPUT_TOKENS'))
+
+        def can_hedge():
+            return limiter is None or limiter.try_acquire(priority, tokens)
+
+        last_error = None
+        for index, name in enumerate(self.model_names):
+            breaker = self.breakers[name]
+            if index > 0:
+                self._count('fallbacks')
+            for attempt in range(max_retries + 1):
+                if not breaker.allow(reset_seconds):
+                    self._count('rejected')
+                    break
+                # 放行之后的每条退出路径都要更新熔断器，否则试探状态会一直占着名额
+                settled = False
+                try:
+                    remaining = remaining_time()
+                    if attempt:
+                        delay = base_delay * (2 ** (attempt - 1))
+                        delay += random.uniform(0, delay)
+                        if remaining is not None and delay >= remaining:
+                            break
+                        self._count('retries')
+                        time.sleep(delay)
+                        remaining = remaining_time()
+                    if remaining is not None and remaining <= 0:
+                        self._count('deadline')
+                        raise LLMUnavailableError(f"Deadline exceeded before the model answered: {last_error}")
+                    if limiter:
+                        try:
+                            limiter.acquire(priority, tokens, _wait_budget(limiter, priority, remaining))
+                        except RateLimitExceeded as e:
+                            raise LLMUnavailableError(str(e)) from e
+                        remaining = remaining_time()
+                    # 单次请求的超时不超过剩余时间
+                    timeout = request_timeout
+                    if remaining is not None:
+                        timeout = min(timeout, remaining) if timeout else remaining
+                    started = time.monotonic()
+                    try:
+                        result, elapsed = self._attempt(self._get_model(name), prompt, kwargs, timeout,
+                                                        hedge_after, can_hedge)
+                    except Exception as e:
+                        print(f"LLM call to {name} failed (attempt {attempt + 1}): {e}")
+                        outcome = 'timeout' if isinstance(e, TimeoutError) else 'error'
+                        metrics.record_llm_call(name, time.monotonic() - started, outcome)
+                        breaker.record_failure(threshold)
+                        settled = True
+                        last_error = e
+                        continue
+                    breaker.record_success()
+                    settled = True
+                    self.latency[name].record(elapsed)
+                    metrics.record_llm_call(name, elapsed, 'ok', prompt, result)
+                    return result
+                finally:
+                    if not settled:
+                        breaker.release()
+        raise LLMUnavailableError(f"All models failed or are unavailable: {last_error}")
+
+    def _generate_stream(self, prompt, **kwargs):
+        """流式调用不重试也不对冲，只选择第一个未熔断的模型，并把结果记录到熔断器"""
+        threshold = _setting('LLM_BREAKER_FAILURE_THRESHOLD')
+        reset_seconds = _setting('LLM_BREAKER_RESET_SECONDS')
+        idle_timeout = _setting('LLM_STREAM_IDLE_TIMEOUT')
+        # 流会在 llm_deadline() 之外被逐块读取，这里记下创建时的截止时间
+        deadline = _deadline.get()
+        limiter = get_rate_limiter()
+        for name in self.model_names:
+            breaker = self.breakers[name]
+            if not breaker.allow(reset_seconds):
+                self._count('rejected')
+                continue
+            if limiter:
+                priority = current_priority()
+                try:
+                    limiter.acquire(priority, estimate_tokens(prompt, _setting('LLM_RATE_EXPECTED_OUTPUT_TOKENS')),
+                                    _wait_budget(limiter, priority, remaining_time()))
+                except BaseException as e:
+                    breaker.release()
+                    if isinstance(e, RateLimitExceeded):
+                        raise LLMUnavailableError(str(e)) from e
+                    raise
+            try:
+                chunks = self._get_model(name).generate_content(prompt, stream=True, **kwargs)
+            except Exception as e:
+                breaker.record_failure(threshold)
+                print(f"LLM stream to {name} failed: {e}")
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            return self._track_stream(name, prompt, chunks, threshold, metrics.current_llm_labels(),
+                                      idle_timeout, deadline)
+        raise LLMUnavailableError("All models failed or are unavailable")
+
+    def _next_chunk(self, iterator, idle_timeout, deadline):
+        """取下一个分块（结束时返回 _END）；等待超过空闲超时或截止时间时抛出 TimeoutError"""
+        timeout = idle_timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Deadline exceeded while streaming")
+            timeout = min(timeout, remaining) if timeout else remaining
+        if not timeout:
+            return next(iterator, _END)
+        # 与 _attempt 相同，超时的线程无法被取消，只是不再等待它
+        future = self._executor.submit(next, iterator, _END)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"No stream chunk within {timeout:.1f}s") from None
+
+    def _track_stream(self, name, prompt, chunks, threshold, labels, idle_timeout, deadline):
+        started = time.monotonic()
+        output_chars = 0
+        try:
+            iterator = iter(chunks)
+            while True:
+                chunk = self._next_chunk(iterator, idle_timeout, deadline)
+                if chunk is _END:
+                    break
+                output_chars += len(getattr(chunk, 'text', '') or '')
+                yield chunk
+        except Exception as e:
+            self.breakers[name].record_failure(threshold)
+            outcome = 'timeout' if isinstance(e, TimeoutError) else 'error'
+            metrics.record_llm_call(name, time.monotonic() - started, outcome, labels=labels)
+            raise
+        except BaseException:
+            # 调用方放弃了这个流（GeneratorExit）: 不算模型失败，只归还试探名额
+            self.breakers[name].release()
+            raise
+        elapsed = time.monotonic() - started
+        self.breakers[name].record_success()
+        self.latency[name].record(elapsed)
+        metrics.record_llm_call(name, elapsed, 'ok', prompt, output_tokens=output_chars // 4 + 1, labels=labels)
+
+    def stats(self):
+        with self._counters_lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            'models': [
+                {'name': name, **self.breakers[name].snapshot(), 'latency': self.latency[name].percentiles()}
+                for name in self.model_names
+            ]
+        }
@@ -0,0 +1,280 @@
+"""
+请求、数据库查询和模型调用的耗时统计，以 Prometheus 文本格式在 /metrics 输出
+
+METRICS_ENABLED 为 False 时不注册任何钩子、事件或路由，span() 直接返回空的上下文管理器，
+几乎没有额外开销。METRICS_JSON_LOGS 为 True 时每个请求额外输出一行 JSON 日志，
+包含总耗时以及数据库查询和模型调用的次数和耗时。
+统计保存在进程内；多个 gunicorn worker 时每个 worker 分别被抓取。
+/metrics 需要 METRICS_TOKEN（Bearer 令牌）或已登录的教师才能访问。
+"""
+import bisect
+import contextlib
+import hmac
+import contextvars
+import json
+import threading
+import time
+from flask import current_app, g, request, Response as HTTPResponse
+from flask_login import current_user
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 当前请求的端点名和累计耗时；线程池中的任务通过复制 contextvars 继承
+_request_endpoint = contextvars.ContextVar('metrics_endpoint', default='none')
+_request_totals = contextvars.ContextVar('metrics_totals', default=None)
+_llm_prompt_id = contextvars.ContextVar('metrics_prompt_id', default='none')
+
+_registry = None
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def inc(self, name, labels, value=1, help_text=''):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, ('counter', help_text))
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, labels, value, help_text=''):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, ('histogram', help_text))
+            series = self._histograms.setdefault(name, {})
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = [[0] * len(DEFAULT_BUCKETS), 0.0, 0]
+            index = bisect.bisect_left(DEFAULT_BUCKETS, value)
+            if index < len(DEFAULT_BUCKETS):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        """输出 Prometheus 文本格式"""
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ''
+            escaped = (k + '="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+                       for k, v in items)
+            return '{' + ','.join(escaped) + '}'
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                _, help_text = self._help[name]
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{fmt(labels)} {value}" for labels, value in sorted(series.items())]
+            for name, series in sorted(self._histograms.items()):
+                _, help_text = self._help[name]
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, (buckets, total, count) in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(DEFAULT_BUCKETS, buckets):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{fmt(labels)} {total}")
+                    lines.append(f"{name}_count{fmt(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+class _RequestTotals:
+    """一个请求中数据库查询和模型调用的累计次数和耗时"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def add(self, kind, seconds):
+        with self.lock:
+            if kind == 'db':
+                self.db_queries += 1
+                self.db_seconds += seconds
+            else:
+                self.llm_calls += 1
+                self.llm_seconds += seconds
+
+
+def enabled():
+    return _registry is not None
+
+
+@contextlib.contextmanager
+def _timed_span(name, labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registry.observe('span_duration_seconds', {'span': name, 'endpoint': _request_endpoint.get(), **labels},
+                          time.perf_counter() - started, 'Duration of instrumented operations.')
+
+
+def span(name, **labels):
+    """统计一段代码的耗时；未启用时不做任何事"""
+    if _registry is None:
+        return contextlib.nullcontext()
+    return _timed_span(name, labels)
+
+
+@contextlib.contextmanager
+def llm_labels(prompt_id):
+    """
+    在这个代码块中发出的模型调用带上 prompt_id 标签。
+    只传入已确认存在的题目 id（否则传 'unknown'），请求中任意的 prompt_id 不应产生新的时间序列
+    """
+    token = _llm_prompt_id.set(prompt_id or 'none')
+    try:
+        yield
+    finally:
+        _llm_prompt_id.reset(token)
+
+
+def _token_count(response, attribute):
+    usage = getattr(response, 'usage_metadata', None)
+    value = getattr(usage, attribute, None) if usage is not None else None
+    return value if isinstance(value, int) else None
+
+
+def current_llm_labels():
+    """当前的端点和 prompt_id 标签；流式调用在开始时取得，结束时再记录"""
+    return {'endpoint': _request_endpoint.get(), 'prompt_id': _llm_prompt_id.get()}
+
+
+def record_llm_call(model_name, seconds, outcome, prompt=None, response=None, output_tokens=None, labels=None):
+    """记录一次模型请求的耗时和 token 数（没有 usage_metadata 时按 4 个字符一个 token 估算）"""
+    if _registry is None:
+        return
+    labels = {'model': model_name, **(labels or current_llm_labels())}
+    _registry.observe('llm_request_duration_seconds', {**labels, 'outcome': outcome}, seconds,
+                      'Latency of individual model requests.')
+    totals = _request_totals.get()
+    if totals is not None:
+        totals.add('llm', seconds)
+    if outcome != 'ok':
+        return
+    prompt_tokens = _token_count(response, 'prompt_token_count')
+    if prompt_tokens is None and prompt is not None:
+        prompt_tokens = len(str(prompt)) // 4 + 1
+    if output_tokens is None:
+        output_tokens = _token_count(response, 'candidates_token_count')
+    if output_tokens is None:
+        try:
+            text = response.text
+        except Exception:
+            # 被安全过滤拦截的回答访问 text 会抛出异常
+            text = None
+        output_tokens = len(text) // 4 + 1 if isinstance(text, str) else 0
+    help_text = 'Tokens sent to and received from the model.'
+    _registry.inc('llm_tokens_total', {**labels, 'kind': 'prompt'}, prompt_tokens or 0, help_text)
+    _registry.inc('llm_tokens_total', {**labels, 'kind': 'output'}, output_tokens, help_text)
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    g._metrics_tokens = (_request_endpoint.set(request.endpoint or 'none'),
+                         _request_totals.set(_RequestTotals()))
+
+
+def _after_request(response):
+    started = getattr(g, '_metrics_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'none'
+    _registry.inc('http_requests_total',
+                  {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)},
+                  help_text='HTTP requests handled.')
+    _registry.observe('http_request_duration_seconds', {'endpoint': endpoint, 'method': request.method},
+                      elapsed, 'Time spent handling HTTP requests (streamed bodies excluded).')
+
+    if g.get('_metrics_json_logs'):
+        totals = _request_totals.get()
+        print(json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'db_queries': totals.db_queries if totals else 0,
+            'db_ms': round(totals.db_seconds * 1000, 2) if totals else 0,
+            'llm_calls': totals.llm_calls if totals else 0,
+            'llm_ms': round(totals.llm_seconds * 1000, 2) if totals else 0,
+        }), flush=True)
+    return response
+
+
+def _teardown_request(exc):
+    tokens = g.pop('_metrics_tokens', None)
+    if tokens:
+        try:
+            _request_endpoint.reset(tokens[0])
+            _request_totals.reset(tokens[1])
+        except ValueError:
+            # 流式响应可能在另一个上下文中结束
+            pass
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get('_metrics_query_started')
+    if not stack or _registry is None:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    _registry.observe('db_query_duration_seconds', {'endpoint': _request_endpoint.get()}, elapsed,
+                      'Time spent in database queries.')
+    totals = _request_totals.get()
+    if totals is not None:
+        totals.add('db', elapsed)
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        allowed = hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {token}".encode('utf-8'))
+    else:
+        allowed = current_user.is_authenticated
+    if not allowed:
+        return HTTPResponse('Unauthorized\n', status=401, mimetype='text/plain')
+    return HTTPResponse(_registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """METRICS_ENABLED 为 False 时什么都不注册"""
+    global _registry
+    if not app.config.get('METRICS_ENABLED', False):
+        _registry = None
+        return
+    from . import db
+
+    _registry = Registry()
+    json_logs = app.config.get('METRICS_JSON_LOGS', False)
+
+    @app.before_request
+    def start_timer():
+        g._metrics_json_logs = json_logs
+        _before_request()
+
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -18,6 +18,8 @@ class Question(db.Model):
     ai_prompt = db.Column(db.Text, nullable=False)
     image_url = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
 
 class Response(db.Model):
     __tablename__ = 'responses'
@@ -30,4 +32,107 @@ class Response(db.Model):
     rating = db.Column(db.Integer)
     feedback_comment = db.Column(db.Text)
     is_ai_generated = db.Column(db.Boolean, default=False, nullable=False)
-    performance_grade = db.Column(db.String(50))
\ No newline at end of file
+    performance_grade = db.Column(db.String(50))
+    # 异步评估任务状态: pending / processing / done / failed
+    status = db.Column(db.String(20), nullable=False, default='done', server_default='done', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    locked_at = db.Column(db.DateTime, nullable=True)
+    # 异步任务的查询凭据（随机生成，不可猜测），状态端点只按它查找任务
+    job_key = db.Column(db.String(64), nullable=True, unique=True)
+    # 插入或修改（评分、异步评估完成）时更新，供仪表盘的变更推送使用
+    updated_at = db.Column(db.DateTime, nullable=True, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+    # 近似重复聚类（AnswerCluster.id）；为空表示还没有被聚类
+    cluster_id = db.Column(db.Integer, nullable=True)
+
+# 仪表盘和管理操作按题目筛选、按时间倒序排列；(timestamp, id) 用于游标分页
+db.Index('ix_responses_question_timestamp', Response.question, Response.timestamp.desc())
+db.Index('ix_responses_question_is_ai', Response.question, Response.is_ai_generated)
+db.Index('ix_responses_timestamp_id', Response.timestamp.desc(), Response.id.desc())
+db.Index('ix_responses_student_id', Response.student_id)
+db.Index('ix_responses_updated_at_id', Response.updated_at, Response.id)
+db.Index('ix_responses_question_cluster', Response.question, Response.cluster_id)
+
+class LLMResultCache(db.Model):
+    """LLM 评估结果缓存（数据库后端）"""
+    __tablename__ = 'llm_result_cache'
+    key = db.Column(db.String(64), primary_key=True)
+    prompt_id = db.Column(db.String(100), nullable=False, index=True)
+    value = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+class CacheVersion(db.Model):
+    """跨 worker 共享的缓存版本号，数据变化时递增"""
+    __tablename__ = 'cache_versions'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class PromptSummary(db.Model):
+    """每个题目最近一次生成的班级摘要，以及它覆盖到的最大 response id"""
+    __tablename__ = 'prompt_summaries'
+    prompt_id = db.Column(db.String(100), primary_key=True)  # 'all' 表示全部题目
+    summary = db.Column(db.Text, nullable=False)
+    watermark_id = db.Column(db.Integer, nullable=False)
+    response_count = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+
+class AnswerCluster(db.Model):
+    """同一题目下近似重复的一组回答；代表答案是最早的一条"""
+    __tablename__ = 'answer_clusters'
+    id = db.Column(db.Integer, primary_key=True)
+    prompt_id = db.Column(db.String(100), nullable=False, index=True)
+    representative_id = db.Column(db.Integer, nullable=False)
+    representative_answer = db.Column(db.Text, nullable=False)
+    # 代表答案的 MinHash 签名（64 个 uint32，共 256 字节）
+    signature = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+class AnswerClusterBucket(db.Model):
+    """LSH 分桶: 签名的每一段（band）哈希到一个桶，同桶的聚类才需要比较"""
+    __tablename__ = 'answer_cluster_buckets'
+    prompt_id = db.Column(db.String(100), primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    cluster_id = db.Column(db.Integer, primary_key=True)
+
+class PurgeJob(db.Model):
+    """后台分批删除回答的任务；last_id 之前的行已经删除，中断后从这里继续"""
+    __tablename__ = 'purge_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    prompt_id = db.Column(db.String(100), nullable=True)  # 为空表示全部题目
+    # 只删除创建任务时已经存在的行（id <= cutoff_id），之后提交的回答不受影响
+    cutoff_id = db.Column(db.Integer, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    deleted = db.Column(db.Integer, nullable=False, default=0)
+    archive_path = db.Column(db.String(500), nullable=True)  # 删除前写入的 JSONL.gz 文件
+    # 为 True 时热表删完后同一范围的归档分区也一起删除（只有调用方明确要求时才这样做）
+    drop_archived = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # pending / running / done / failed
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    error = db.Column(db.Text, nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class ArchivePartition(db.Model):
+    """
+    冷数据归档分区（按题目 + 月份或学期）的清单；分区内容是归档目录下的 JSONL.gz 文件。
+    size_bytes 是已提交的文件长度，超出部分是未提交的写入，读取时忽略、下次追加时截掉
+    """
+    __tablename__ = 'archive_partitions'
+    id = db.Column(db.Integer, primary_key=True)
+    prompt_id = db.Column(db.String(100), nullable=False)
+    # 'YYYY-MM'，或归档时指定的学期名称
+    period = db.Column(db.String(100), nullable=False)
+    path = db.Column(db.String(500), nullable=False)  # 相对于分区根目录
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    min_id = db.Column(db.Integer, nullable=True)
+    max_id = db.Column(db.Integer, nullable=True)
+    min_timestamp = db.Column(db.DateTime, nullable=True)
+    max_timestamp = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+    __table_args__ = (db.UniqueConstraint('prompt_id', 'period', name='uq_archive_partitions_prompt_period'),)
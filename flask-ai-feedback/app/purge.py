@@ -0,0 +1,240 @@
+"""
+后台分批删除回答（清空题目、清空全部、删除题目时使用）
+
+一条不加限制的 DELETE 会长时间锁住 responses 表，期间学生无法提交答案。这里改为:
+- 管理端点只创建一条 PurgeJob 记录并立即返回任务 id
+- 后台线程按 id 顺序每次删除 PURGE_BATCH_SIZE 行，每批一个短事务，批之间稍作停顿让其它写入通过
+- 可选: 删除前把整行追加写入 JSONL.gz 归档文件（每批一个 gzip member，可以直接用 gzip 读取整个文件）
+- 每批提交时记录 last_id 和已删除行数，用于报告进度；进程中断后从 last_id 继续
+  （通过租约领取任务，与评估队列相同）。归档是“至少一次”: 在写入归档和提交删除之间崩溃时，
+  这一批会在继续时再写一次，可以按 id 去重
+只删除创建任务时已存在的行（id <= cutoff_id），清空期间新提交的答案会保留下来。
+调用方明确要求（drop_archived）时，热表删完后同一范围（题目或全部）的归档分区也一并删除
+（开启归档时其中的记录先追加到归档文件）；默认保留归档分区。
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import and_, func, or_, update
+from . import db
+from . import summarizer
+from . import clustering
+from .models import Response, PurgeJob
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _get_executor(app):
+    """单线程执行器: 同一时间只运行一个清除任务"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purge-job')
+    return _executor
+
+
+def archive_dir(app=None):
+    app = app or current_app
+    return app.config.get('ARCHIVE_DIR') or os.path.join(app.instance_path, 'archives')
+
+
+def _scope(query, job):
+    query = query.filter(Response.id > job.last_id, Response.id <= job.cutoff_id)
+    if job.prompt_id:
+        query = query.filter(Response.question == job.prompt_id)
+    return query
+
+
+def start_purge(prompt_id=None, archive=None, drop_archived=False):
+    """
+    创建清除任务并提交到后台（JOBS_EAGER 时在当前线程中执行完），返回 PurgeJob。
+    drop_archived 为 True 时同时删除这个范围的归档分区。
+    同时立即让已保存的摘要失效，避免清除期间返回包含旧答案的摘要。
+    """
+    config = current_app.config
+    if archive is None:
+        archive = config.get('PURGE_ARCHIVE', False)
+    scope = db.session.query(func.count(Response.id), func.max(Response.id))
+    if prompt_id:
+        scope = scope.filter(Response.question == prompt_id)
+    total, max_id = scope.one()
+
+    job = PurgeJob(prompt_id=prompt_id, cutoff_id=max_id or 0, total=total, status=PENDING,
+                   drop_archived=bool(drop_archived))
+    db.session.add(job)
+    db.session.flush()
+    if archive:
+        # 文件名只用任务 id: prompt_id 来自请求，可能含有 / 或 ..（题目和范围记录在任务行中）
+        job.archive_path = os.path.join(archive_dir(), f"purge-{job.id}.jsonl.gz")
+    summarizer.invalidate_summaries(prompt_id)
+    db.session.commit()
+    submit(job.id)
+    return db.session.get(PurgeJob, job.id)
+
+
+def submit(job_id):
+    app = current_app._get_current_object()
+    if app.config.get('JOBS_EAGER'):
+        run_purge(job_id)
+        return
+    _get_executor(app).submit(_run_in_app_context, app, job_id)
+
+
+def _run_in_app_context(app, job_id):
+    with app.app_context():
+        try:
+            run_purge(job_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Purge job {job_id} crashed: {e}")
+
+
+def claim_purge(job_id):
+    """原子地领取任务；只有 pending 或租约已过期的任务才能被领取"""
+    lease_cutoff = _now() - timedelta(seconds=current_app.config.get('JOB_LEASE_SECONDS', 300))
+    result = db.session.execute(
+        update(PurgeJob)
+        .where(PurgeJob.id == job_id)
+        .where(or_(
+            PurgeJob.status == PENDING,
+            and_(PurgeJob.status == RUNNING, PurgeJob.locked_at < lease_cutoff)
+        ))
+        .values(status=RUNNING, locked_at=_now())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _archive_record(row):
+    record = {}
+    for column in Response.__table__.columns:
+        value = getattr(row, column.name)
+        record[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    return record
+
+
+def _append_archive(path, rows):
+    """把一批行作为一个新的 gzip member 追加到归档文件末尾"""
+    append_records(path, [_archive_record(row) for row in rows])
+
+
+def append_records(path, records):
+    """把一批记录（字典）作为一个新的 gzip member 追加到归档文件末尾"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(lines.encode('utf-8')))
+
+
+def run_purge(job_id):
+    """领取并执行（或继续）一个清除任务"""
+    if not claim_purge(job_id):
+        return
+    job = db.session.get(PurgeJob, job_id)
+    config = current_app.config
+    batch_size = config.get('PURGE_BATCH_SIZE', 1000)
+    pause = config.get('PURGE_BATCH_PAUSE', 0.05)
+
+    try:
+        while True:
+            if job.archive_path:
+                rows = _scope(Response.query, job).order_by(Response.id).limit(batch_size).all()
+                ids = [row.id for row in rows]
+            else:
+                ids = [row.id for row in _scope(db.session.query(Response.id), job)
+                       .order_by(Response.id).limit(batch_size)]
+            if not ids:
+                break
+            if job.archive_path:
+                _append_archive(job.archive_path, rows)
+
+            # 删除这一批并记录进度，在同一个短事务中提交
+            result = db.session.execute(Response.__table__.delete().where(Response.id.in_(ids)))
+            job.deleted += result.rowcount
+            job.last_id = ids[-1]
+            job.locked_at = _now()
+            db.session.commit()
+            if job.archive_path:
+                # 归档时加载的 ORM 对象已经被删除，释放内存
+                for row in rows:
+                    db.session.expunge(row)
+            if pause:
+                time.sleep(pause)
+
+        if job.drop_archived:
+            # archive 模块依赖本模块，这里延迟导入
+            from . import archive
+            dropped = archive.drop_partitions(job.prompt_id, copy_to=job.archive_path)
+            if dropped:
+                print(f"Purge job {job_id} also dropped {dropped} archived row(s)")
+        _finish(job)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(PurgeJob, job_id)
+        job.status = FAILED
+        job.error = str(e)
+        job.locked_at = None
+        db.session.commit()
+        print(f"Purge job {job_id} failed after deleting {job.deleted} row(s): {e}")
+
+
+def _finish(job):
+    """全部删除后: 再次清除摘要，重置剩余回答的聚类"""
+    summarizer.invalidate_summaries(job.prompt_id)
+    job.status = DONE
+    job.locked_at = None
+    job.finished_at = _now()
+    db.session.commit()
+    # 清除期间新保存的回答重新聚类（已在后台线程中，直接执行）
+    clustering.reset_clusters(job.prompt_id)
+    clustering.update_clusters(job.prompt_id)
+
+
+def recover_unfinished_purges(pending_grace=0):
+    """重新提交中断的清除任务，返回数量；pending_grace 的含义同 jobs.recover_unfinished_jobs"""
+    now = _now()
+    lease_cutoff = now - timedelta(seconds=current_app.config.get('JOB_LEASE_SECONDS', 300))
+    pending = PurgeJob.status == PENDING
+    if pending_grace:
+        pending = and_(pending, PurgeJob.created_at < now - timedelta(seconds=pending_grace))
+    stale_ids = [row.id for row in db.session.query(PurgeJob.id).filter(or_(
+        pending,
+        and_(PurgeJob.status == RUNNING, PurgeJob.locked_at < lease_cutoff)
+    )).order_by(PurgeJob.id).all()]
+    for job_id in stale_ids:
+        submit(job_id)
+    return len(stale_ids)
+
+
+def describe(job):
+    """任务状态的 JSON 表示"""
+    progress = 1.0 if job.status == DONE else (job.deleted / job.total if job.total else 0.0)
+    return {
+        'id': job.id,
+        'prompt_id': job.prompt_id,
+        'status': job.status,
+        'total': job.total,
+        'deleted': job.deleted,
+        'progress': round(min(progress, 1.0), 4),
+        'archive_path': job.archive_path,
+        'drop_archived': job.drop_archived,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,209 @@
+"""
+responses 表的查询辅助函数：筛选条件、字段投影、基于 (timestamp, id) 的游标分页、
+仪表盘统计，以及基于 (updated_at, id) 的变更流
+"""
+import base64
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_, case, func
+from . import db
+from .models import Response
+
+# 还在排队或评估中的异步任务：还没有反馈和评级
+UNFINISHED_STATUSES = ('pending', 'processing')
+
+# 可以通过 fields= 选择的列（只查询需要的列，不创建 ORM 对象）
+RESPONSE_COLUMNS = {
+    'id': Response.id,
+    'student_id': Response.student_id,
+    'question': Response.question,
+    'student_answer': Response.student_answer,
+    'ai_feedback': Response.ai_feedback,
+    'timestamp': Response.timestamp,
+    'rating': Response.rating,
+    'feedback_comment': Response.feedback_comment,
+    'is_ai_generated': Response.is_ai_generated,
+    'performance_grade': Response.performance_grade,
+}
+
+
+def parse_fields(raw_fields):
+    """解析逗号分隔的字段列表；为空时返回全部字段"""
+    if not raw_fields:
+        return list(RESPONSE_COLUMNS)
+    fields = [f.strip() for f in raw_fields.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in RESPONSE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def _parse_datetime(value, name, end_of_day=False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value}")
+    # 只给出日期的结束时间包含当天
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def apply_response_filters(query, args):
+    """
+    把请求参数中的筛选条件应用到查询上；参数不合法时抛出 ValueError。
+    默认不返回还在评估中的回答，?status=pending 等可以明确查询某个状态（?status=all 表示全部）
+    """
+    status = args.get('status')
+    if not status:
+        query = query.filter(Response.status.notin_(UNFINISHED_STATUSES))
+    elif status != 'all':
+        query = query.filter(Response.status == status)
+
+    prompt_id = args.get('prompt_id')
+    if prompt_id and prompt_id != 'all':
+        query = query.filter(Response.question == prompt_id)
+
+    grade = args.get('grade')
+    if grade:
+        query = query.filter(Response.performance_grade == grade)
+
+    rating = args.get('rating')
+    if rating:
+        try:
+            query = query.filter(Response.rating == int(rating))
+        except ValueError:
+            raise ValueError(f"Invalid rating: {rating}")
+
+    is_ai = args.get('is_ai_generated')
+    if is_ai:
+        if is_ai.lower() not in ('true', 'false'):
+            raise ValueError(f"Invalid is_ai_generated: {is_ai}")
+        query = query.filter(Response.is_ai_generated == (is_ai.lower() == 'true'))
+
+    start = args.get('start')
+    if start:
+        query = query.filter(Response.timestamp >= _parse_datetime(start, 'start'))
+    end = args.get('end')
+    if end:
+        query = query.filter(Response.timestamp < _parse_datetime(end, 'end', end_of_day=True))
+    return query
+
+
+def encode_cursor(timestamp, response_id):
+    raw = f"{timestamp.isoformat()}|{response_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, response_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(response_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def apply_cursor(query, cursor):
+    """只保留排在游标之后的行（按 timestamp DESC, id DESC 排序）"""
+    timestamp, response_id = decode_cursor(cursor)
+    return query.filter(or_(
+        Response.timestamp < timestamp,
+        and_(Response.timestamp == timestamp, Response.id < response_id)
+    ))
+
+
+def serialize_row(row, fields):
+    """把按列查询得到的行转换为 JSON 字典"""
+    mapping = row._mapping
+    output = {}
+    for field in fields:
+        value = mapping[field]
+        if field == 'timestamp' and value is not None:
+            value = value.isoformat()
+        output[field] = value
+    return output
+
+
+def feedback_stats(args):
+    """用 GROUP BY 计算仪表盘图表所需的统计数据"""
+    def grouped(*columns):
+        query = db.session.query(*columns)
+        return apply_response_filters(query, args)
+
+    ai_count = func.sum(case((Response.is_ai_generated.is_(True), 1), else_=0))
+    total, ai_flagged = grouped(func.count(Response.id), ai_count).one()
+
+    grades = grouped(Response.performance_grade, func.count(Response.id)) \
+        .filter(Response.performance_grade.isnot(None)) \
+        .group_by(Response.performance_grade).all()
+
+    ratings = {str(r): 0 for r in range(1, 6)}
+    for rating, count in grouped(Response.rating, func.count(Response.id)) \
+            .filter(Response.rating.between(1, 5)).group_by(Response.rating).all():
+        ratings[str(rating)] = count
+
+    day = func.date(Response.timestamp)
+    per_day = grouped(day, func.count(Response.id)).group_by(day).order_by(day).all()
+
+    per_prompt = grouped(Response.question, func.count(Response.id), ai_count) \
+        .group_by(Response.question).order_by(Response.question).all()
+
+    return {
+        'total': total,
+        'ai_flagged': int(ai_flagged or 0),
+        'grades': {grade: count for grade, count in grades},
+        'ratings': ratings,
+        'per_day': [{'date': str(d), 'count': c} for d, c in per_day],
+        'per_prompt': [{'prompt_id': p, 'count': c, 'ai_flagged': int(a or 0)} for p, c, a in per_prompt],
+    }
+
+
+def latest_change_cursor(prompt_id=None):
+    """返回当前最新一次变更的游标；表为空时返回 None"""
+    query = db.session.query(Response.updated_at, Response.id) \
+        .filter(Response.updated_at.isnot(None), Response.status.notin_(UNFINISHED_STATUSES))
+    if prompt_id and prompt_id != 'all':
+        query = query.filter(Response.question == prompt_id)
+    latest = query.order_by(Response.updated_at.desc(), Response.id.desc()).first()
+    return encode_cursor(latest.updated_at, latest.id) if latest else None
+
+
+def changes_since(cursor, prompt_id=None, limit=500, overlap=None):
+    """
+    返回游标之后新插入或被修改的行（按 updated_at, id 升序，每行带有自己的 cursor）
+    以及新的游标。cursor 为 None 时从头开始。还在评估中的回答在完成时（updated_at 更新）才会出现。
+    updated_at 在提交前就已确定，晚提交的事务可能落在游标之前，因此游标之前 overlap 秒内的行
+    （默认 FEEDBACK_CHANGES_OVERLAP_SECONDS，最多 limit 条最新的）会被重新返回，调用者按 id 和 cursor 去重。
+    游标之后的行用单独的 keyset 查询读取，重叠窗口里的行再多也不会让游标停住。
+    """
+    if overlap is None:
+        overlap = current_app.config.get('FEEDBACK_CHANGES_OVERLAP_SECONDS', 5)
+    fields = list(RESPONSE_COLUMNS)
+    query = db.session.query(*[RESPONSE_COLUMNS[f].label(f) for f in fields],
+                             Response.updated_at.label('updated_at')) \
+        .filter(Response.updated_at.isnot(None), Response.status.notin_(UNFINISHED_STATUSES))
+    if prompt_id and prompt_id != 'all':
+        query = query.filter(Response.question == prompt_id)
+
+    rows, reread = query, []
+    if cursor:
+        updated_at, response_id = decode_cursor(cursor)
+        after = or_(
+            Response.updated_at > updated_at,
+            and_(Response.updated_at == updated_at, Response.id > response_id)
+        )
+        rows = query.filter(after)
+        if overlap:
+            reread = query.filter(~after, Response.updated_at >= updated_at - timedelta(seconds=overlap)) \
+                .order_by(Response.updated_at.desc(), Response.id.desc()).limit(limit).all()
+
+    items = []
+    for row in list(reversed(reread)) + rows.order_by(Response.updated_at, Response.id).limit(limit).all():
+        item = serialize_row(row, fields)
+        item['cursor'] = encode_cursor(row.updated_at, row.id)
+        items.append(item)
+    # 只有游标之后的行会推进游标
+    if len(items) > len(reread):
+        cursor = items[-1]['cursor']
+    return items, cursor
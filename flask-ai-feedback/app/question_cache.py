@@ -0,0 +1,123 @@
+"""
+进程内题目缓存
+
+questions 表很小且几乎不变，因此每个 worker 在内存中保存整张表的快照。
+create / update / delete 题目时会递增 cache_versions 表中的版本号；
+其他 worker 最多每 QUESTION_CACHE_CHECK_INTERVAL 秒查询一次版本号，
+发现变化后重新加载。两次检查之间的读取不会访问数据库。
+不存在的 prompt_id 也会记下来（同样在版本变化时清空），避免无效 id 的请求每次都查询数据库。
+"""
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import update
+from . import db
+from .models import Question, CacheVersion
+
+QUESTIONS_VERSION_KEY = 'questions'
+
+QuestionSnapshot = namedtuple('QuestionSnapshot', [
+    'id', 'prompt_id', 'title', 'question_text', 'ai_prompt', 'image_url', 'created_at', 'updated_at'
+])
+
+
+def _snapshot(question):
+    return QuestionSnapshot(
+        id=question.id, prompt_id=question.prompt_id, title=question.title,
+        question_text=question.question_text, ai_prompt=question.ai_prompt,
+        image_url=question.image_url, created_at=question.created_at,
+        updated_at=question.updated_at
+    )
+
+
+def _read_version():
+    row = db.session.get(CacheVersion, QUESTIONS_VERSION_KEY)
+    return row.version if row else 0
+
+
+class QuestionCache:
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._questions = {}
+        self._missing = set()
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.check_interval:
+                return
+            version = _read_version()
+            if version != self._version:
+                self._questions = {q.prompt_id: _snapshot(q) for q in Question.query.all()}
+                self._missing = set()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def get(self, prompt_id):
+        """按 prompt_id 返回题目快照；缓存中没有时回源查询一次，查不到的 id 在版本变化前不再查询"""
+        self._ensure_fresh()
+        snapshot = self._questions.get(prompt_id)
+        if snapshot is None and prompt_id not in self._missing:
+            version = self._version
+            question = Question.query.filter_by(prompt_id=prompt_id).first()
+            snapshot = _snapshot(question) if question else None
+            with self._lock:
+                # 查询期间缓存重新加载过时，这个结果可能已经过期，不写入缓存
+                if version == self._version:
+                    if snapshot:
+                        self._questions[prompt_id] = snapshot
+                    else:
+                        self._missing.add(prompt_id)
+        return snapshot
+
+    def get_many(self, prompt_ids):
+        """批量读取题目，返回 {prompt_id: 快照}，不存在的 id 不在结果中"""
+        found = {}
+        for prompt_id in prompt_ids:
+            snapshot = self.get(prompt_id)
+            if snapshot:
+                found[prompt_id] = snapshot
+        return found
+
+    def invalidate_local(self):
+        """让本进程在下一次读取时重新加载"""
+        with self._lock:
+            self._version = None
+
+
+def bump_questions_version():
+    """递增题目版本号；应在修改题目的同一个事务中、commit 之前调用"""
+    updated = db.session.execute(
+        update(CacheVersion)
+        .where(CacheVersion.name == QUESTIONS_VERSION_KEY)
+        .values(version=CacheVersion.version + 1)
+    ).rowcount
+    if not updated:
+        db.session.add(CacheVersion(name=QUESTIONS_VERSION_KEY, version=1))
+
+
+def init_app(app):
+    app.extensions['question_cache'] = QuestionCache(
+        check_interval=app.config.get('QUESTION_CACHE_CHECK_INTERVAL', 5.0)
+    )
+
+
+def get_question(prompt_id):
+    """读取题目（经过当前应用的题目缓存）"""
+    return current_app.extensions['question_cache'].get(prompt_id)
+
+
+def get_questions(prompt_ids):
+    """批量读取题目（经过当前应用的题目缓存）"""
+    return current_app.extensions['question_cache'].get_many(prompt_ids)
+
+
+def invalidate_questions():
+    """题目修改提交后调用，让本进程立即看到最新数据"""
+    current_app.extensions['question_cache'].invalidate_local()
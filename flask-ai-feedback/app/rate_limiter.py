@@ -0,0 +1,156 @@
+"""
+LLM 请求的本地限流（令牌桶）
+
+两个桶：每分钟请求数和每分钟 token 数。桶的状态保存在一个本地 SQLite 文件中，
+同一台机器上的所有 gunicorn worker 共享同一份配额（BEGIN IMMEDIATE 保证互斥）。
+
+优先级: 学生评分 > AI 检测 > 教师摘要。
+低优先级的请求不能用掉为高优先级保留的那部分容量；拿不到配额时排队等待，
+超过等待预算才抛出 RateLimitExceeded。
+"""
+import contextlib
+import contextvars
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from flask import current_app, has_app_context
+
+GRADING = 'grading'
+DETECTION = 'detection'
+SUMMARY = 'summary'
+
+_current_priority = contextvars.ContextVar('llm_priority', default=GRADING)
+
+
+class RateLimitExceeded(Exception):
+    """在等待预算内没有拿到配额"""
+
+
+@contextlib.contextmanager
+def llm_priority(priority):
+    """在这个代码块中发出的模型调用使用指定的优先级"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority():
+    return _current_priority.get()
+
+
+def estimate_tokens(prompt, expected_output_tokens):
+    return len(str(prompt)) // 4 + 1 + expected_output_tokens
+
+
+class RateLimiter:
+    def __init__(self, path, requests_per_minute, tokens_per_minute, reserves, wait_budgets):
+        self.path = path
+        # 每个桶: (容量, 每秒补充量)
+        self.buckets = {
+            'requests': (requests_per_minute, requests_per_minute / 60.0),
+            'tokens': (tokens_per_minute, tokens_per_minute / 60.0),
+        }
+        self.reserves = reserves
+        self.wait_budgets = wait_budgets
+        self._local = threading.local()
+        self._connect().execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL, updated REAL)")
+
+    def _connect(self):
+        # 每个线程一个连接；fork 出的 worker 不能沿用父进程的连接
+        conn, pid = getattr(self._local, 'conn', None), getattr(self._local, 'pid', None)
+        if conn is None or pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _try_take(self, priority, tokens):
+        """尝试一次扣减；成功返回 0，否则返回建议等待的秒数"""
+        needs = {'requests': 1, 'tokens': tokens}
+        reserve = self.reserves.get(priority, 0.0)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            levels = {}
+            for name, (capacity, rate) in self.buckets.items():
+                row = conn.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                levels[name] = level
+
+            wait = 0.0
+            for name, (capacity, rate) in self.buckets.items():
+                # 单个请求超过容量时，只要求桶是满的，避免永远等不到
+                need = min(needs[name], capacity * (1 - reserve)) + capacity * reserve
+                if levels[name] < need:
+                    wait = max(wait, (need - levels[name]) / rate)
+            if wait == 0.0:
+                for name in self.buckets:
+                    levels[name] -= needs[name]
+            for name, level in levels.items():
+                conn.execute("INSERT OR REPLACE INTO buckets (name, level, updated) VALUES (?, ?, ?)",
+                             (name, level, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, priority, tokens, wait_budget=None):
+        """拿到配额前一直等待；超过等待预算时抛出 RateLimitExceeded"""
+        if wait_budget is None:
+            wait_budget = self.wait_budgets.get(priority, 0.0)
+        deadline = time.monotonic() + wait_budget
+        while True:
+            wait = self._try_take(priority, tokens)
+            if wait == 0.0:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RateLimitExceeded(f"LLM rate limit: no capacity for a {priority} request "
+                                        f"within {wait_budget:.0f}s")
+            # 短暂睡眠后重试，其他 worker 释放配额或有更高优先级的请求插队时都能及时反应
+            time.sleep(min(wait, remaining, 0.5))
+
+    def try_acquire(self, priority, tokens):
+        return self._try_take(priority, tokens) == 0.0
+
+    def levels(self):
+        rows = self._connect().execute("SELECT name, level, updated FROM buckets").fetchall()
+        now = time.time()
+        result = {}
+        for name, level, updated in rows:
+            capacity, rate = self.buckets[name]
+            result[name] = {'available': round(min(capacity, level + (now - updated) * rate), 1),
+                            'capacity': capacity}
+        return result
+
+
+def init_app(app):
+    """LLM_RATE_LIMIT_RPM 或 LLM_RATE_LIMIT_TPM 为 0 时不限流"""
+    config = app.config
+    rpm, tpm = config.get('LLM_RATE_LIMIT_RPM', 0), config.get('LLM_RATE_LIMIT_TPM', 0)
+    if not rpm or not tpm:
+        app.extensions['rate_limiter'] = None
+        return
+    path = config.get('LLM_RATE_LIMIT_DB') or os.path.join(tempfile.gettempdir(), 'flask-ai-feedback-llm-rate.sqlite')
+    app.extensions['rate_limiter'] = RateLimiter(
+        path, rpm, tpm,
+        reserves={
+            GRADING: 0.0,
+            DETECTION: config.get('LLM_RATE_RESERVE_DETECTION', 0.1),
+            SUMMARY: config.get('LLM_RATE_RESERVE_SUMMARY', 0.3),
+        },
+        wait_budgets={
+            GRADING: config.get('LLM_RATE_WAIT_BUDGET', 15.0),
+            DETECTION: config.get('LLM_RATE_WAIT_BUDGET', 15.0),
+            SUMMARY: config.get('LLM_RATE_WAIT_BUDGET_SUMMARY', 120.0),
+        },
+    )
+
+
+def get_rate_limiter():
+    return current_app.extensions.get('rate_limiter') if has_app_context() else None
@@ -0,0 +1,275 @@
+"""
+学生回答和 AI 反馈的全文搜索
+
+- SQLite: FTS5 外部内容表 responses_fts（porter 词干），由 responses 上的触发器在插入、修改、删除时同步
+- PostgreSQL: 生成列 responses.search_vector（tsvector，回答权重 A、反馈权重 B）+ GIN 索引
+- 其它数据库或没有索引时退回到 LIKE 扫描（按时间排序，没有相关性分数）
+
+索引由迁移创建；db.create_all()（测试、seed 脚本）通过下面的 DDL 事件同时创建。
+"""
+import html
+import re
+from flask import current_app
+from sqlalchemy import event, or_, text
+from . import db
+from . import archive
+from .models import Response
+
+# 片段中的高亮标记: 先用私有区字符标出，转义 HTML 后再换成 <mark>
+_OPEN, _CLOSE = '\ue000', '\ue001'
+SNIPPET_TOKENS = 16
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS responses_fts USING fts5("
+    "student_answer, ai_feedback, content='responses', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS responses_fts_insert AFTER INSERT ON responses BEGIN "
+    "INSERT INTO responses_fts(rowid, student_answer, ai_feedback) "
+    "VALUES (new.id, new.student_answer, new.ai_feedback); END",
+    "CREATE TRIGGER IF NOT EXISTS responses_fts_delete AFTER DELETE ON responses BEGIN "
+    "INSERT INTO responses_fts(responses_fts, rowid, student_answer, ai_feedback) "
+    "VALUES ('delete', old.id, old.student_answer, old.ai_feedback); END",
+    "CREATE TRIGGER IF NOT EXISTS responses_fts_update AFTER UPDATE OF student_answer, ai_feedback ON responses BEGIN "
+    "INSERT INTO responses_fts(responses_fts, rowid, student_answer, ai_feedback) "
+    "VALUES ('delete', old.id, old.student_answer, old.ai_feedback); "
+    "INSERT INTO responses_fts(rowid, student_answer, ai_feedback) "
+    "VALUES (new.id, new.student_answer, new.ai_feedback); END",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS responses_fts_insert",
+    "DROP TRIGGER IF EXISTS responses_fts_delete",
+    "DROP TRIGGER IF EXISTS responses_fts_update",
+    "DROP TABLE IF EXISTS responses_fts",
+]
+POSTGRES_DDL = [
+    "ALTER TABLE responses ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(student_answer, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(ai_feedback, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_responses_search_vector ON responses USING gin (search_vector)",
+]
+
+
+def _create_index(target, connection, **kw):
+    dialect = connection.dialect.name
+    statements = SQLITE_DDL if dialect == 'sqlite' else POSTGRES_DDL if dialect == 'postgresql' else []
+    try:
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+    except Exception as e:
+        # 例如 SQLite 编译时没有 FTS5: 搜索退回到 LIKE
+        print(f"Could not create the full-text search index: {e}")
+
+
+def _drop_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for statement in SQLITE_DROP:
+            connection.exec_driver_sql(statement)
+
+
+event.listen(Response.__table__, 'after_create', _create_index)
+event.listen(Response.__table__, 'before_drop', _drop_index)
+
+
+def detect_backend(connection=None):
+    """返回当前数据库可用的搜索方式: 'fts5' / 'tsvector' / 'like'"""
+    connection = connection or db.session.connection()
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        found = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'responses_fts'")).first()
+        return 'fts5' if found else 'like'
+    if dialect == 'postgresql':
+        found = connection.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'responses' AND column_name = 'search_vector'")).first()
+        return 'tsvector' if found else 'like'
+    return 'like'
+
+
+def fts5_query(query):
+    """
+    把用户输入转换为安全的 FTS5 表达式: 每个词作为带引号的短语（"y-axis" 匹配相邻的 y 和 axis），
+    词之间为 AND，结尾的 * 保留为前缀匹配。没有可搜索的词时返回 None。
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '')
+        if not re.search(r'\w', word):
+            continue
+        terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms) or None
+
+
+def _highlight(snippet):
+    """转义 HTML，再把标记换成 <mark>"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def _like_snippet(value, needle, tokens=SNIPPET_TOKENS):
+    """LIKE 模式下在 Python 中截取第一次出现位置附近的片段"""
+    if not value:
+        return value
+    position = value.lower().find(needle.lower())
+    if position < 0:
+        words = value.split()
+        return ' '.join(words[:tokens]) + (' …' if len(words) > tokens else '')
+    width = tokens * 4
+    start, end = max(0, position - width), min(len(value), position + len(needle) + width)
+    stop = position + len(needle)
+    snippet = value[start:position] + _OPEN + value[position:stop] + _CLOSE + value[stop:end]
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(value) else '')
+
+
+def _serialize(hit):
+    return {
+        'id': hit['id'],
+        'student_id': hit['student_id'],
+        'question': hit['question'],
+        'timestamp': hit['timestamp'].isoformat() if hit['timestamp'] else None,
+        'performance_grade': hit['performance_grade'],
+        'is_ai_generated': bool(hit['is_ai_generated']),
+        'score': float(hit['score']) if hit['score'] is not None else None,
+        'answer_snippet': _highlight(hit['answer_snippet']),
+        'feedback_snippet': _highlight(hit['feedback_snippet']),
+        'archived': False,
+    }
+
+
+def _search_archived(query, prompt_id, limit):
+    """在归档分区中查找，结果的格式与热表的命中相同（archived 为 True）"""
+    terms = [t for t in re.findall(r'\w+', query.lower()) if t]
+    if not terms:
+        return []
+    return [{
+        'id': record['id'],
+        'student_id': record.get('student_id'),
+        'question': record.get('question'),
+        'timestamp': record.get('timestamp'),
+        'performance_grade': record.get('performance_grade'),
+        'is_ai_generated': bool(record.get('is_ai_generated')),
+        'score': float(score),
+        'answer_snippet': _highlight(_like_snippet(record.get('student_answer'), terms[0])),
+        'feedback_snippet': _highlight(_like_snippet(record.get('ai_feedback'), terms[0])),
+        'archived': True,
+    } for score, record in archive.scan_archived(terms, prompt_id, limit)]
+
+
+def _run(sql, params):
+    """执行原生 SQL，timestamp 按 DateTime 解析，返回字典列表"""
+    rows = db.session.execute(sql.columns(timestamp=db.DateTime), params)
+    return [dict(row._mapping) for row in rows]
+
+
+def _search_fts5(query, prompt_id, limit, offset, max_candidates):
+    match = fts5_query(query)
+    if match is None:
+        return []
+    where = "responses_fts MATCH :match"
+    if prompt_id:
+        where += " AND r.question = :prompt_id"
+    params = {'match': match, 'prompt_id': prompt_id, 'open': _OPEN, 'close': _CLOSE,
+              'limit': limit, 'offset': offset}
+    if max_candidates:
+        # 第 max_candidates 新的命中（按 rowid 倒序，FTS5 可以提前停止）；命中更少时为 None
+        floor = db.session.execute(text(
+            "SELECT responses_fts.rowid FROM responses_fts JOIN responses r ON r.id = responses_fts.rowid "
+            f"WHERE {where} ORDER BY responses_fts.rowid DESC LIMIT 1 OFFSET :skip"
+        ), {**params, 'skip': max_candidates - 1}).scalar()
+        if floor is not None:
+            where += " AND responses_fts.rowid >= :floor"
+            params['floor'] = floor
+    # bm25 越小越相关；回答列的权重是反馈列的两倍
+    sql = text(
+        "SELECT r.id, r.student_id, r.question, r.timestamp, r.performance_grade, r.is_ai_generated, "
+        "-bm25(responses_fts, 2.0, 1.0) AS score, "
+        f"snippet(responses_fts, 0, :open, :close, '…', {SNIPPET_TOKENS}) AS answer_snippet, "
+        f"snippet(responses_fts, 1, :open, :close, '…', {SNIPPET_TOKENS}) AS feedback_snippet "
+        "FROM responses_fts JOIN responses r ON r.id = responses_fts.rowid "
+        f"WHERE {where} ORDER BY bm25(responses_fts, 2.0, 1.0) LIMIT :limit OFFSET :offset"
+    )
+    return _run(sql, params)
+
+
+def _search_tsvector(query, prompt_id, limit, offset, max_candidates):
+    where = "r.search_vector @@ q"
+    if prompt_id:
+        where += " AND r.question = :prompt_id"
+    # 先用 GIN 索引取出一页命中，再只对这一页生成 ts_headline（它需要重新解析原文，开销较大）
+    options = f"StartSel={_OPEN}, StopSel={_CLOSE}, MaxWords={SNIPPET_TOKENS * 2}, MinWords={SNIPPET_TOKENS // 2}"
+    sql = text(
+        "SELECT hits.id, hits.student_id, hits.question, hits.timestamp, hits.performance_grade, "
+        "hits.is_ai_generated, hits.score, "
+        "ts_headline('english', hits.student_answer, hits.q, :options) AS answer_snippet, "
+        "ts_headline('english', hits.ai_feedback, hits.q, :options) AS feedback_snippet "
+        "FROM (SELECT c.*, ts_rank_cd(c.search_vector, c.q) AS score "
+        "FROM (SELECT r.id, r.student_id, r.question, r.timestamp, r.performance_grade, r.is_ai_generated, "
+        "r.student_answer, r.ai_feedback, r.search_vector, q "
+        "FROM responses r, websearch_to_tsquery('english', :query) q "
+        f"WHERE {where} ORDER BY r.id DESC LIMIT :candidates) c "
+        "ORDER BY score DESC, c.id DESC LIMIT :limit OFFSET :offset) hits "
+        "ORDER BY hits.score DESC, hits.id DESC"
+    )
+    # LIMIT NULL 表示不限制
+    params = {'query': query, 'prompt_id': prompt_id, 'options': options, 'limit': limit, 'offset': offset,
+              'candidates': max_candidates or None}
+    return _run(sql, params)
+
+
+def _search_like(query, prompt_id, limit, offset, max_candidates=None):
+    needle = query.strip()
+    pattern = '%' + needle.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    rows = db.session.query(
+        Response.id, Response.student_id, Response.question, Response.timestamp,
+        Response.performance_grade, Response.is_ai_generated,
+        Response.student_answer, Response.ai_feedback,
+    ).filter(or_(Response.student_answer.ilike(pattern, escape='\\'),
+                 Response.ai_feedback.ilike(pattern, escape='\\')))
+    if prompt_id:
+        rows = rows.filter(Response.question == prompt_id)
+    rows = rows.order_by(Response.timestamp.desc(), Response.id.desc()).limit(limit).offset(offset).all()
+    return [{**row._mapping, 'score': None,
+             'answer_snippet': _like_snippet(row.student_answer, needle),
+             'feedback_snippet': _like_snippet(row.ai_feedback, needle)} for row in rows]
+
+
+SEARCHERS = {'fts5': _search_fts5, 'tsvector': _search_tsvector, 'like': _search_like}
+
+
+def search_responses(query, prompt_id=None, limit=20, offset=0, include_archived=False):
+    """
+    按相关性返回匹配的回答（含高亮片段）；查询为空时抛出 ValueError。
+    只对最新的 SEARCH_MAX_CANDIDATES 条命中计算相关性，几乎每条回答都包含的词也能很快返回。
+    include_archived 时归档中的命中排在热表的全部命中之后（归档按子串匹配，需要扫描相关分区）。
+    """
+    if not query or not query.strip():
+        raise ValueError("A search query (q) must be provided.")
+    if prompt_id == 'all':
+        prompt_id = None
+    backend = detect_backend()
+    max_candidates = current_app.config.get('SEARCH_MAX_CANDIDATES', 5000)
+    if not include_archived:
+        hits = SEARCHERS[backend](query.strip(), prompt_id, limit, offset, max_candidates)
+        return {'items': [_serialize(hit) for hit in hits], 'backend': backend}
+
+    # 两部分各取到 offset + limit 条，拼接后再分页
+    hot = SEARCHERS[backend](query.strip(), prompt_id, offset + limit, 0, max_candidates)
+    items = [_serialize(hit) for hit in hot]
+    if len(items) < offset + limit:
+        items += _search_archived(query.strip(), prompt_id, offset + limit - len(items))
+    return {'items': items[offset:offset + limit], 'backend': backend}
+
+
+def rebuild_index():
+    """根据 responses 表重建索引（只有 SQLite 的 FTS5 需要；PostgreSQL 的生成列始终是最新的）"""
+    connection = db.session.connection()
+    if detect_backend(connection) == 'like':
+        # 索引还不存在（例如用旧版本 create_all 建的库）: 先尝试创建
+        _create_index(None, connection)
+    backend = detect_backend(connection)
+    if backend == 'fts5':
+        connection.exec_driver_sql("INSERT INTO responses_fts(responses_fts) VALUES ('rebuild')")
+        connection.exec_driver_sql("INSERT INTO responses_fts(responses_fts) VALUES ('optimize')")
+    db.session.commit()
+    return backend
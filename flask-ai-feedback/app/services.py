@@ -1,16 +1,82 @@
 import os
 import re
 import json
-import google.generativeai as genai
-from .models import Question
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from . import clients
+from .cache import get_result_cache, make_cache_key
+from .question_cache import get_question
+from .ai_detection import get_detector
+from .llm_client import ResilientModel, LLMUnavailableError, llm_deadline, remaining_time
+from .rate_limiter import llm_priority, DETECTION, SUMMARY
+from .metrics import llm_labels
 
-# 初始化 Gemini 模型
+MODEL_NAME = 'gemini-pro-latest'
+
+# 评估结果的状态: OK 表示模型按要求返回了结果；TRANSIENT 表示模型暂时不可用、超时或返回内容无法解析，
+# 稍后重试可能成功；FATAL 表示题目不存在或模型没有配置，重试也不会成功
+OK = 'ok'
+TRANSIENT = 'transient'
+FATAL = 'fatal'
+
+# 初始化 Gemini 模型（主模型失败或熔断时依次使用备用模型）。
+# 备用模型和线程池大小在 init_app 中按应用配置设置；底层的 GenerativeModel 在第一次调用时才创建，
+# 导入本模块不会加载 Gemini SDK
 try:
-    model = genai.GenerativeModel('gemini-pro-latest')
+    model = ResilientModel([MODEL_NAME], factory=lambda name: clients.get_genai().GenerativeModel(name))
 except Exception as e:
     model = None
     print(f"Failed to initialize Gemini model: {e}")
 
+def init_app(app):
+    """按应用配置设置备用模型（LLM_FALLBACK_MODELS）和客户端线程池大小"""
+    if model is None:
+        return
+    config = app.config
+    fallback_names = [name.strip() for name in (config.get('LLM_FALLBACK_MODELS') or '').split(',') if name.strip()]
+    model.configure([MODEL_NAME] + fallback_names, config.get('LLM_CLIENT_MAX_WORKERS', 16))
+
+# 所有请求共享的有界线程池，用于并发发出模型调用
+_llm_executor = None
+_llm_executor_lock = threading.Lock()
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """提交任务时复制当前的 contextvars（调用优先级、统计标签），在工作线程中继续使用"""
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def get_llm_executor(max_workers=8):
+    """返回进程内共享的 LLM 线程池（首次使用时按 max_workers 创建）"""
+    global _llm_executor
+    if _llm_executor is None:
+        with _llm_executor_lock:
+            if _llm_executor is None:
+                _llm_executor = ContextThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+    return _llm_executor
+
+class Result(tuple):
+    """带 status 的结果元组，可以像普通元组一样解包和比较"""
+
+    def __new__(cls, values, status=OK):
+        result = super().__new__(cls, values)
+        result.status = status
+        return result
+
+def result_status(result):
+    """返回结果的状态；没有 status 的普通元组按评级推断（"Error" 视为暂时失败）"""
+    status = getattr(result, 'status', None)
+    if status is not None:
+        return status
+    return TRANSIENT if result[-1] == 'Error' else OK
+
+def _call_in_app_context(app, func, *args):
+    """在线程池中执行需要应用上下文（例如数据库查询）的函数"""
+    with app.app_context():
+        return func(*args)
+
 # --- AI/Gemini 服务 ---
 
 def clean_json_from_ai_response(ai_text):
@@ -41,7 +107,8 @@ def is_answer_ai_generated(student_answer):
         Student's text: "{student_answer}"
         ---
         """
-        response = model.generate_content(prompt)
+        with llm_priority(DETECTION):
+            response = model.generate_content(prompt)
         cleaned_text = clean_json_from_ai_response(response.text)
         result_json = json.loads(cleaned_text)
         classification = result_json.get("classification", "").lower()
@@ -50,14 +117,25 @@ def is_answer_ai_generated(student_answer):
         print(f"AI detection error or invalid JSON response: {e}")
         return False
 
+def detect_ai_generated(prompt_id, student_answer):
+    """先用本地预筛选判断答案是否由 AI 生成，无法确定时才调用模型"""
+    detector = get_detector()
+    if detector:
+        decision = detector.prefilter(prompt_id, student_answer)
+        if decision is not None:
+            return decision
+    # 只有已存在的题目才使用它的 id 作为统计标签
+    with llm_labels(prompt_id if get_question(prompt_id) else 'unknown'):
+        return is_answer_ai_generated(student_answer)
+
 def get_feedback_and_grade(prompt_id, student_answer):
-    """从 AI 获取反馈和评分"""
+    """从 AI 获取反馈和评分，返回带 status 的 (feedback, grade)"""
     if not model:
-        return "AI model failed to load.", "N/A"
+        return Result(("AI model failed to load.", "N/A"), FATAL)
 
-    question = Question.query.filter_by(prompt_id=prompt_id).first()
+    question = get_question(prompt_id)
     if not question:
-        return "Error: The requested prompt (question) could not be found.", "Error"
+        return Result(("Error: The requested prompt (question) could not be found.", "Error"), FATAL)
 
     system_prompt = question.ai_prompt
     try:
@@ -72,15 +150,221 @@ def get_feedback_and_grade(prompt_id, student_answer):
 
         Student's answer: "{student_answer}"
         """
-        response = model.generate_content(full_prompt)
+        with llm_labels(prompt_id):
+            response = model.generate_content(full_prompt)
         cleaned_text = clean_json_from_ai_response(response.text)
         result_json = json.loads(cleaned_text)
-        grade = result_json.get("grade", "N/A")
-        feedback = result_json.get("feedback", "Could not generate feedback.")
-        return feedback, grade
+        grade = result_json.get("grade")
+        feedback = result_json.get("feedback")
+        if not grade or not feedback:
+            # 模型没有按要求返回两个键，重试可能得到完整的结果
+            return Result((feedback or "Could not generate feedback.", grade or "N/A"), TRANSIENT)
+        return Result((feedback, grade))
+    except LLMUnavailableError as e:
+        print(f"AI model unavailable: {e}")
+        return Result(("The AI tutor is temporarily unavailable. Please try again in a minute.", "Error"), TRANSIENT)
+    except Exception as e:
+        print(f"Error getting feedback and grade: {e}")
+        return Result(("Sorry, an error occurred while getting feedback.", "Error"), TRANSIENT)
+
+def _evaluation_cache_key(prompt_id, student_answer):
+    """返回 (cache, key)；缓存未启用或题目不存在时返回 (None, None)"""
+    cache = get_result_cache()
+    question = get_question(prompt_id) if cache else None
+    if question is None:
+        return None, None
+    return cache, make_cache_key(question.ai_prompt, student_answer, MODEL_NAME)
+
+def get_cached_evaluation(prompt_id, student_answer):
+    """返回缓存中的 (is_ai, feedback, grade)，没有时返回 None"""
+    cache, key = _evaluation_cache_key(prompt_id, student_answer)
+    cached = cache.get(key) if cache else None
+    if cached is None:
+        return None
+    return Result((cached['is_ai'], cached['feedback'], cached['grade']))
+
+def store_evaluation(prompt_id, student_answer, result):
+    """把评估结果 (is_ai, feedback, grade) 保存到缓存；只缓存模型成功返回的结果（status 为 OK）"""
+    if result_status(result) != OK:
+        return
+    is_ai, feedback, grade = result
+    cache, key = _evaluation_cache_key(prompt_id, student_answer)
+    if cache:
+        cache.set(key, prompt_id, {'is_ai': is_ai, 'feedback': feedback, 'grade': grade})
+
+def evaluate_answer(prompt_id, student_answer):
+    """
+    对学生答案执行 AI 检测和评分，返回带 status 的 (is_ai, feedback, grade)（见 result_status）；
+    相同答案直接命中缓存
+    """
+    cached = get_cached_evaluation(prompt_id, student_answer)
+    if cached is not None:
+        return cached
+
+    result = _evaluate_uncached(prompt_id, student_answer)
+    store_evaluation(prompt_id, student_answer, result)
+    return result
+
+def evaluate_combined(prompt_id, student_answer):
+    """
+    一次模型调用同时完成 AI 检测和评分，返回 (is_ai, feedback, grade)。
+    模型不可用、调用失败或返回的 JSON 不符合要求时返回 None，由调用方退回到两次调用。
+    """
+    if not model:
+        return None
+    question = get_question(prompt_id)
+    if not question:
+        return None
+
+    full_prompt = f"""
+        {question.ai_prompt}
+        ---
+        TASK:
+        Based on the rubric and guidelines above, analyze the following student's answer.
+        You MUST respond with only a valid JSON object containing three keys:
+        1.  "classification": "AI" if the answer was likely written by an AI model, otherwise "Human".
+        2.  "grade": A string classifying the student's performance...
+        3.  "feedback": A string containing the helpful, warm, and encouraging feedback...
+
+        Student's answer: "{student_answer}"
+        """
+    try:
+        with llm_labels(prompt_id):
+            response = model.generate_content(full_prompt)
+        result_json = json.loads(clean_json_from_ai_response(response.text))
+    except Exception as e:
+        print(f"Error in combined evaluation: {e}")
+        return None
+
+    # 三个键都必须存在且取值合法，否则视为解析失败
+    if not isinstance(result_json, dict):
+        return None
+    classification = result_json.get("classification")
+    grade = result_json.get("grade")
+    feedback = result_json.get("feedback")
+    if not isinstance(classification, str) or classification.strip().lower() not in ("ai", "human"):
+        return None
+    if not isinstance(grade, str) or not grade.strip():
+        return None
+    if not isinstance(feedback, str) or not feedback.strip():
+        return None
+    return classification.strip().lower() == "ai", feedback, grade
+
+def _evaluate_uncached(prompt_id, student_answer):
+    """所有模型调用（包括客户端重试和 combined 失败后退回的两次调用）共用 LLM_CALL_TIMEOUT 这一个截止时间"""
+    with llm_deadline(current_app.config.get('LLM_CALL_TIMEOUT')):
+        return _evaluate_before_deadline(prompt_id, student_answer)
+
+def _evaluate_before_deadline(prompt_id, student_answer):
+    config = current_app.config
+    strategy = config.get('EVALUATION_STRATEGY', 'concurrent')
+    if strategy == 'combined':
+        result = evaluate_combined(prompt_id, student_answer)
+        if result is not None:
+            return Result(result)
+        print(f"Combined evaluation failed for prompt {prompt_id}; falling back to separate calls")
+
+    if strategy == 'sequential':
+        is_ai = detect_ai_generated(prompt_id, student_answer)
+        grading = get_feedback_and_grade(prompt_id, student_answer)
+        return Result((is_ai, *grading), result_status(grading))
+
+    # 并发模式: 两个模型调用同时发出，总耗时约等于较慢的那一个
+    app = current_app._get_current_object()
+    executor = get_llm_executor(config.get('LLM_EXECUTOR_MAX_WORKERS', 8))
+    timeout = config.get('LLM_CALL_TIMEOUT')
+
+    # 截止时间随 contextvars 一起传到工作线程，模型客户端在时间用完后不再重试
+    detection = executor.submit(_call_in_app_context, app, detect_ai_generated, prompt_id, student_answer)
+    grading = executor.submit(_call_in_app_context, app, get_feedback_and_grade, prompt_id, student_answer)
+
+    try:
+        graded = grading.result(timeout=remaining_time())
+        (feedback, grade), status = graded, result_status(graded)
+    except FutureTimeoutError:
+        print(f"Grading call timed out after {timeout}s for prompt {prompt_id}")
+        feedback, grade, status = "Sorry, getting feedback took too long. Please try again.", "Error", TRANSIENT
     except Exception as e:
         print(f"Error getting feedback and grade: {e}")
-        return "Sorry, an error occurred while getting feedback.", "Error"
+        feedback, grade, status = "Sorry, an error occurred while getting feedback.", "Error", TRANSIENT
+
+    try:
+        is_ai = detection.result(timeout=remaining_time())
+    except FutureTimeoutError:
+        print(f"AI detection call timed out after {timeout}s")
+        is_ai = False  # 安全失败
+    except Exception as e:
+        print(f"AI detection error: {e}")
+        is_ai = False
+
+    return Result((is_ai, feedback, grade), status)
+
+def stream_feedback_and_grade(prompt_id, student_answer):
+    """
+    流式生成反馈。依次产出 ('token', 文本片段)，最后产出 ('done', 带 status 的 (feedback, grade))；
+    超时（截止时间已到或分块之间等待过久）时先产出 ('error', 说明)。
+    模型被要求在第一行输出 "GRADE: <评级>"，这一行不会发送给学生；没有这一行时评级为 N/A，结果不会被缓存。
+    """
+    if not model:
+        yield 'done', Result(("AI model failed to load.", "N/A"), FATAL)
+        return
+
+    question = get_question(prompt_id)
+    if not question:
+        yield 'done', Result(("Error: The requested prompt (question) could not be found.", "Error"), FATAL)
+        return
+
+    full_prompt = f"""
+        {question.ai_prompt}
+        ---
+        TASK:
+        Based on the rubric and guidelines above, analyze the following student's answer.
+        Respond in plain text (not JSON) with exactly this layout:
+        - The FIRST line must be "GRADE: " followed by a short string classifying the student's performance.
+        - After that line, write the helpful, warm, and encouraging feedback for the student.
+
+        Student's answer: "{student_answer}"
+        """
+    grade = None
+    header = ''
+    parts = []
+    try:
+        with llm_labels(prompt_id):
+            chunks = model.generate_content(full_prompt, stream=True)
+        for chunk in chunks:
+            text = chunk.text
+            if grade is None:
+                # 先缓存到第一行结束，解析出评级后再开始发送反馈
+                header += text
+                if '\n' not in header:
+                    continue
+                first_line, text = header.split('\n', 1)
+                if first_line.strip().upper().startswith('GRADE:'):
+                    grade = first_line.split(':', 1)[1].strip() or 'N/A'
+                else:
+                    grade, text = 'N/A', header
+                text = text.lstrip('\n')
+            if text:
+                parts.append(text)
+                yield 'token', text
+        if grade is None and header:
+            # 整个回答只有一行
+            grade = 'N/A'
+            parts.append(header)
+            yield 'token', header
+    except TimeoutError as e:
+        print(f"Feedback stream timed out: {e}")
+        yield 'error', "Feedback generation timed out."
+        yield 'done', Result(("Sorry, getting feedback took too long.", "Error"), TRANSIENT)
+        return
+    except Exception as e:
+        print(f"Error streaming feedback: {e}")
+        yield 'done', Result(("Sorry, an error occurred while getting feedback.", "Error"), TRANSIENT)
+        return
+
+    feedback = ''.join(parts).strip()
+    status = OK if feedback and grade and grade != 'N/A' else TRANSIENT
+    yield 'done', Result((feedback or "Could not generate feedback.", grade or 'N/A'), status)
 
 def get_summary_from_ai(all_answers_text):
     """为一组答案生成 AI 摘要"""
@@ -96,14 +380,118 @@ def get_summary_from_ai(all_answers_text):
         2.  **Common Points of Confusion:** List 2-3 topics or concepts that students commonly misunderstood or failed to mention.
         3.  **Creative/Insightful Answers:** Highlight one or two specific, creative, or insightful answers that stood out. Quote a small, impactful part of the answer.
 
+        An answer starting with "[N similar answers]" stands for N near-identical answers from different students.
+
         Here are the student answers to analyze:
         ---
         {all_answers_text}
         ---
         """
     try:
-        summary_response = model.generate_content(summary_prompt)
+        with llm_priority(SUMMARY):
+            summary_response = model.generate_content(summary_prompt)
         return summary_response.text
     except Exception as e:
         print(f"Summary generation error: {e}")
-        return f"Error generating summary: {e}"
\ No newline at end of file
+        return f"Error generating summary: {e}"
+
+def get_partial_summary_from_ai(answers_text, chunk_number, total_chunks):
+    """map 阶段: 总结一部分学生答案，失败时返回 None"""
+    if not model:
+        return None
+
+    partial_prompt = f"""
+        You are an expert teaching assistant. The class's answers were split into {total_chunks} parts; this is part {chunk_number}.
+        Summarize ONLY this part in concise bullet points so it can later be merged with the other parts:
+        - Roughly how many answers are strong, adequate or weak.
+        - The concepts students misunderstood or failed to mention.
+        - Up to two short, quoted excerpts from especially creative or insightful answers.
+        An answer starting with "[N similar answers]" stands for N near-identical answers from different students.
+
+        Here are the student answers:
+        ---
+        {answers_text}
+        ---
+        """
+    try:
+        with llm_priority(SUMMARY):
+            return model.generate_content(partial_prompt).text
+    except Exception as e:
+        print(f"Partial summary generation error (part {chunk_number}/{total_chunks}): {e}")
+        return None
+
+def merge_partial_summaries_with_ai(summaries_text, group_number, total_groups):
+    """中间层: 把若干份小结合并成一份更短的小结，失败时返回 None"""
+    if not model:
+        return None
+
+    merge_prompt = f"""
+        You are an expert teaching assistant. Merge the following partial summaries of student answers
+        (group {group_number} of {total_groups}) into a single set of concise bullet points.
+        Keep the counts of strong/adequate/weak answers, the common misunderstandings, and at most two quoted excerpts.
+        ---
+        {summaries_text}
+        ---
+        """
+    try:
+        with llm_priority(SUMMARY):
+            return model.generate_content(merge_prompt).text
+    except Exception as e:
+        print(f"Summary merge error (group {group_number}/{total_groups}): {e}")
+        return None
+
+def reduce_summaries_with_ai(partial_summaries):
+    """reduce 阶段: 把各部分的小结合并为最终的教师报告"""
+    if not model:
+        return "AI model failed to load."
+
+    joined = "\n\n---\n\n".join(partial_summaries)
+    reduce_prompt = f"""
+        You are an expert teaching assistant analyzing student responses for a data visualization critique.
+        The answers were summarized in {len(partial_summaries)} separate parts. Combine these partial summaries into one concise,
+        high-level summary for the instructor in markdown format.
+
+        Address these key points:
+        1.  **Overall Performance:** Briefly categorize the class's overall performance (e.g., Excellent, Good, Fair, Poor) and why.
+        2.  **Common Points of Confusion:** List 2-3 topics or concepts that students commonly misunderstood or failed to mention.
+        3.  **Creative/Insightful Answers:** Highlight one or two specific, creative, or insightful answers that stood out. Quote a small, impactful part of the answer.
+
+        Here are the partial summaries:
+        ---
+        {joined}
+        ---
+        """
+    try:
+        with llm_priority(SUMMARY):
+            return model.generate_content(reduce_prompt).text
+    except Exception as e:
+        print(f"Summary reduce error: {e}")
+        return f"Error generating summary: {e}"
+
+def update_summary_with_ai(previous_summary, new_answers_summary, previous_count, new_count):
+    """把新提交答案的摘要合并进已保存的班级摘要"""
+    if not model:
+        return "AI model failed to load."
+
+    update_prompt = f"""
+        You are an expert teaching assistant. Below is an existing instructor summary covering {previous_count} student answers,
+        followed by a summary of {new_count} answers submitted since then.
+        Rewrite the existing summary so it reflects all {previous_count + new_count} answers. Keep the same markdown structure
+        (Overall Performance, Common Points of Confusion, Creative/Insightful Answers) and keep it concise.
+
+        Existing summary:
+        ---
+        {previous_summary}
+        ---
+
+        Summary of the new answers:
+        ---
+        {new_answers_summary}
+        ---
+        """
+    try:
+        with llm_priority(SUMMARY):
+            return model.generate_content(update_prompt).text
+    except Exception as e:
+        print(f"Summary update error: {e}")
+        return f"Error generating summary: {e}"
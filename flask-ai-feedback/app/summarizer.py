@@ -0,0 +1,191 @@
+"""
+大班级的分层（map-reduce）摘要
+
+1. 按 token 预算把答案分成若干块
+2. map:    在有界线程池中并行总结每一块
+3. reduce: 把各块的小结合并成最终的教师报告；小结太多时先逐层合并
+答案只有一块时与原来一样，只调用一次 get_summary_from_ai。
+
+生成的摘要保存在 prompt_summaries 表中，并记录覆盖到的最大 response id（水位线）。
+没有新答案时直接返回保存的摘要；有新答案时只总结新增部分再合并进去。
+SUMMARY_CLUSTER_ANSWERS 为 True 时，近似重复的答案只发送一条代表答案并注明数量（见 clustering）。
+"""
+import random
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import func
+from . import db
+from . import services
+from . import clustering
+from . import queries
+from .models import Response, PromptSummary
+
+ANSWER_SEPARATOR = "\n\n---\n\n"
+
+
+def estimate_tokens(text):
+    """粗略估计 token 数（英文平均约 4 个字符一个 token）"""
+    return len(text) // 4 + 1
+
+
+def chunk_answers(answers, token_budget):
+    """把答案按顺序装入若干块，每块不超过 token_budget；过长的单个答案会被截断"""
+    chunks, current, current_tokens = [], [], 0
+    max_chars = token_budget * 4
+    for answer in answers:
+        answer = answer[:max_chars]
+        tokens = estimate_tokens(answer + ANSWER_SEPARATOR)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(ANSWER_SEPARATOR.join(current))
+            current, current_tokens = [], 0
+        current.append(answer)
+        current_tokens += tokens
+    if current:
+        chunks.append(ANSWER_SEPARATOR.join(current))
+    return chunks
+
+
+def stratified_sample(rows, sample_size, seed=None):
+    """
+    按评级分层抽样。rows 是 (answer, grade) 列表；
+    每个评级按比例分配名额，且至少保留一个，使少见的评级也能出现在摘要中；
+    评级数多于 sample_size 时，最少见的评级不再保留名额，结果不超过 sample_size。
+    """
+    if sample_size <= 0 or len(rows) <= sample_size:
+        return [answer for answer, _ in rows]
+
+    rng = random.Random(seed)
+    by_grade = defaultdict(list)
+    for answer, grade in rows:
+        by_grade[grade or 'Ungraded'].append(answer)
+
+    # 先给每个评级一个名额，剩余名额按比例（最大余数法）分配
+    grades = sorted(by_grade)
+    if len(grades) > sample_size:
+        grades = sorted(sorted(grades, key=lambda g: len(by_grade[g]), reverse=True)[:sample_size])
+    quotas = {g: 1 for g in grades}
+    remaining = max(0, sample_size - len(grades))
+    shares = {g: remaining * len(by_grade[g]) / len(rows) for g in grades}
+    for g in grades:
+        quotas[g] += int(shares[g])
+    leftover = sample_size - sum(quotas.values())
+    for g in sorted(grades, key=lambda g: shares[g] - int(shares[g]), reverse=True)[:max(0, leftover)]:
+        quotas[g] += 1
+
+    sample = []
+    for g in grades:
+        sample.extend(rng.sample(by_grade[g], min(quotas[g], len(by_grade[g]))))
+    rng.shuffle(sample)
+    return sample
+
+
+def _map_chunks(chunks, max_workers, summarize):
+    app = current_app._get_current_object()
+    with services.ContextThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='summary') as executor:
+        futures = [
+            executor.submit(services._call_in_app_context, app, summarize, chunk, i + 1, len(chunks))
+            for i, chunk in enumerate(chunks)
+        ]
+        results = [f.result() for f in futures]
+    # 失败的块返回 None，跳过即可
+    return [r for r in results if r]
+
+
+def summarize_answers(answers):
+    """生成教师报告；答案超过一次调用的 token 预算时使用 map-reduce"""
+    config = current_app.config
+    budget = config.get('SUMMARY_CHUNK_TOKENS', 24000)
+    max_workers = config.get('SUMMARY_MAX_CONCURRENCY', 4)
+
+    chunks = chunk_answers(answers, budget)
+    if len(chunks) <= 1:
+        return services.get_summary_from_ai(chunks[0] if chunks else "")
+
+    partials = _map_chunks(chunks, max_workers, services.get_partial_summary_from_ai)
+    if not partials:
+        return "Error generating summary: every partial summary failed."
+
+    # 小结合起来仍然超出预算时，先逐层合并
+    while estimate_tokens(ANSWER_SEPARATOR.join(partials)) > budget and len(partials) > 1:
+        groups = chunk_answers(partials, budget)
+        if len(groups) == len(partials):
+            break
+        partials = _map_chunks(groups, max_workers, services.merge_partial_summaries_with_ai) or partials
+
+    return services.reduce_summaries_with_ai(partials)
+
+
+def _is_error_summary(summary):
+    return summary.startswith("Error generating summary") or summary == "AI model failed to load."
+
+
+def _answers_query(prompt_id):
+    query = db.session.query(Response.id, Response.student_answer, Response.performance_grade, Response.cluster_id) \
+        .filter(Response.is_ai_generated == False, Response.status.notin_(queries.UNFINISHED_STATUSES))
+    if prompt_id != 'all':
+        query = query.filter(Response.question == prompt_id)
+    return query
+
+
+def _answer_texts(rows):
+    """发送给模型的答案列表；开启聚类时每组近似重复答案只保留一条"""
+    if current_app.config.get('SUMMARY_CLUSTER_ANSWERS', True):
+        return clustering.collapse_duplicates([(r.student_answer, r.cluster_id) for r in rows])
+    return [r.student_answer for r in rows]
+
+
+def invalidate_summaries(prompt_id=None):
+    """答案被删除后，已保存的摘要不再准确；prompt_id 为 None 时清除全部"""
+    query = PromptSummary.query
+    if prompt_id:
+        query = query.filter(PromptSummary.prompt_id.in_([prompt_id, 'all']))
+    query.delete(synchronize_session=False)
+
+
+def get_or_update_summary(prompt_id, sample_size=0, refresh=False):
+    """
+    返回 {'summary': ..., 'cached': bool}。
+    抽样模式不使用也不更新保存的摘要；refresh=True 时强制完整重新生成。
+    """
+    prompt_id = prompt_id or 'all'
+    base_query = _answers_query(prompt_id)
+    total_count, max_id = base_query.with_entities(func.count(Response.id), func.max(Response.id)).one()
+    if not total_count:
+        return {'summary': 'Not enough data to generate a summary.', 'cached': False}
+
+    if sample_size > 0:
+        rows = base_query.order_by(Response.id).all()
+        answers = stratified_sample([(r.student_answer, r.performance_grade) for r in rows], sample_size)
+        return {'summary': summarize_answers(answers), 'cached': False}
+
+    stored = None if refresh else db.session.get(PromptSummary, prompt_id)
+    if stored and stored.watermark_id >= max_id and stored.response_count == total_count:
+        return {'summary': stored.summary, 'cached': True}
+
+    delta_rows = []
+    if stored:
+        delta_rows = base_query.filter(Response.id > stored.watermark_id).order_by(Response.id).all()
+        # 水位线以下有答案被删除时，增量合并不再可靠，改为完整重新生成
+        if stored.response_count + len(delta_rows) != total_count:
+            stored, delta_rows = None, []
+
+    if stored:
+        delta_summary = summarize_answers(_answer_texts(delta_rows))
+        if _is_error_summary(delta_summary):
+            return {'summary': delta_summary, 'cached': False}
+        summary = services.update_summary_with_ai(stored.summary, delta_summary,
+                                                  stored.response_count, len(delta_rows))
+    else:
+        rows = base_query.order_by(Response.id).all()
+        summary = summarize_answers(_answer_texts(rows))
+
+    if _is_error_summary(summary):
+        return {'summary': summary, 'cached': False}
+
+    record = db.session.get(PromptSummary, prompt_id) or PromptSummary(prompt_id=prompt_id)
+    record.summary = summary
+    record.watermark_id = max_id
+    record.response_count = total_count
+    db.session.add(record)
+    db.session.commit()
+    return {'summary': summary, 'cached': False}
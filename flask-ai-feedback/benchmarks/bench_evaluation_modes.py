@@ -0,0 +1,122 @@
+# benchmarks/bench_evaluation_modes.py
+#
+# 比较三种评估策略（sequential / concurrent / combined）每份答案的模型调用次数、
+# 估算的 token 用量和端到端延迟。模型用一个带模拟延迟的替身代替，不会调用真实 API。
+# 用法:
+#   python benchmarks/bench_evaluation_modes.py --answers 50
+#   python benchmarks/bench_evaluation_modes.py --answers 50 --base-latency 0.4 --per-token-ms 0.5
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, services
+from app.models import Question
+from config import Config
+
+PROMPT_ID = 'bench-evaluation-modes'
+RUBRIC = (
+    "You are a warm and encouraging statistics tutor. The student is looking at a misleading bar chart "
+    "about quarterly revenue. Grade the answer as one of: Great answer, Good answer, Thinking start, "
+    "Too superficial, Misunderstood / incorrect. Mention the uneven y-axis if the student misses it. "
+) * 4
+ANSWERS = [
+    "I think the worst part is the y-axis, the intervals are not even and it's very misleading.",
+    "The colors are too bright and the green arrow doesn't seem to mean anything.",
+    "I don't know, it looks fine to me.",
+    "Why is Q1P different? It's not explained. Also, the y-axis jumps from 50M to 200M.",
+]
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+class StubModel:
+    """按输入输出长度模拟延迟，并统计调用次数和 token 数"""
+
+    def __init__(self, base_latency, per_token_ms):
+        self.base_latency = base_latency
+        self.per_token_ms = per_token_ms
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def generate_content(self, prompt):
+        if '"classification"' in prompt and '"grade"' in prompt:
+            text = json.dumps({"classification": "Human", "grade": "Good answer",
+                               "feedback": "Nice observation about the axis. " * 6})
+        elif '"grade"' in prompt:
+            text = json.dumps({"grade": "Good answer", "feedback": "Nice observation about the axis. " * 6})
+        else:
+            text = json.dumps({"classification": "Human"})
+        tokens_in, tokens_out = estimate_tokens(prompt), estimate_tokens(text)
+        with self.lock:
+            self.calls += 1
+            self.input_tokens += tokens_in
+            self.output_tokens += tokens_out
+        time.sleep(self.base_latency + (tokens_in + tokens_out) * self.per_token_ms / 1000)
+        return type('StubResponse', (), {'text': text})()
+
+
+def run_strategy(app, stub, strategy, count):
+    app.config['EVALUATION_STRATEGY'] = strategy
+    stub.reset()
+    latencies = []
+    with app.app_context():
+        for i in range(count):
+            # 每份答案都不同，避免命中结果缓存
+            answer = f"{ANSWERS[i % len(ANSWERS)]} ({strategy} #{i})"
+            started = time.perf_counter()
+            services.evaluate_answer(PROMPT_ID, answer)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        'calls': stub.calls / count,
+        'input_tokens': stub.input_tokens / count,
+        'output_tokens': stub.output_tokens / count,
+        'p50': statistics.median(latencies),
+        'mean': statistics.mean(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-answer cost and latency of the evaluation strategies.')
+    parser.add_argument('--answers', type=int, default=20)
+    parser.add_argument('--base-latency', type=float, default=0.2, help='seconds added to every model call')
+    parser.add_argument('--per-token-ms', type=float, default=0.2, help='milliseconds per input+output token')
+    args = parser.parse_args()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        RESULT_CACHE_BACKEND = 'none'
+
+    app = create_app(BenchConfig)
+    stub = StubModel(args.base_latency, args.per_token_ms)
+    services.model = stub
+    with app.app_context():
+        db.create_all()
+        db.session.add(Question(prompt_id=PROMPT_ID, title='Bench', question_text='What is wrong with this chart?',
+                                ai_prompt=RUBRIC))
+        db.session.commit()
+
+    results = {s: run_strategy(app, stub, s, args.answers) for s in ('sequential', 'concurrent', 'combined')}
+
+    print(f"\n{'strategy':<12}{'calls':>8}{'in tokens':>12}{'out tokens':>12}{'p50 (ms)':>12}{'mean (ms)':>12}")
+    for strategy, r in results.items():
+        print(f"{strategy:<12}{r['calls']:>8.1f}{r['input_tokens']:>12.0f}{r['output_tokens']:>12.0f}"
+              f"{r['p50']:>12.1f}{r['mean']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
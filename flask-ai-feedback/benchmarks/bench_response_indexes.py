@@ -0,0 +1,137 @@
+# benchmarks/bench_response_indexes.py
+#
+# 比较 responses 表在有无热点索引时管理端查询的耗时。
+# 用法:
+#   python benchmarks/bench_response_indexes.py --rows 200000
+#   python benchmarks/bench_response_indexes.py --rows 200000 --database-url postgresql://user:pw@localhost/bench
+# 不指定 --database-url 时使用一个临时 SQLite 文件。注意: 会清空目标数据库中的 responses 表！
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+from app import create_app, db
+from app.models import Response
+from config import Config
+
+HOT_INDEXES = [
+    'ix_responses_question_timestamp',
+    'ix_responses_question_is_ai',
+    'ix_responses_timestamp_id',
+    'ix_responses_student_id',
+]
+PROMPT_IDS = [f"prompt-{i}" for i in range(40)]
+ANSWERS = [
+    "I think the worst part is the y-axis, the intervals are not even and it's very misleading.",
+    "The colors are too bright and the green arrow doesn't seem to mean anything.",
+    "I don't know, it looks fine to me.",
+    "Why is Q1P different? It's not explained. Also, the y-axis jumps from 50M to 200M.",
+]
+GRADES = ["Great answer", "Good answer", "Thinking start", "Too superficial", "Misunderstood / incorrect"]
+
+# 与 api.py 中的管理端查询对应
+QUERIES = {
+    'get_all_feedback (one prompt, newest 100)':
+        "SELECT id, timestamp FROM responses WHERE question = :p ORDER BY timestamp DESC LIMIT 100",
+    'get_all_feedback (all prompts, newest 100)':
+        "SELECT id, timestamp FROM responses ORDER BY timestamp DESC, id DESC LIMIT 100",
+    'get_summary (non-AI answers of one prompt)':
+        "SELECT count(student_answer) FROM responses WHERE question = :p AND is_ai_generated = :f",
+    'clear_problem_feedback / delete_question (match rows)':
+        "SELECT count(*) FROM responses WHERE question = :p",
+    'responses of one student':
+        "SELECT count(*) FROM responses WHERE student_id = :s",
+}
+
+
+def seed(rows, batch_size=10000):
+    db.session.query(Response).delete()
+    db.session.commit()
+    start = datetime(2026, 1, 1)
+    for offset in range(0, rows, batch_size):
+        batch = [{
+            'student_id': f"student-{random.randint(1, 5000)}",
+            'question': random.choice(PROMPT_IDS),
+            'student_answer': random.choice(ANSWERS),
+            'ai_feedback': "Generated feedback for benchmarking.",
+            'timestamp': start + timedelta(seconds=random.randint(0, 120 * 86400)),
+            'rating': random.randint(1, 5),
+            'is_ai_generated': random.random() < 0.2,
+            'performance_grade': random.choice(GRADES),
+            'status': 'done',
+            'attempts': 1,
+        } for _ in range(min(batch_size, rows - offset))]
+        db.session.execute(insert(Response), batch)
+        db.session.commit()
+
+
+def time_queries(repeats):
+    params = {'p': PROMPT_IDS[7], 'f': False, 's': 'student-42'}
+    results = {}
+    with db.engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            samples = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                samples.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(samples)
+    return results
+
+
+def set_indexes(enabled):
+    table = Response.__table__
+    for index in table.indexes:
+        if index.name in HOT_INDEXES:
+            if enabled:
+                index.create(db.engine, checkfirst=True)
+            else:
+                index.drop(db.engine, checkfirst=True)
+    with db.engine.begin() as conn:
+        if db.engine.dialect.name == 'postgresql':
+            conn.execute(text("ANALYZE responses"))
+        else:
+            conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark responses queries with and without the hot indexes.')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        print(f"Seeding {args.rows} responses...")
+        seed(args.rows)
+
+        set_indexes(False)
+        before = time_queries(args.repeats)
+        set_indexes(True)
+        after = time_queries(args.repeats)
+
+    print(f"\n{'query':<55}{'before (ms)':>12}{'after (ms)':>12}{'speedup':>10}")
+    for name in QUERIES:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f"{name:<55}{before[name]:>12.2f}{after[name]:>12.2f}{speedup:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_search.py
+#
+# 比较全文索引（SQLite FTS5 / PostgreSQL tsvector）和 LIKE 扫描的搜索耗时。
+# 用法:
+#   python benchmarks/bench_search.py --rows 300000
+#   python benchmarks/bench_search.py --rows 300000 --database-url postgresql://user:pw@localhost/bench
+# 不指定 --database-url 时使用一个临时 SQLite 文件。注意: 会清空目标数据库中的 responses 表！
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app import create_app, db, search
+from app.models import Response
+from config import Config
+from seed_database import seed_data
+
+RARE_ANSWER = "Without a placebo group we cannot tell whether the drug caused the improvement."
+# (名称, 查询, 是否按题目筛选)
+QUERIES = [
+    ('common term', 'y-axis', False),
+    ('common term, one prompt', 'y-axis', True),
+    ('rare term', 'placebo', False),
+    ('prefix', 'exagg*', False),
+]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full-text search against a LIKE scan.')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--prompts', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SECRET_KEY = Config.SECRET_KEY or 'bench'
+
+    app = create_app(BenchConfig)
+    prompt_ids = seed_data(app, count=args.rows, prompts=args.prompts, seed=42)
+    with app.app_context():
+        # 少量包含罕见词的回答
+        db.session.execute(insert(Response), [
+            {'question': random.choice(prompt_ids), 'student_answer': RARE_ANSWER, 'ai_feedback': 'f',
+             'is_ai_generated': False, 'status': 'done', 'attempts': 1} for _ in range(50)])
+        db.session.commit()
+
+        backend = search.detect_backend()
+        print(f"{args.rows} rows, index backend: {backend}\n")
+        print(f"{'query':<28}{'index ms':>10}{'LIKE ms':>10}")
+        for name, query, filtered in QUERIES:
+            prompt_id = prompt_ids[0] if filtered else None
+            indexed = timed(lambda: search.search_responses(query, prompt_id), args.repeat)
+            like = timed(lambda: search._search_like(query.rstrip('*'), prompt_id, 20, 0), args.repeat)
+            print(f"{name:<28}{indexed:>10.1f}{like:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_startup.py
+#
+# 测量冷启动: 在全新的子进程中执行 create_app()，用 python -X importtime 统计导入耗时，
+# 报告总耗时、最慢的顶层模块，以及 Gemini / Cloudinary / OAuth SDK 是否在启动时就被导入。
+# 用法:
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --runs 5 --top 15
+#   python benchmarks/bench_startup.py --warm-up      # 同时测量 WARMUP_ON_START 后台初始化的耗时
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些库导入很慢，启动时不应该出现
+HEAVY_MODULES = ['google.generativeai', 'cloudinary', 'authlib.integrations.flask_client']
+
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+from app import create_app
+from config import Config
+
+class StartupConfig(Config):
+    SECRET_KEY = Config.SECRET_KEY or 'startup-bench'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WARMUP_ON_START = False
+
+app = create_app(StartupConfig)
+create_app_seconds = time.perf_counter() - started
+warm_up_seconds = None
+if {warm_up}:
+    from app import clients
+    started = time.perf_counter()
+    clients.warm_up(app)
+    warm_up_seconds = time.perf_counter() - started
+print(json.dumps({{'create_app': create_app_seconds, 'warm_up': warm_up_seconds,
+                  'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_once(warm_up):
+    """在子进程中启动一次，返回 (结果, importtime 输出)"""
+    code = CHILD.format(warm_up=warm_up, heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                          capture_output=True, text=True, env=dict(os.environ, SECRET_KEY=os.getenv('SECRET_KEY', 'x')))
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, proc.stderr
+
+
+def top_level_imports(importtime_output, top):
+    """解析 -X importtime 的输出，返回累计耗时最长的顶层模块 [(模块, 毫秒)]"""
+    modules = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # 缩进只有一层空格的是顶层导入
+        if name.startswith(' ') and not name.startswith('  '):
+            modules.append((name.strip(), int(cumulative) / 1000))
+    return sorted(modules, key=lambda m: m[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold start time of create_app().')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--warm-up', action='store_true', help='also time the background warm-up')
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.runs):
+        result, importtime = run_once(args.warm_up)
+        results.append(result)
+
+    create_times = [r['create_app'] * 1000 for r in results]
+    print(f"create_app() in a fresh process: median {statistics.median(create_times):.0f} ms "
+          f"(min {min(create_times):.0f}, max {max(create_times):.0f}, {args.runs} runs)")
+    if args.warm_up:
+        warm_times = [r['warm_up'] * 1000 for r in results]
+        print(f"warm-up (WARMUP_ON_START): median {statistics.median(warm_times):.0f} ms")
+
+    print(f"\nSlowest top-level imports (last run):")
+    for name, ms in top_level_imports(importtime, args.top):
+        print(f"  {name:<45}{ms:>8.1f} ms")
+
+    loaded = results[-1]['loaded']
+    if args.warm_up:
+        print(f"\nSDKs loaded after warm-up: {', '.join(loaded) or 'none'}")
+    else:
+        print(f"\nHeavy SDKs imported at startup: {', '.join(loaded) or 'none'}")
+        if loaded:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
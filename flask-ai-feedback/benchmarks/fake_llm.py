@@ -0,0 +1,84 @@
+# benchmarks/fake_llm.py
+#
+# 本地的 Gemini 替身，用于压测和基准测试，不会调用真实 API。
+# - 延迟服从对数正态分布（给定中位数和离散程度），并按输出长度增加
+# - 按给定比例抛出错误或 429（配额用完）
+# - 根据提示词返回检测、评分、合并评估或摘要格式的回答，支持 stream=True
+# install() 用它替换 services.model，因此重试、熔断和限流逻辑都会被一起测到。
+
+import json
+import math
+import random
+import threading
+import time
+
+GRADES = ["Great answer", "Good answer", "Thinking start", "Too superficial", "Misunderstood / incorrect"]
+FEEDBACK = ("You noticed that the y-axis intervals are uneven, which is the key problem. "
+            "Think about how that changes the reader's impression of growth. ") * 2
+
+
+class FakeQuotaError(Exception):
+    """模拟 429 Resource Exhausted"""
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGemini:
+    def __init__(self, median_latency=0.8, sigma=0.5, per_token_latency=0.002,
+                 error_rate=0.0, quota_error_rate=0.0, seed=None):
+        self.median_latency = median_latency
+        self.sigma = sigma
+        self.per_token_latency = per_token_latency
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _roll(self):
+        with self._lock:
+            self.calls += 1
+            return self._rng.random(), self._rng.lognormvariate(math.log(self.median_latency), self.sigma)
+
+    def _answer(self, prompt):
+        grade = random.choice(GRADES)
+        if '"classification"' in prompt and '"grade"' in prompt:
+            return json.dumps({"classification": "Human", "grade": grade, "feedback": FEEDBACK})
+        if '"grade"' in prompt:
+            return json.dumps({"grade": grade, "feedback": FEEDBACK})
+        if '"classification"' in prompt:
+            return json.dumps({"classification": random.choice(["Human"] * 9 + ["AI"])})
+        if 'GRADE:' in prompt:
+            return f"GRADE: {grade}\n{FEEDBACK}"
+        return "### Common misconceptions\n- Students overlook the uneven axis.\n" * 5
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        roll, latency = self._roll()
+        text = self._answer(str(prompt))
+        latency += len(text) / 4 * self.per_token_latency
+        if roll < self.error_rate:
+            time.sleep(latency / 2)
+            raise RuntimeError("500 Internal error (fake)")
+        if roll < self.error_rate + self.quota_error_rate:
+            raise FakeQuotaError("429 Resource has been exhausted (fake)")
+        if not stream:
+            time.sleep(latency)
+            return FakeResponse(text)
+        return self._stream(text, latency)
+
+    def _stream(self, text, latency):
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+        for piece in pieces:
+            time.sleep(latency / len(pieces))
+            yield FakeResponse(piece)
+
+
+def install(fake, fallback_models=()):
+    """用 FakeGemini 替换 services.model（保留容错客户端）"""
+    from app import services
+    from app.llm_client import ResilientModel
+    services.model = ResilientModel([services.MODEL_NAME, *fallback_models], factory=lambda name: fake)
+    return services.model
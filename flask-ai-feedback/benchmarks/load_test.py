@@ -0,0 +1,264 @@
+# benchmarks/load_test.py
+#
+# 压测: 启动一个真实的多线程 HTTP 服务器（使用 fake_llm 代替 Gemini），
+# 运行脚本化的场景，报告每个端点的 p50/p95/p99 延迟和每秒请求数。
+# 用法:
+#   python benchmarks/load_test.py --rows 200000 --scenario all
+#   python benchmarks/load_test.py --scenario burst --students 300 --concurrency 50 --llm-latency 1.5
+#   python benchmarks/load_test.py --output results.json
+#   python benchmarks/load_test.py --compare results.json --tolerance 0.2   # p95 变慢超过 20% 时返回 1
+# 场景:
+#   burst      全班同时提交答案（/api/evaluate，部分走 /api/evaluate-stream）
+#   dashboard  教师浏览仪表盘（统计、分页列表、变更流、题目详情）
+#   summary    生成班级摘要（首次完整生成，之后增量或命中缓存）
+#   all        三个场景同时运行
+# 不指定 --database-url 时使用一个临时 SQLite 文件。注意: 会清空目标数据库中的 responses 表！
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+from werkzeug.serving import make_server
+from app import create_app
+from config import Config
+from seed_database import seed_data, FAKE_ANSWERS
+from fake_llm import FakeGemini, install
+
+
+class Recorder:
+    """按端点记录每个请求的耗时和状态"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            self.samples[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+
+            def pick(q):
+                return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+            result[name] = {
+                'requests': len(samples),
+                'errors': self.errors[name],
+                'rps': round(len(samples) / elapsed, 2),
+                'mean_ms': round(statistics.mean(samples) * 1000, 1),
+                'p50_ms': round(pick(0.50), 1),
+                'p95_ms': round(pick(0.95), 1),
+                'p99_ms': round(pick(0.99), 1),
+            }
+        return result
+
+
+class Client:
+    def __init__(self, base_url, recorder, cookies=None):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.session = requests.Session()
+        if cookies:
+            self.session.cookies.update(cookies)
+
+    def call(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=120, **kwargs)
+            response.content  # 流式响应也读完整个响应体
+            ok = response.status_code < 400
+            return response if ok else None
+        except requests.RequestException:
+            return None
+        finally:
+            self.recorder.record(name, time.perf_counter() - started, ok)
+
+
+def run_workers(concurrency, tasks, make_client):
+    """用 concurrency 个线程执行 tasks（每个任务是一个以 client 为参数的函数）"""
+    queue = list(tasks)
+    lock = threading.Lock()
+
+    def worker():
+        client = make_client()
+        while True:
+            with lock:
+                if not queue:
+                    return
+                task = queue.pop()
+            task(client)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def burst_scenario(args, prompt_ids):
+    """全班同时提交：每个学生提交一份略有不同的答案"""
+    def submit(i):
+        def task(client):
+            payload = {'prompt_id': random.choice(prompt_ids), 'student_id': f'bench-student-{i}',
+                       'answer': f"{random.choice(FAKE_ANSWERS)} (attempt {i})"}
+            if i % 5 == 0:
+                client.call('POST /api/evaluate-stream', 'POST', '/api/evaluate-stream', json=payload)
+            else:
+                client.call('POST /api/evaluate', 'POST', '/api/evaluate', json=payload)
+        return task
+    return [submit(i) for i in range(args.students)]
+
+
+def dashboard_scenario(args, prompt_ids):
+    """教师浏览仪表盘：统计图表、翻几页列表、轮询变更、打开题目"""
+    def browse(_):
+        def task(client):
+            prompt_id = random.choice(prompt_ids)
+            client.call('GET /api/feedback-stats', 'GET', '/api/feedback-stats', params={'prompt_id': prompt_id})
+            cursor = None
+            for _ in range(3):
+                params = {'prompt_id': prompt_id, 'limit': 100}
+                if cursor:
+                    params['cursor'] = cursor
+                response = client.call('GET /api/get-all-feedback', 'GET', '/api/get-all-feedback', params=params)
+                cursor = response.json().get('next_cursor') if response is not None else None
+                if not cursor:
+                    break
+            client.call('GET /api/feedback-changes', 'GET', '/api/feedback-changes', params={'prompt_id': prompt_id})
+            client.call('GET /api/question-details', 'GET', f'/api/question-details/{prompt_id}')
+        return task
+    return [browse(i) for i in range(args.dashboard_views)]
+
+
+def summary_scenario(args, prompt_ids):
+    def summarize(i):
+        def task(client):
+            prompt_id = prompt_ids[i % len(prompt_ids)]
+            client.call('GET /api/get-summary', 'GET', '/api/get-summary', params={'prompt_id': prompt_id})
+        return task
+    return [summarize(i) for i in range(args.summaries)]
+
+
+def admin_cookies(app):
+    """伪造一个已登录的会话 cookie（与测试中的 authenticated_client 相同）"""
+    serializer = app.session_interface.get_signing_serializer(app)
+    return {app.config.get('SESSION_COOKIE_NAME', 'session'):
+            serializer.dumps({'_user_id': 'bench-admin@example.com', '_fresh': True})}
+
+
+def compare(results, baseline_path, tolerance):
+    """与之前保存的结果比较 p95，返回变慢的端点列表"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before and before['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append((name, before['p95_ms'], stats['p95_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the API against a fake LLM.')
+    parser.add_argument('--scenario', choices=['burst', 'dashboard', 'summary', 'all'], default='all')
+    parser.add_argument('--rows', type=int, default=50000, help='responses to seed before the run (0 keeps existing)')
+    parser.add_argument('--prompts', type=int, default=10)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--dashboard-views', type=int, default=100)
+    parser.add_argument('--summaries', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--llm-latency', type=float, default=0.8, help='median fake LLM latency in seconds')
+    parser.add_argument('--llm-sigma', type=float, default=0.5)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-quota-error-rate', type=float, default=0.0)
+    parser.add_argument('--database-url')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run; exit 1 if p95 regressed')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SECRET_KEY = Config.SECRET_KEY or 'load-test'
+        SESSION_COOKIE_SECURE = False
+        LLM_RATE_LIMIT_RPM = 0
+        LLM_RETRY_BASE_DELAY = 0.05
+
+    app = create_app(BenchConfig)
+    # --rows 0 时只建表和题目，保留已有的回答
+    prompt_ids = seed_data(app, count=args.rows, prompts=args.prompts, clear=args.rows > 0, seed=42)
+
+    fake = FakeGemini(args.llm_latency, args.llm_sigma, error_rate=args.llm_error_rate,
+                      quota_error_rate=args.llm_quota_error_rate, seed=42)
+    install(fake)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # 不逐条打印请求日志
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    cookies = admin_cookies(app)
+
+    scenarios = {
+        'burst': burst_scenario,
+        'dashboard': dashboard_scenario,
+        'summary': summary_scenario,
+    }
+    selected = list(scenarios) if args.scenario == 'all' else [args.scenario]
+    recorder = Recorder()
+    print(f"Running {', '.join(selected)} against {base_url} with {args.concurrency} concurrent clients...")
+
+    # 选中的场景同时运行，每个场景平分并发数
+    per_scenario = max(1, args.concurrency // len(selected))
+    threads = [
+        threading.Thread(target=run_workers, args=(
+            per_scenario, scenarios[name](args, prompt_ids), lambda: Client(base_url, recorder, cookies)))
+        for name in selected
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    server.shutdown()
+
+    results = recorder.report()
+    print(f"\n{'endpoint':<32}{'requests':>9}{'errors':>8}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, s in results.items():
+        print(f"{name:<32}{s['requests']:>9}{s['errors']:>8}{s['rps']:>8.1f}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}")
+    print(f"\nFake LLM calls: {fake.calls}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p95 {before:.1f} ms -> {after:.1f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
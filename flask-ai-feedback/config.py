@@ -27,3 +27,160 @@ class Config:
     CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
 
+    # --- 启动 ---
+    # 为 True 时启动后在后台线程中提前导入并配置 Gemini、Cloudinary 和 OAuth，
+    # 否则在第一次使用时才初始化（冷启动更快）
+    WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'false').lower() == 'true'
+
+    # --- LLM 调用 ---
+    # 评估策略: 'concurrent' 表示 AI 检测与评分同时发出; 'sequential' 保持原来的逐个调用;
+    # 'combined' 用一次调用同时完成检测和评分，返回结果不合格时退回到两次并发调用
+    EVALUATION_STRATEGY = os.getenv('EVALUATION_STRATEGY', 'concurrent')
+    # 共享线程池的大小，以及每次模型调用的超时时间（秒）
+    LLM_EXECUTOR_MAX_WORKERS = int(os.getenv('LLM_EXECUTOR_MAX_WORKERS', '8'))
+    LLM_CALL_TIMEOUT = float(os.getenv('LLM_CALL_TIMEOUT', '30'))
+    # /api/evaluate-stream 生成整段反馈的时间上限，以及两个分块之间最长的等待时间（秒）
+    LLM_STREAM_TIMEOUT = float(os.getenv('LLM_STREAM_TIMEOUT', '60'))
+    LLM_STREAM_IDLE_TIMEOUT = float(os.getenv('LLM_STREAM_IDLE_TIMEOUT', '20'))
+
+    # --- LLM 客户端容错 ---
+    # 单次请求的超时和失败后的重试次数（带抖动的指数退避）
+    LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', '20'))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+    LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+    # 连续失败这么多次后熔断，冷却这么多秒后放行一次试探请求
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+    LLM_BREAKER_RESET_SECONDS = float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))
+    # 大于 0 时，请求超过这么多秒还未返回就再发一个相同的请求，取先返回的结果
+    LLM_HEDGE_AFTER = float(os.getenv('LLM_HEDGE_AFTER', '0'))
+    # 主模型不可用时按顺序使用的备用模型（逗号分隔）
+    LLM_FALLBACK_MODELS = os.getenv('LLM_FALLBACK_MODELS', '')
+    LLM_CLIENT_MAX_WORKERS = int(os.getenv('LLM_CLIENT_MAX_WORKERS', '16'))
+
+    # --- LLM 限流（本机所有 worker 共享的令牌桶） ---
+    # 每分钟请求数和 token 数；任一为 0 时不限流。默认不限流：开启时按 API key 的配额设置
+    # （例如 Gemini 控制台中该 key 的 RPM/TPM 上限，留出一些余量），否则会比供应商更早拒绝请求
+    LLM_RATE_LIMIT_RPM = int(os.getenv('LLM_RATE_LIMIT_RPM', '0'))
+    LLM_RATE_LIMIT_TPM = int(os.getenv('LLM_RATE_LIMIT_TPM', '250000'))
+    # 保存桶状态的 SQLite 文件（默认放在系统临时目录）
+    LLM_RATE_LIMIT_DB = os.getenv('LLM_RATE_LIMIT_DB', '')
+    # 每次请求预计的输出 token 数，与提示词长度一起从 token 桶中扣除
+    LLM_RATE_EXPECTED_OUTPUT_TOKENS = int(os.getenv('LLM_RATE_EXPECTED_OUTPUT_TOKENS', '500'))
+    # 为更高优先级保留的容量比例: AI 检测不能用掉最后 10%，教师摘要不能用掉最后 30%
+    LLM_RATE_RESERVE_DETECTION = float(os.getenv('LLM_RATE_RESERVE_DETECTION', '0.1'))
+    LLM_RATE_RESERVE_SUMMARY = float(os.getenv('LLM_RATE_RESERVE_SUMMARY', '0.3'))
+    # 拿不到配额时最多排队等待的秒数，超过后请求失败
+    LLM_RATE_WAIT_BUDGET = float(os.getenv('LLM_RATE_WAIT_BUDGET', '15'))
+    LLM_RATE_WAIT_BUDGET_SUMMARY = float(os.getenv('LLM_RATE_WAIT_BUDGET_SUMMARY', '120'))
+
+    # --- 性能监控 ---
+    # 为 True 时统计请求、数据库查询和模型调用的耗时，并在 /metrics 以 Prometheus 格式输出
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    # 抓取 /metrics 时需要带上 "Authorization: Bearer <METRICS_TOKEN>"；未设置时只有登录的教师能访问
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    # 为 True 时每个请求额外输出一行 JSON 日志
+    METRICS_JSON_LOGS = os.getenv('METRICS_JSON_LOGS', 'false').lower() == 'true'
+
+    # --- 异步评估队列 ---
+    # 为 True 时 /api/evaluate 默认立即返回任务 id（请求体中的 "async" 字段可覆盖）
+    EVALUATION_ASYNC = os.getenv('EVALUATION_ASYNC', 'false').lower() == 'true'
+    JOB_QUEUE_WORKERS = int(os.getenv('JOB_QUEUE_WORKERS', '4'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    JOB_RETRY_BASE_DELAY = float(os.getenv('JOB_RETRY_BASE_DELAY', '1.0'))
+    # 处理中的任务超过这个时间没有完成，就视为 worker 已崩溃，可以被重新领取
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '300'))
+    # 后台巡检线程在启动时恢复崩溃遗留的评估/清除任务，之后每隔这么多秒检查一次（0 表示只在启动时恢复）
+    JOB_RECOVERY_INTERVAL = int(os.getenv('JOB_RECOVERY_INTERVAL', '60'))
+    # 为 True 时后台任务在当前线程中立即执行（用于测试）
+    JOBS_EAGER = False
+
+    # --- 后台清除 ---
+    # 清空/删除回答时每批删除的行数，以及批之间的停顿（秒），让学生的提交可以插入
+    PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', '1000'))
+    PURGE_BATCH_PAUSE = float(os.getenv('PURGE_BATCH_PAUSE', '0.05'))
+    # 为 True 时删除前先把回答写入归档目录下的 JSONL.gz 文件（请求中的 "archive" 可覆盖）
+    PURGE_ARCHIVE = os.getenv('PURGE_ARCHIVE', 'false').lower() == 'true'
+    # 归档文件目录，默认是 instance/archives
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', '')
+
+    # --- 冷数据归档 ---
+    # `flask archive-responses --default-cutoff` 把早于这么多天的回答移到归档分区
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '365'))
+    # 每批移动的行数（每批一个短事务）
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+
+    # --- LLM 结果缓存 ---
+    # 后端: 'memory'（进程内 LRU）、'database'（跨重启保留）或 'none'
+    RESULT_CACHE_BACKEND = os.getenv('RESULT_CACHE_BACKEND', 'memory')
+    RESULT_CACHE_MAXSIZE = int(os.getenv('RESULT_CACHE_MAXSIZE', '10000'))
+    RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '86400'))
+
+    # --- 题目缓存 ---
+    # 每个 worker 最多每隔这么多秒查询一次版本号，确认题目是否被修改
+    QUESTION_CACHE_CHECK_INTERVAL = float(os.getenv('QUESTION_CACHE_CHECK_INTERVAL', '5'))
+
+    # --- 公开题目端点的 HTTP 缓存 ---
+    QUESTION_DETAILS_MAX_AGE = int(os.getenv('QUESTION_DETAILS_MAX_AGE', '300'))
+    # 过期后仍可先返回旧内容、同时在后台重新验证的秒数（0 表示不启用）
+    QUESTION_DETAILS_STALE_WHILE_REVALIDATE = int(os.getenv('QUESTION_DETAILS_STALE_WHILE_REVALIDATE', '86400'))
+    QUESTION_DETAILS_BATCH_LIMIT = int(os.getenv('QUESTION_DETAILS_BATCH_LIMIT', '50'))
+
+    # --- 反馈列表分页 ---
+    FEEDBACK_PAGE_SIZE_DEFAULT = int(os.getenv('FEEDBACK_PAGE_SIZE_DEFAULT', '100'))
+    FEEDBACK_PAGE_SIZE_MAX = int(os.getenv('FEEDBACK_PAGE_SIZE_MAX', '1000'))
+
+    # --- 班级摘要 ---
+    # 单次模型调用最多发送的答案 token 数，超过时分块并行总结后再合并
+    SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '24000'))
+    SUMMARY_MAX_CONCURRENCY = int(os.getenv('SUMMARY_MAX_CONCURRENCY', '4'))
+    # 大于 0 时只总结按评级分层抽样的这么多条答案
+    SUMMARY_SAMPLE_SIZE = int(os.getenv('SUMMARY_SAMPLE_SIZE', '0'))
+
+    # --- 近似重复答案聚类 ---
+    # MinHash 估计的 Jaccard 相似度不低于此值的回答归为同一聚类
+    ANSWER_CLUSTER_THRESHOLD = float(os.getenv('ANSWER_CLUSTER_THRESHOLD', '0.6'))
+    # 生成摘要时每个聚类只发送一条代表答案（注明数量）
+    SUMMARY_CLUSTER_ANSWERS = os.getenv('SUMMARY_CLUSTER_ANSWERS', 'true').lower() == 'true'
+
+    # --- 全文搜索 ---
+    SEARCH_PAGE_SIZE_DEFAULT = int(os.getenv('SEARCH_PAGE_SIZE_DEFAULT', '20'))
+    SEARCH_PAGE_SIZE_MAX = int(os.getenv('SEARCH_PAGE_SIZE_MAX', '100'))
+    # 只对最新的这么多条命中按相关性排序（0 表示全部），常见词也能在毫秒级返回
+    SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', '5000'))
+
+    # --- 数据导出 ---
+    # 服务器端游标每批读取的行数
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+    # --- 仪表盘实时更新 ---
+    # 仪表盘默认每隔这么多秒轮询一次 /api/feedback-changes
+    FEEDBACK_CHANGES_POLL_INTERVAL = float(os.getenv('FEEDBACK_CHANGES_POLL_INTERVAL', '5'))
+    # 变更查询会重新读取游标之前这么多秒内的行（晚提交的事务可能带有较早的 updated_at），客户端按 id 去重
+    FEEDBACK_CHANGES_OVERLAP_SECONDS = float(os.getenv('FEEDBACK_CHANGES_OVERLAP_SECONDS', '5'))
+    # SSE 变更流会在整个连接期间占用一个 worker，只应在使用异步 worker（gunicorn -k gevent）时开启
+    FEEDBACK_STREAM_ENABLED = os.getenv('FEEDBACK_STREAM_ENABLED', 'false').lower() == 'true'
+    # 变更流轮询数据库的间隔，以及单个 SSE 连接保持的最长时间（之后浏览器会自动重连）
+    FEEDBACK_STREAM_POLL_INTERVAL = float(os.getenv('FEEDBACK_STREAM_POLL_INTERVAL', '2'))
+    FEEDBACK_STREAM_MAX_SECONDS = float(os.getenv('FEEDBACK_STREAM_MAX_SECONDS', '55'))
+
+    # --- 批量评估 ---
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '4'))
+    BATCH_MAX_ATTEMPTS = int(os.getenv('BATCH_MAX_ATTEMPTS', '3'))
+    BATCH_RETRY_BASE_DELAY = float(os.getenv('BATCH_RETRY_BASE_DELAY', '1.0'))
+    # /api/evaluate-batch 单次请求最多接受的记录数（命令行没有这个限制）
+    BATCH_MAX_RECORDS = int(os.getenv('BATCH_MAX_RECORDS', '2000'))
+    # /api/evaluate-batch 每评估并提交这么多条记录一次，请求中断时已提交的部分保留
+    BATCH_COMMIT_SIZE = int(os.getenv('BATCH_COMMIT_SIZE', '100'))
+
+    # --- AI 生成答案的本地预筛选 ---
+    # 明显的情况在本地判断，只有不确定的答案才调用模型。
+    # 权重还没有校准，默认关闭；开启前先用 `flask rescore-ai-detection` 校准阈值（步骤见 app/ai_detection.py）
+    AI_DETECTION_PREFILTER = os.getenv('AI_DETECTION_PREFILTER', 'false').lower() == 'true'
+    # 少于这么多词的答案直接判为人写
+    AI_DETECTION_MIN_WORDS = int(os.getenv('AI_DETECTION_MIN_WORDS', '12'))
+    # 分数（0~1）不高于 human 阈值判为人写，不低于 ai 阈值判为 AI
+    AI_DETECTION_HUMAN_THRESHOLD = float(os.getenv('AI_DETECTION_HUMAN_THRESHOLD', '0.15'))
+    AI_DETECTION_AI_THRESHOLD = float(os.getenv('AI_DETECTION_AI_THRESHOLD', '0.9'))
+    # 每道题的 n-gram 语料使用最近多少条人写答案，以及多久重建一次（秒）
+    AI_DETECTION_CORPUS_SIZE = int(os.getenv('AI_DETECTION_CORPUS_SIZE', '500'))
+    AI_DETECTION_CORPUS_TTL = int(os.getenv('AI_DETECTION_CORPUS_TTL', '600'))
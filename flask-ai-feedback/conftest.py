@@ -11,6 +11,14 @@ class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
+    # 后台任务在当前线程中立即执行，重试不等待
+    JOBS_EAGER = True
+    JOB_RETRY_BASE_DELAY = 0
+    PURGE_BATCH_PAUSE = 0
+    BATCH_RETRY_BASE_DELAY = 0
+    # 检测逻辑由模拟的模型调用决定，需要预筛选的测试自行开启
+    AI_DETECTION_PREFILTER = False
+    LLM_RATE_LIMIT_RPM = 0
 
 @pytest.fixture(scope='module')
 def test_app():
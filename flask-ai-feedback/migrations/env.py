@@ -51,6 +51,24 @@ def get_metadata():
     return target_db.metadata
 
 
+# 全文检索对象由迁移 a5e2c8d17b94 手写创建，模型中没有对应的定义（见 app/search.py）:
+# SQLite 的 FTS5 虚拟表 responses_fts 及其影子表，PostgreSQL 的 search_vector 生成列和 GIN 索引。
+# autogenerate 时跳过它们，否则生成的迁移会把它们删掉
+SEARCH_TABLE = 'responses_fts'
+SEARCH_COLUMNS = {('responses', 'search_vector')}
+SEARCH_INDEXES = {'ix_responses_search_vector'}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and (name == SEARCH_TABLE or name.startswith(SEARCH_TABLE + '_')):
+        return False
+    if type_ == 'column' and (object.table.name, name) in SEARCH_COLUMNS:
+        return False
+    if type_ == 'index' and name in SEARCH_INDEXES:
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +83,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +112,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
@@ -0,0 +1,31 @@
+"""add prompt summaries table
+
+Revision ID: 0d6a8f5e3b27
+Revises: e41b7c2d9f06
+Create Date: 2026-10-18 13:10:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d6a8f5e3b27'
+down_revision = 'e41b7c2d9f06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('prompt_summaries',
+        sa.Column('prompt_id', sa.String(length=100), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('watermark_id', sa.Integer(), nullable=False),
+        sa.Column('response_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('prompt_id')
+    )
+
+
+def downgrade():
+    op.drop_table('prompt_summaries')
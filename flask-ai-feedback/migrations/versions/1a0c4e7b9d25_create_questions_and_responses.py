@@ -0,0 +1,48 @@
+"""create questions and responses (baseline schema)
+
+Revision ID: 1a0c4e7b9d25
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a0c4e7b9d25'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('questions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('prompt_id', sa.String(length=100), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('question_text', sa.Text(), nullable=False),
+    sa.Column('ai_prompt', sa.Text(), nullable=False),
+    sa.Column('image_url', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('prompt_id')
+    )
+    op.create_table('responses',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.String(length=100), nullable=True),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('student_answer', sa.Text(), nullable=False),
+    sa.Column('ai_feedback', sa.Text(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('rating', sa.Integer(), nullable=True),
+    sa.Column('feedback_comment', sa.Text(), nullable=True),
+    sa.Column('is_ai_generated', sa.Boolean(), nullable=False),
+    sa.Column('performance_grade', sa.String(length=50), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('responses')
+    op.drop_table('questions')
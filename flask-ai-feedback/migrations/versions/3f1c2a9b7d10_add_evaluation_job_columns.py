@@ -0,0 +1,32 @@
+"""add evaluation job columns to responses
+
+Revision ID: 3f1c2a9b7d10
+Revises: 1a0c4e7b9d25
+Create Date: 2026-10-18 09:12:44.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9b7d10'
+down_revision = '1a0c4e7b9d25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), server_default='done', nullable=False))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('locked_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_responses_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_responses_status'))
+        batch_op.drop_column('locked_at')
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('status')
@@ -0,0 +1,26 @@
+"""add updated_at to questions
+
+Revision ID: 5b9d03e7c6a1
+Revises: c2d7e9f41a58
+Create Date: 2026-10-18 11:20:17.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9d03e7c6a1'
+down_revision = 'c2d7e9f41a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
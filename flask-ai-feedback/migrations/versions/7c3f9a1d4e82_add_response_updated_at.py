@@ -0,0 +1,30 @@
+"""add updated_at to responses for the dashboard change feed
+
+Revision ID: 7c3f9a1d4e82
+Revises: 0d6a8f5e3b27
+Create Date: 2026-10-18 14:02:37.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3f9a1d4e82'
+down_revision = '0d6a8f5e3b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE responses SET updated_at = timestamp")
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.create_index('ix_responses_updated_at_id', ['updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.drop_index('ix_responses_updated_at_id')
+        batch_op.drop_column('updated_at')
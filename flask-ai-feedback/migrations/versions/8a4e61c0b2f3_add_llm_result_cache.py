@@ -0,0 +1,35 @@
+"""add llm result cache table
+
+Revision ID: 8a4e61c0b2f3
+Revises: 3f1c2a9b7d10
+Create Date: 2026-10-18 10:05:31.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e61c0b2f3'
+down_revision = '3f1c2a9b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('llm_result_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('prompt_id', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('llm_result_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_llm_result_cache_prompt_id'), ['prompt_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('llm_result_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_llm_result_cache_prompt_id'))
+
+    op.drop_table('llm_result_cache')
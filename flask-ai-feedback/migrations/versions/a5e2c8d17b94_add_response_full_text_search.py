@@ -0,0 +1,59 @@
+"""add full-text search index over student answers and AI feedback
+
+Revision ID: a5e2c8d17b94
+Revises: 7c3f9a1d4e82
+Create Date: 2026-10-18 15:21:06.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5e2c8d17b94'
+down_revision = '7c3f9a1d4e82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # FTS5 外部内容表，由触发器与 responses 保持同步
+        op.execute("CREATE VIRTUAL TABLE responses_fts USING fts5("
+                   "student_answer, ai_feedback, content='responses', content_rowid='id', "
+                   "tokenize='porter unicode61')")
+        op.execute("CREATE TRIGGER responses_fts_insert AFTER INSERT ON responses BEGIN "
+                   "INSERT INTO responses_fts(rowid, student_answer, ai_feedback) "
+                   "VALUES (new.id, new.student_answer, new.ai_feedback); END")
+        op.execute("CREATE TRIGGER responses_fts_delete AFTER DELETE ON responses BEGIN "
+                   "INSERT INTO responses_fts(responses_fts, rowid, student_answer, ai_feedback) "
+                   "VALUES ('delete', old.id, old.student_answer, old.ai_feedback); END")
+        op.execute("CREATE TRIGGER responses_fts_update AFTER UPDATE OF student_answer, ai_feedback "
+                   "ON responses BEGIN "
+                   "INSERT INTO responses_fts(responses_fts, rowid, student_answer, ai_feedback) "
+                   "VALUES ('delete', old.id, old.student_answer, old.ai_feedback); "
+                   "INSERT INTO responses_fts(rowid, student_answer, ai_feedback) "
+                   "VALUES (new.id, new.student_answer, new.ai_feedback); END")
+        # 为已有的行建立索引
+        op.execute("INSERT INTO responses_fts(responses_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        # 生成列在插入和修改时自动更新，删除的行随之从 GIN 索引中移除
+        op.execute("ALTER TABLE responses ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+                   "setweight(to_tsvector('english', coalesce(student_answer, '')), 'A') || "
+                   "setweight(to_tsvector('english', coalesce(ai_feedback, '')), 'B')) STORED")
+        op.create_index('ix_responses_search_vector', 'responses', ['search_vector'],
+                        unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS responses_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS responses_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS responses_fts_insert")
+        op.execute("DROP TABLE IF EXISTS responses_fts")
+    elif dialect == 'postgresql':
+        op.drop_index('ix_responses_search_vector', table_name='responses')
+        with op.batch_alter_table('responses', schema=None) as batch_op:
+            batch_op.drop_column('search_vector')
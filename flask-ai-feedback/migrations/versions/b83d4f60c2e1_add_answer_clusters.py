@@ -0,0 +1,54 @@
+"""add near-duplicate answer clusters
+
+Revision ID: b83d4f60c2e1
+Revises: a5e2c8d17b94
+Create Date: 2026-10-18 16:09:44.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83d4f60c2e1'
+down_revision = 'a5e2c8d17b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('answer_clusters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('prompt_id', sa.String(length=100), nullable=False),
+    sa.Column('representative_id', sa.Integer(), nullable=False),
+    sa.Column('representative_answer', sa.Text(), nullable=False),
+    sa.Column('signature', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('answer_clusters', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_answer_clusters_prompt_id'), ['prompt_id'], unique=False)
+
+    op.create_table('answer_cluster_buckets',
+    sa.Column('prompt_id', sa.String(length=100), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('prompt_id', 'bucket', 'cluster_id')
+    )
+
+    # 只添加列和索引，SQLite 上不会重建 responses 表（全文搜索的触发器得以保留）
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cluster_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_responses_question_cluster', ['question', 'cluster_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.drop_index('ix_responses_question_cluster')
+        batch_op.drop_column('cluster_id')
+
+    op.drop_table('answer_cluster_buckets')
+    with op.batch_alter_table('answer_clusters', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_answer_clusters_prompt_id'))
+
+    op.drop_table('answer_clusters')
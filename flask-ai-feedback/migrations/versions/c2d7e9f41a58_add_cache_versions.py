@@ -0,0 +1,28 @@
+"""add cache versions table
+
+Revision ID: c2d7e9f41a58
+Revises: 8a4e61c0b2f3
+Create Date: 2026-10-18 10:48:02.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d7e9f41a58'
+down_revision = '8a4e61c0b2f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
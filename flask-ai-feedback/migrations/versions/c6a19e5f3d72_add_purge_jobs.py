@@ -0,0 +1,38 @@
+"""add purge_jobs for batched background deletes
+
+Revision ID: c6a19e5f3d72
+Revises: b83d4f60c2e1
+Create Date: 2026-10-18 17:12:30.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a19e5f3d72'
+down_revision = 'b83d4f60c2e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('purge_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('prompt_id', sa.String(length=100), nullable=True),
+    sa.Column('cutoff_id', sa.Integer(), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('deleted', sa.Integer(), nullable=False),
+    sa.Column('archive_path', sa.String(length=500), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('purge_jobs')
@@ -0,0 +1,39 @@
+"""add archive_partitions manifest for cold response storage
+
+Revision ID: d29b7e4a81f6
+Revises: c6a19e5f3d72
+Create Date: 2026-10-18 18:40:10.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd29b7e4a81f6'
+down_revision = 'c6a19e5f3d72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('archive_partitions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('prompt_id', sa.String(length=100), nullable=False),
+    sa.Column('period', sa.String(length=100), nullable=False),
+    sa.Column('path', sa.String(length=500), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('size_bytes', sa.Integer(), nullable=False),
+    sa.Column('min_id', sa.Integer(), nullable=True),
+    sa.Column('max_id', sa.Integer(), nullable=True),
+    sa.Column('min_timestamp', sa.DateTime(), nullable=True),
+    sa.Column('max_timestamp', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('prompt_id', 'period', name='uq_archive_partitions_prompt_period')
+    )
+
+
+def downgrade():
+    op.drop_table('archive_partitions')
@@ -0,0 +1,32 @@
+"""add indexes on response hot columns
+
+Revision ID: e41b7c2d9f06
+Revises: 5b9d03e7c6a1
+Create Date: 2026-10-18 12:02:49.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7c2d9f06'
+down_revision = '5b9d03e7c6a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.create_index('ix_responses_question_timestamp', ['question', sa.text('timestamp DESC')], unique=False)
+        batch_op.create_index('ix_responses_question_is_ai', ['question', 'is_ai_generated'], unique=False)
+        batch_op.create_index('ix_responses_timestamp_id', [sa.text('timestamp DESC'), sa.text('id DESC')], unique=False)
+        batch_op.create_index('ix_responses_student_id', ['student_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.drop_index('ix_responses_student_id')
+        batch_op.drop_index('ix_responses_timestamp_id')
+        batch_op.drop_index('ix_responses_question_is_ai')
+        batch_op.drop_index('ix_responses_question_timestamp')
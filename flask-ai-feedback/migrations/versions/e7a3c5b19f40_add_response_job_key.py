@@ -0,0 +1,28 @@
+"""add job_key to responses for evaluation status lookups
+
+Revision ID: e7a3c5b19f40
+Revises: d29b7e4a81f6
+Create Date: 2026-10-18 21:05:30.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3c5b19f40'
+down_revision = 'd29b7e4a81f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('job_key', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_responses_job_key', ['job_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_responses_job_key', type_='unique')
+        batch_op.drop_column('job_key')
@@ -0,0 +1,26 @@
+"""add drop_archived to purge_jobs
+
+Revision ID: f3b8d2a6c914
+Revises: e7a3c5b19f40
+Create Date: 2026-10-18 21:40:15.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2a6c914'
+down_revision = 'e7a3c5b19f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('purge_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('drop_archived', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('purge_jobs', schema=None) as batch_op:
+        batch_op.drop_column('drop_archived')
@@ -1,8 +1,18 @@
 # seed_database.py (Updated Version)
+#
+# 用法:
+#   python seed_database.py                      # 20 条假数据（与原来相同）
+#   python seed_database.py --count 2000000 --prompts 40
+# 大量数据使用批量 INSERT 写入，几百万行也只需要几分钟。
 
+import argparse
 import random
+from datetime import datetime, timedelta
 from faker import Faker
-from app import app, db, Response # 从您的主应用中导入app, db和Response模型
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import Response, Question
+from app.question_cache import bump_questions_version
 
 # --- 配置 ---
 NUMBER_OF_FAKE_ENTRIES = 20 # 您想创建多少条假数据
@@ -30,44 +40,87 @@ FAKE_GRADES = [
     "Too superficial",
     "Misunderstood / incorrect"
 ]
+FAKE_AI_PROMPT = (
+    "You are a warm and encouraging statistics tutor. The student critiques a misleading bar chart. "
+    "Classify the answer as one of: " + ", ".join(FAKE_GRADES) + "."
+)
+
+
+def prompt_ids_for(prompts):
+    """只有一道题时沿用原来的 dataviz_critique"""
+    return ["dataviz_critique"] if prompts == 1 else [f"dataviz_critique_{i}" for i in range(prompts)]
 
 
 # --- 主函数 ---
-def seed_data():
+def seed_data(app=None, count=NUMBER_OF_FAKE_ENTRIES, prompts=1, batch_size=10000, clear=True, seed=None):
+    """写入 count 条假回答（平均分布在 prompts 道题上），同时确保这些题目存在"""
     # 创建一个Faker实例
     fake = Faker()
-    
+    rng = random.Random(seed)
+    if seed is not None:
+        Faker.seed(seed)
+    app = app or create_app()
+    prompt_ids = prompt_ids_for(prompts)
+
     # 使用app_context来确保数据库连接正确
     with app.app_context():
         print(f"Connecting to database...")
-        
-        print(f"Deleting old data from the 'responses' table...")
-        # 为了避免重复，我们先清空旧数据
-        db.session.query(Response).delete()
-        db.session.commit()
+        db.create_all()
 
-        print(f"Creating {NUMBER_OF_FAKE_ENTRIES} new fake entries...")
-        # 循环创建新的数据对象
-        for i in range(NUMBER_OF_FAKE_ENTRIES):
-            # 随机决定这条假数据是否被标记为AI生成
-            is_ai = random.choice([True, False])
-            
-            new_response = Response(
-                student_id=f"fake_{fake.user_name()}",
-                question="dataviz_critique", # 使用prompt_id
-                student_answer=random.choice(FAKE_ANSWERS),
-                ai_feedback="This is a generated AI feedback for a fake entry.",
-                timestamp=fake.date_time_this_year(),
-                rating=random.randint(1, 5),
-                feedback_comment=random.choice(FAKE_COMMENTS),
-                is_ai_generated=is_ai,
-                performance_grade=random.choice(FAKE_GRADES) # <-- 新增：为新列生成模拟数据
-            )
-            db.session.add(new_response) # 将新对象添加到“待办列表”
+        if clear:
+            print(f"Deleting old data from the 'responses' table...")
+            # 为了避免重复，我们先清空旧数据
+            db.session.query(Response).delete()
+            db.session.commit()
 
-        # 一次性将所有新数据提交到数据库，效率更高
+        existing = {q.prompt_id for q in Question.query.filter(Question.prompt_id.in_(prompt_ids))}
+        for prompt_id in prompt_ids:
+            if prompt_id not in existing:
+                db.session.add(Question(prompt_id=prompt_id, title=prompt_id.replace('_', ' ').title(),
+                                        question_text="What is the worst design choice in this chart?",
+                                        ai_prompt=FAKE_AI_PROMPT))
+        # 让运行中的 worker 重新加载题目缓存（包括之前查不到的 id）
+        bump_questions_version()
         db.session.commit()
-        print(f"Successfully seeded the database with {NUMBER_OF_FAKE_ENTRIES} entries!")
+
+        print(f"Creating {count} new fake entries...")
+        # Faker 生成用户名很慢，先生成一个学生池再随机选取
+        students = [f"fake_{fake.user_name()}_{i}" for i in range(min(max(count // 20, 1), 50000))]
+        now = datetime.now()
+        for offset in range(0, count, batch_size):
+            rows = []
+            for _ in range(min(batch_size, count - offset)):
+                timestamp = now - timedelta(seconds=rng.randint(0, 180 * 86400))
+                rows.append({
+                    'student_id': rng.choice(students),
+                    'question': rng.choice(prompt_ids),
+                    'student_answer': rng.choice(FAKE_ANSWERS),
+                    'ai_feedback': "This is a generated AI feedback for a fake entry.",
+                    'timestamp': timestamp,
+                    'updated_at': timestamp,
+                    'rating': rng.randint(1, 5),
+                    'feedback_comment': rng.choice(FAKE_COMMENTS),
+                    # 随机决定这条假数据是否被标记为AI生成
+                    'is_ai_generated': rng.random() < 0.2,
+                    'performance_grade': rng.choice(FAKE_GRADES),
+                    'status': 'done',
+                    'attempts': 1,
+                })
+            # 每批一次性提交，效率更高
+            db.session.execute(insert(Response), rows)
+            db.session.commit()
+            if count > batch_size:
+                print(f"  {offset + len(rows)}/{count}")
+
+        print(f"Successfully seeded the database with {count} entries!")
+    return prompt_ids
+
 
 if __name__ == '__main__':
-    seed_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Fill the responses table with fake data.')
+    parser.add_argument('--count', type=int, default=NUMBER_OF_FAKE_ENTRIES)
+    parser.add_argument('--prompts', type=int, default=1, help='number of questions to spread the answers over')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--keep', action='store_true', help='append instead of deleting existing responses')
+    args = parser.parse_args()
+    seed_data(count=args.count, prompts=args.prompts, batch_size=args.batch_size, clear=not args.keep)
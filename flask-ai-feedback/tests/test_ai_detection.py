@@ -0,0 +1,62 @@
+from app import services, ai_detection
+from app.models import Response
+
+AI_STYLE = (
+    "**Key issues:**\n- The y-axis uses inconsistent intervals, distorting comparisons.\n"
+    "- The green arrow lacks a clear meaning.\n- The label Q1P is unexplained.\n\n"
+    "Overall, it is important to note that these choices mislead the audience."
+)
+HUMAN_STYLE = ("I think the worst part is the y-axis, the intervals are not even and it's very misleading. "
+               "also the colors r kinda bright lol")
+
+
+def test_scores_separate_clear_cases(test_app):
+    """测试: 口语化的学生答案得分很低，带 Markdown 和套话的答案得分很高，短答案直接判为人写。"""
+    human_score, ai_score = ai_detection.score_many([HUMAN_STYLE, AI_STYLE])
+    assert human_score < 0.15 < 0.9 < ai_score
+
+    config = test_app.config
+    assert ai_detection.decide(HUMAN_STYLE, human_score, config) == ai_detection.HUMAN
+    assert ai_detection.decide(AI_STYLE, ai_score, config) == ai_detection.AI
+    assert ai_detection.decide("I don't know, it looks fine to me.", 0.99, config) == ai_detection.HUMAN
+
+
+def test_prefilter_skips_model_for_clear_cases(test_app, monkeypatch):
+    """测试: 明显的情况不调用模型；不确定的答案仍交给模型，并记录在统计中。"""
+    monkeypatch.setitem(test_app.extensions, 'ai_detector', ai_detection.Detector())
+    calls = []
+    monkeypatch.setattr(services, "is_answer_ai_generated", lambda answer: calls.append(answer) or True)
+
+    assert services.detect_ai_generated("detect-prompt", "I don't know, it looks fine to me.") is False
+    assert services.detect_ai_generated("detect-prompt", AI_STYLE) is True
+    assert calls == []
+
+    # 把阈值调到两端后，所有足够长的答案都需要模型判断
+    monkeypatch.setitem(test_app.config, "AI_DETECTION_HUMAN_THRESHOLD", 0.0)
+    monkeypatch.setitem(test_app.config, "AI_DETECTION_AI_THRESHOLD", 1.0)
+    assert services.detect_ai_generated("detect-prompt", HUMAN_STYLE) is True
+    assert calls == [HUMAN_STYLE]
+
+    stats = test_app.extensions['ai_detector'].stats()
+    assert (stats['local_human'], stats['local_ai'], stats['escalated']) == (1, 1, 1)
+    assert stats['skip_rate'] == round(2 / 3, 4)
+
+
+def test_rescore_cli_reports_skip_rate(test_app, db_session):
+    """测试: flask rescore-ai-detection 统计整个表中可以本地判断的比例，且不修改数据。"""
+    db_session.add_all([
+        Response(student_id='s1', question='rescore', student_answer="idk", ai_feedback='f', is_ai_generated=False),
+        Response(student_id='s2', question='rescore', student_answer=HUMAN_STYLE, ai_feedback='f', is_ai_generated=False),
+        Response(student_id='s3', question='rescore', student_answer=AI_STYLE, ai_feedback='f', is_ai_generated=True),
+    ])
+    db_session.commit()
+
+    report = ai_detection.rescore_responses('rescore')
+    assert report['total'] == 3
+    assert report['escalated'] == 0
+    assert report['agreement_with_stored'] == 1.0
+
+    result = test_app.test_cli_runner().invoke(args=['rescore-ai-detection', '--prompt-id', 'rescore'])
+    assert result.exit_code == 0, result.output
+    assert "skip rate 100.0%" in result.output
+    assert Response.query.filter_by(question='rescore', is_ai_generated=True).count() == 1
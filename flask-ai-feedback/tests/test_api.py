@@ -1,5 +1,8 @@
 import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
 from app.models import Question, Response
+from app import services
 
 # --- 公共和学生端 API 测试 ---
 
@@ -143,4 +146,216 @@ def test_rate_feedback_nonexistent_id(test_client):
         'response_id': 99999, 'rating': 5, 'comment': 'Helpful'
     })
     # 断言
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+
+def test_question_details_conditional_request(authenticated_client, db_session):
+    """新增测试: question-details 返回 ETag 和 Cache-Control，ETag 未变时返回 304，修改题目后 ETag 改变。"""
+    db_session.add(Question(prompt_id="etag-test", title="ETag Test", question_text="Q", ai_prompt="A"))
+    db_session.commit()
+
+    first = authenticated_client.get('/api/question-details/etag-test')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert 'stale-while-revalidate' in first.headers['Cache-Control']
+    assert first.headers.get('Last-Modified')
+
+    second = authenticated_client.get('/api/question-details/etag-test', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+
+    authenticated_client.post('/api/update-question/etag-test', data={'title': 'Edited'})
+    third = authenticated_client.get('/api/question-details/etag-test', headers={'If-None-Match': etag})
+    assert third.status_code == 200
+    assert third.get_json()['title'] == 'Edited'
+
+def test_question_details_batch(test_client, db_session):
+    """新增测试: 批量端点一次返回多个题目，并列出不存在的 prompt_id。"""
+    db_session.add(Question(prompt_id="batch-a", title="A", question_text="QA", ai_prompt="A"))
+    db_session.add(Question(prompt_id="batch-b", title="B", question_text="QB", ai_prompt="A"))
+    db_session.commit()
+
+    response = test_client.get('/api/question-details?prompt_ids=batch-a,batch-b,batch-missing')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['questions']['batch-a']['title'] == "A"
+    assert data['questions']['batch-b']['question_text'] == "QB"
+    assert data['missing'] == ['batch-missing']
+    assert response.headers['ETag']
+
+    assert test_client.get('/api/question-details').status_code == 400
+
+def test_get_all_feedback_keyset_pagination(authenticated_client, db_session):
+    """新增测试: 带 limit 时按游标分页，各页之间不重复也不遗漏。"""
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    for i in range(5):
+        # 两条记录使用相同时间戳，验证 id 作为并列排序键
+        db_session.add(Response(question="paged", student_answer=f"a{i}", ai_feedback="f",
+                                timestamp=base + timedelta(minutes=min(i, 3))))
+    db_session.commit()
+
+    seen, cursor = [], None
+    while True:
+        url = '/api/get-all-feedback?prompt_id=paged&limit=2'
+        if cursor:
+            url += f'&cursor={cursor}'
+        data = authenticated_client.get(url).get_json()
+        seen.extend(item['student_answer'] for item in data['items'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == ['a4', 'a3', 'a2', 'a1', 'a0']
+
+def test_get_all_feedback_fields_and_filters(authenticated_client, db_session):
+    """新增测试: fields= 只返回指定列，筛选条件在服务器端生效。"""
+    db_session.add(Response(question="filtered", student_answer="a1", ai_feedback="f1", rating=5,
+                            performance_grade="Great answer", timestamp=datetime(2026, 2, 1)))
+    db_session.add(Response(question="filtered", student_answer="a2", ai_feedback="f2", rating=2,
+                            performance_grade="Too superficial", is_ai_generated=True,
+                            timestamp=datetime(2026, 3, 1)))
+    db_session.commit()
+
+    data = authenticated_client.get(
+        '/api/get-all-feedback?prompt_id=filtered&fields=id,rating&rating=5').get_json()
+    assert len(data) == 1
+    assert set(data[0]) == {'id', 'rating'}
+
+    data = authenticated_client.get(
+        '/api/get-all-feedback?prompt_id=filtered&is_ai_generated=true&start=2026-02-15&end=2026-03-01'
+    ).get_json()
+    assert [r['student_answer'] for r in data] == ['a2']
+
+    assert authenticated_client.get('/api/get-all-feedback?fields=password').status_code == 400
+    assert authenticated_client.get('/api/get-all-feedback?cursor=not-a-cursor').status_code == 400
+
+def test_feedback_stats_as_admin(authenticated_client, db_session):
+    """新增测试: feedback-stats 在数据库中汇总评级、评分、AI 标记和每日提交数。"""
+    db_session.add(Response(question="stats", student_answer="a", ai_feedback="f", rating=5,
+                            performance_grade="Great answer", timestamp=datetime(2026, 4, 1, 9)))
+    db_session.add(Response(question="stats", student_answer="b", ai_feedback="f", rating=5,
+                            performance_grade="Great answer", timestamp=datetime(2026, 4, 1, 15)))
+    db_session.add(Response(question="stats", student_answer="c", ai_feedback="f", rating=2,
+                            is_ai_generated=True, timestamp=datetime(2026, 4, 2, 10)))
+    db_session.commit()
+
+    stats = authenticated_client.get('/api/feedback-stats?prompt_id=stats').get_json()
+    assert stats['total'] == 3
+    assert stats['ai_flagged'] == 1
+    assert stats['grades'] == {'Great answer': 2}
+    assert stats['ratings'] == {'1': 0, '2': 1, '3': 0, '4': 0, '5': 2}
+    assert stats['per_day'] == [{'date': '2026-04-01', 'count': 2}, {'date': '2026-04-02', 'count': 1}]
+    assert stats['per_prompt'] == [{'prompt_id': 'stats', 'count': 3, 'ai_flagged': 1}]
+
+def test_evaluate_stream_sends_tokens_and_saves_response(test_client, db_session, monkeypatch):
+    """新增测试: /api/evaluate-stream 逐段推送反馈，结束时保存带评级的记录。"""
+    db_session.add(Question(prompt_id="stream-prompt", title="Stream", question_text="Q", ai_prompt="Rubric"))
+    db_session.commit()
+
+    def fake_generate(prompt, stream=False):
+        if stream:
+            return [MagicMock(text=t) for t in ["GRADE: Go", "od answer\nNice ", "use of the ", "y-axis."]]
+        return MagicMock(text='{"classification": "Human"}')
+    monkeypatch.setattr('app.services.model.generate_content', fake_generate)
+
+    response = test_client.post('/api/evaluate-stream', json={
+        'answer': 'streamed answer', 'prompt_id': 'stream-prompt', 'student_id': 'streamer'
+    })
+    assert response.mimetype == 'text/event-stream'
+
+    events = [block for block in response.get_data(as_text=True).split('\n\n') if block]
+    tokens = [json.loads(e.split('data: ', 1)[1])['text'] for e in events if e.startswith('event: token')]
+    assert ''.join(tokens) == "Nice use of the y-axis."
+    done = json.loads(events[-1].split('data: ', 1)[1])
+    assert done['feedback'] == "Nice use of the y-axis."
+
+    saved = db_session.get(Response, done['response_id'])
+    assert saved.performance_grade == "Good answer"
+    assert saved.student_id == "streamer"
+
+def test_evaluate_stream_sends_error_event_on_timeout(test_client, db_session, monkeypatch):
+    """测试: 流式评分超时时最后发送 error 事件，结果不进入缓存。"""
+    db_session.add(Question(prompt_id="stream-timeout", title="Stream", question_text="Q", ai_prompt="Rubric"))
+    db_session.commit()
+
+    def stalled_stream():
+        yield MagicMock(text="GRADE: Good answer\nStart of ")
+        raise TimeoutError("No stream chunk within 20.0s")
+
+    def fake_generate(prompt, stream=False):
+        return stalled_stream() if stream else MagicMock(text='{"classification": "Human"}')
+    monkeypatch.setattr('app.services.model.generate_content', fake_generate)
+
+    response = test_client.post('/api/evaluate-stream', json={'answer': 'slow answer', 'prompt_id': 'stream-timeout'})
+    events = [block for block in response.get_data(as_text=True).split('\n\n') if block]
+    assert events[0].startswith('event: token')
+    assert events[-1].startswith('event: error')
+    assert not any(e.startswith('event: done') for e in events)
+    assert services.get_cached_evaluation('stream-timeout', 'slow answer') is None
+
+def test_feedback_changes_reports_inserts_and_ratings(authenticated_client, test_client, db_session, monkeypatch):
+    """新增测试: 变更接口只返回游标之后新插入或被评分的回答，SSE 版本推送相同的内容。"""
+    monkeypatch.setitem(authenticated_client.application.config, 'FEEDBACK_CHANGES_OVERLAP_SECONDS', 0)
+    old = Response(question="live", student_answer="old answer", ai_feedback="f")
+    db_session.add(old)
+    db_session.commit()
+    cursor = authenticated_client.get('/api/feedback-changes?prompt_id=live').get_json()['cursor']
+
+    new = Response(question="live", student_answer="new answer", ai_feedback="f")
+    db_session.add(new)
+    db_session.commit()
+    test_client.post('/api/rate-feedback', json={'response_id': old.id, 'rating': 4})
+
+    data = authenticated_client.get(f'/api/feedback-changes?prompt_id=live&since={cursor}').get_json()
+    assert [(item['id'], item['rating']) for item in data['items']] == [(new.id, None), (old.id, 4)]
+    again = authenticated_client.get(f"/api/feedback-changes?prompt_id=live&since={data['cursor']}").get_json()
+    assert again['items'] == []
+
+    assert authenticated_client.get(f'/api/feedback-stream?prompt_id=live&since={cursor}').status_code == 404
+    monkeypatch.setitem(authenticated_client.application.config, 'FEEDBACK_STREAM_ENABLED', True)
+    monkeypatch.setitem(authenticated_client.application.config, 'FEEDBACK_STREAM_MAX_SECONDS', 0)
+    stream = authenticated_client.get(f'/api/feedback-stream?prompt_id=live&since={cursor}')
+    assert stream.mimetype == 'text/event-stream'
+    changes = [b for b in stream.get_data(as_text=True).split('\n\n') if 'event: change' in b]
+    assert len(changes) == 2
+    assert changes[-1].startswith(f"id: {data['cursor']}")
+
+
+def test_feedback_changes_rereads_overlap_window(authenticated_client, db_session, monkeypatch):
+    """新增测试: 晚提交、updated_at 落在游标之前的行在重叠窗口内仍会被返回，游标不会后退。"""
+    monkeypatch.setitem(authenticated_client.application.config, 'FEEDBACK_CHANGES_OVERLAP_SECONDS', 5)
+    now = datetime(2026, 5, 1, 12, 0, 0)
+    seen = Response(question="late", student_answer="seen", ai_feedback="f", updated_at=now)
+    db_session.add_all([Response(question="late", student_answer="old", ai_feedback="f",
+                                 updated_at=now - timedelta(minutes=1)), seen])
+    db_session.commit()
+    cursor = authenticated_client.get('/api/feedback-changes?prompt_id=late').get_json()['cursor']
+
+    late = Response(question="late", student_answer="late", ai_feedback="f", updated_at=now - timedelta(seconds=2))
+    db_session.add(late)
+    db_session.commit()
+
+    data = authenticated_client.get(f'/api/feedback-changes?prompt_id=late&since={cursor}').get_json()
+    assert [item['id'] for item in data['items']] == [late.id, seen.id]
+    assert data['cursor'] == cursor
+
+
+def test_feedback_changes_advance_past_a_busy_overlap_window(test_app, db_session, monkeypatch):
+    """新增测试: 重叠窗口内的行超过 limit 时，游标之后的新行仍会返回，游标继续前进。"""
+    from app import queries
+    monkeypatch.setitem(test_app.config, 'FEEDBACK_CHANGES_OVERLAP_SECONDS', 60)
+    now = datetime(2026, 6, 1, 12, 0, 0)
+    burst = [Response(question="burst", student_answer=f"a{i}", ai_feedback="f", updated_at=now) for i in range(5)]
+    db_session.add_all(burst)
+    db_session.commit()
+    cursor = queries.encode_cursor(now, burst[-1].id)
+
+    newer = Response(question="burst", student_answer="newer", ai_feedback="f", updated_at=now + timedelta(seconds=1))
+    db_session.add(newer)
+    db_session.commit()
+
+    items, next_cursor = queries.changes_since(cursor, 'burst', limit=3)
+    assert newer.id in [item['id'] for item in items]
+    assert next_cursor == queries.encode_cursor(newer.updated_at, newer.id)
+    items, again = queries.changes_since(next_cursor, 'burst', limit=3)
+    assert again == next_cursor
@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from app import archive
+from app.models import Response, ArchivePartition
+
+
+def _add(db_session, prompt_id, answer, timestamp, student_id='s'):
+    row = Response(question=prompt_id, student_id=student_id, student_answer=answer, ai_feedback='Good point.',
+                   timestamp=timestamp)
+    db_session.add(row)
+    db_session.commit()
+    return row.id
+
+
+def test_old_responses_move_to_monthly_partitions(test_app, authenticated_client, db_session, monkeypatch, tmp_path):
+    """测试: 旧回答按月份移到归档分区后从热表删除；导出和搜索在 include_archived 时能读到它们。"""
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_DIR', str(tmp_path))
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_BATCH_SIZE', 2)
+    old = [_add(db_session, 'archive-a', f"old placebo answer {i}", datetime(2024, 1 + i % 2, 10)) for i in range(3)]
+    recent = _add(db_session, 'archive-a', "recent placebo answer", datetime(2026, 9, 1))
+
+    report = archive.archive_responses(before=datetime(2025, 1, 1), prompt_id='archive-a')
+    assert report == {'archived': 3, 'partitions': 2}
+    assert [r.id for r in Response.query.filter_by(question='archive-a')] == [recent]
+
+    listing = authenticated_client.get('/api/archive-partitions?prompt_id=archive-a').get_json()
+    assert listing['total_rows'] == 3
+    assert [(p['period'], p['row_count']) for p in listing['partitions']] == [('2024-01', 2), ('2024-02', 1)]
+
+    hot_only = authenticated_client.get('/api/export-responses?format=ndjson&prompt_id=archive-a&fields=id')
+    assert [json.loads(line)['id'] for line in hot_only.get_data(as_text=True).splitlines()] == [recent]
+    exported = authenticated_client.get(
+        '/api/export-responses?format=ndjson&prompt_id=archive-a&fields=id,timestamp&include_archived=1')
+    records = [json.loads(line) for line in exported.get_data(as_text=True).splitlines()]
+    assert [r['id'] for r in records] == [old[0], old[2], old[1], recent]
+    assert records[0]['timestamp'] == '2024-01-10T00:00:00'
+
+    window = authenticated_client.get('/api/export-responses?format=ndjson&prompt_id=archive-a&fields=id'
+                                      '&start=2024-02-01&end=2024-02-28&include_archived=1')
+    assert [json.loads(line)['id'] for line in window.get_data(as_text=True).splitlines()] == [old[1]]
+
+    found = authenticated_client.get('/api/search-responses?q=placebo&prompt_id=archive-a&include_archived=1')
+    items = found.get_json()['items']
+    assert [(item['id'], item['archived']) for item in items] == \
+        [(recent, False)] + [(row_id, True) for row_id in reversed(old)]
+    assert '<mark>placebo</mark>' in items[1]['answer_snippet']
+    paged = authenticated_client.get('/api/search-responses?q=placebo&prompt_id=archive-a&include_archived=1'
+                                     '&limit=2&offset=2').get_json()['items']
+    assert [item['id'] for item in paged] == [old[1], old[0]]
+
+
+def test_uncommitted_tail_is_ignored_and_truncated(test_app, db_session, monkeypatch, tmp_path):
+    """测试: 清单之外的尾部（崩溃时写了一半的批次）读取时被忽略，下次追加前被截掉。"""
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_DIR', str(tmp_path))
+    first = _add(db_session, 'archive-crash', "first", datetime(2024, 3, 1))
+    archive.archive_responses(prompt_id='archive-crash', term='2024-spring')
+    partition = ArchivePartition.query.filter_by(prompt_id='archive-crash').one()
+    path = os.path.join(archive.partition_root(), partition.path)
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(b'{"id": -1}\n'))
+
+    assert [r['id'] for r in archive.read_partition(partition)] == [first]
+    second = _add(db_session, 'archive-crash', "second", datetime(2024, 4, 1))
+    archive.archive_responses(prompt_id='archive-crash', term='2024-spring')
+    assert os.path.getsize(path) == partition.size_bytes
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        assert [json.loads(line)['id'] for line in f] == [first, second]
+
+
+def test_pending_responses_are_not_archived(test_app, db_session, monkeypatch, tmp_path):
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_DIR', str(tmp_path))
+    row = db_session.get(Response, _add(db_session, 'archive-pending', "still grading", datetime(2024, 1, 1)))
+    row.status = 'pending'
+    db_session.commit()
+    assert archive.archive_responses(prompt_id='archive-pending')['archived'] == 0
+    assert Response.query.filter_by(question='archive-pending').count() == 1
+
+
+def test_purge_drops_matching_partitions(test_app, authenticated_client, db_session, monkeypatch, tmp_path):
+    """测试: 明确要求时，清空题目同时删除它的归档分区（开启归档时记录先写入清除归档），其它题目的分区保留。"""
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_DIR', str(tmp_path))
+    cold = _add(db_session, 'archive-purge', "archived answer", datetime(2024, 1, 1))
+    _add(db_session, 'archive-survivor', "kept answer", datetime(2024, 1, 1))
+    archive.archive_responses(before=datetime(2025, 1, 1), prompt_id='archive-purge')
+    archive.archive_responses(before=datetime(2025, 1, 1), prompt_id='archive-survivor')
+    path = os.path.join(archive.partition_root(), ArchivePartition.query.filter_by(prompt_id='archive-purge').one().path)
+    hot = _add(db_session, 'archive-purge', "hot answer", datetime(2026, 9, 1))
+
+    response = authenticated_client.post('/api/clear-problem-feedback',
+                                         json={'prompt_id': 'archive-purge', 'archive': True, 'drop_archived': True})
+    job = response.get_json()['purge']
+    assert ArchivePartition.query.filter_by(prompt_id='archive-purge').count() == 0
+    assert not os.path.exists(path)
+    assert ArchivePartition.query.filter_by(prompt_id='archive-survivor').count() == 1
+    with gzip.open(job['archive_path'], 'rt', encoding='utf-8') as f:
+        assert sorted(json.loads(line)['id'] for line in f) == [cold, hot]
+
+
+def test_purge_keeps_partitions_unless_asked(test_app, authenticated_client, db_session, monkeypatch, tmp_path):
+    """测试: 没有 drop_archived 时，清空全部只删除热表，归档分区保留。"""
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_DIR', str(tmp_path))
+    _add(db_session, 'archive-kept', "cold answer", datetime(2024, 1, 1))
+    archive.archive_responses(before=datetime(2025, 1, 1), prompt_id='archive-kept')
+    _add(db_session, 'archive-kept', "hot answer", datetime(2026, 9, 1))
+
+    job = authenticated_client.post('/api/clear-all-feedback', json={}).get_json()['purge']
+    assert job['drop_archived'] is False
+    assert Response.query.filter_by(question='archive-kept').count() == 0
+    assert ArchivePartition.query.filter_by(prompt_id='archive-kept').count() == 1
+
+
+def test_archive_cli_requires_an_explicit_range(test_app, db_session, monkeypatch, tmp_path):
+    """测试: flask archive-responses 必须指定 --before、--default-cutoff 或 --all。"""
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_DIR', str(tmp_path))
+    _add(db_session, 'archive-cli', "recent answer", datetime(2026, 9, 1))
+    runner = test_app.test_cli_runner()
+
+    result = runner.invoke(args=['archive-responses', '--prompt-id', 'archive-cli'])
+    assert result.exit_code != 0
+    assert Response.query.filter_by(question='archive-cli').count() == 1
+
+    result = runner.invoke(args=['archive-responses', '--prompt-id', 'archive-cli', '--all'])
+    assert result.exit_code == 0, result.output
+    assert "Archived 1 response(s)" in result.output
+
+
+def test_default_cutoff_is_naive_utc(test_app, monkeypatch):
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_AFTER_DAYS', 30)
+    with test_app.app_context():
+        cutoff = archive.default_cutoff()
+    expected = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=30)
+    assert cutoff.tzinfo is None
+    assert abs((cutoff - expected).total_seconds()) < 5
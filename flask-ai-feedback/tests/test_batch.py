@@ -0,0 +1,99 @@
+from app import services, batch
+from app.models import Response
+
+
+def test_batch_deduplicates_and_bulk_inserts(authenticated_client, db_session, monkeypatch):
+    """测试: 相同题目下重复的答案只评估一次，所有记录一起写入。"""
+    calls = []
+    def fake_evaluate(prompt_id, answer):
+        calls.append((prompt_id, answer))
+        return False, f"Feedback for {answer.strip()}", "Good answer"
+    monkeypatch.setattr(services, "evaluate_answer", fake_evaluate)
+
+    records = [
+        {'student_id': 's1', 'prompt_id': 'batch-dedupe', 'answer': 'The y-axis is misleading.'},
+        {'student_id': 's2', 'prompt_id': 'batch-dedupe', 'answer': 'the Y-axis is  misleading.'},
+        {'student_id': 's3', 'prompt_id': 'batch-dedupe', 'answer': 'Colors are too bright.'},
+        {'student_id': 's4', 'prompt_id': 'batch-dedupe', 'answer': '   '},
+    ]
+    report = authenticated_client.post('/api/evaluate-batch', json={'records': records}).get_json()
+
+    assert len(calls) == 2
+    assert report['unique_answers'] == 2
+    assert report['inserted'] == 3
+    assert len(report['invalid']) == 1
+    saved = Response.query.filter_by(question='batch-dedupe').order_by(Response.student_id).all()
+    assert [r.student_id for r in saved] == ['s1', 's2', 's3']
+    assert saved[1].ai_feedback == "Feedback for The y-axis is misleading."
+
+
+def test_batch_resumes_after_partial_failure(test_app, db_session, monkeypatch):
+    """测试: 失败的记录不会写入；用同样的输入重新运行时只评估之前失败的记录。"""
+    records = [
+        {'student_id': 's1', 'prompt_id': 'batch-resume', 'answer': 'works'},
+        {'student_id': 's2', 'prompt_id': 'batch-resume', 'answer': 'flaky'},
+    ]
+    monkeypatch.setattr(services, "evaluate_answer",
+                        lambda p, a: (False, "err", "Error") if a == 'flaky' else (False, "ok", "Good answer"))
+    first = batch.run_batch(records)
+    assert first['inserted'] == 1
+    assert [r['answer'] for r in first['failed']] == ['flaky']
+
+    calls = []
+    monkeypatch.setattr(services, "evaluate_answer", lambda p, a: calls.append(a) or (False, "ok", "Good answer"))
+    second = batch.run_batch(records)
+    assert calls == ['flaky']
+    assert second['skipped_existing'] == 1
+    assert Response.query.filter_by(question='batch-resume').count() == 2
+
+
+def test_grade_batch_cli(test_app, db_session, monkeypatch, tmp_path):
+    """测试: flask grade-batch 读取 CSV 并报告处理结果。"""
+    monkeypatch.setattr(services, "evaluate_answer", lambda p, a: (True, "cli feedback", "Great answer"))
+    input_file = tmp_path / "answers.csv"
+    input_file.write_text("student_id,prompt_id,answer\ns1,batch-cli,First\ns2,batch-cli,Second\n")
+
+    result = test_app.test_cli_runner().invoke(args=['grade-batch', str(input_file)])
+    assert result.exit_code == 0, result.output
+    assert "Inserted 2 response(s)" in result.output
+    assert Response.query.filter_by(question='batch-cli', is_ai_generated=True).count() == 2
+
+
+def test_batch_endpoint_reports_bad_records_individually(authenticated_client, db_session, monkeypatch):
+    """测试: 格式不对的记录（非对象、字段类型错误）和评估失败的记录都按位置报告原因，不会导致 500。"""
+    monkeypatch.setattr(services, "evaluate_answer",
+                        lambda p, a: (False, "Model unavailable", "Error") if a == 'flaky' else (False, "ok", "Good answer"))
+    records = [
+        "not a record",
+        {'student_id': 's1', 'prompt_id': 'batch-shape', 'answer': 'fine'},
+        {'student_id': 's2', 'prompt_id': 'batch-shape', 'answer': 42},
+        {'student_id': 's3', 'prompt_id': 'batch-shape', 'answer': 'flaky'},
+    ]
+    response = authenticated_client.post('/api/evaluate-batch', json={'records': records})
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['inserted'] == 1
+    assert [e['index'] for e in report['errors']] == [0, 2, 3]
+    assert report['errors'][2]['error'] == "Model unavailable"
+    assert report['failed'] == [records[3]]
+
+    assert authenticated_client.post('/api/evaluate-batch', json=['not', 'an', 'object']).status_code == 400
+
+
+def test_batch_endpoint_commits_each_chunk(test_app, authenticated_client, db_session, monkeypatch):
+    """测试: 按块提交，后面的块出错时前面已评估的结果已经保存。"""
+    monkeypatch.setitem(test_app.config, 'BATCH_COMMIT_SIZE', 2)
+
+    def fake_evaluate(prompt_id, answer):
+        if answer == 'boom':
+            raise RuntimeError("worker died")
+        return False, "ok", "Good answer"
+    monkeypatch.setattr(services, "evaluate_answer", fake_evaluate)
+
+    records = [{'student_id': f's{i}', 'prompt_id': 'batch-chunks', 'answer': answer}
+               for i, answer in enumerate(['one', 'two', 'boom'])]
+    try:
+        authenticated_client.post('/api/evaluate-batch', json={'records': records})
+    except RuntimeError:
+        pass
+    assert Response.query.filter_by(question='batch-chunks').count() == 2
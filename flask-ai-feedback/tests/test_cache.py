@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+from app import services
+from app.cache import DatabaseBackend, make_cache_key, get_result_cache
+from app.models import Question, LLMResultCache
+
+
+def test_cache_key_normalizes_answer():
+    """测试: 只有空白和大小写不同的答案得到相同的键，模型不同则键不同。"""
+    key = make_cache_key("rubric", "The Y-axis  is misleading.\n", "gemini-pro-latest")
+    assert key == make_cache_key("rubric", "the y-axis is misleading.", "gemini-pro-latest")
+    assert key != make_cache_key("rubric", "the y-axis is misleading.", "another-model")
+    assert key != make_cache_key("new rubric", "the y-axis is misleading.", "gemini-pro-latest")
+
+
+def test_evaluate_answer_uses_cache_and_update_invalidates(authenticated_client, db_session, monkeypatch):
+    """测试: 相同答案第二次评估直接命中缓存；通过 update_question 修改题目后缓存失效。"""
+    db_session.add(Question(prompt_id="cache-prompt", title="Cache", question_text="Q", ai_prompt="Rubric"))
+    db_session.commit()
+
+    calls = []
+    def fake_evaluate(prompt_id, answer):
+        calls.append(answer)
+        return False, "Cached feedback", "Good answer"
+    monkeypatch.setattr(services, "_evaluate_uncached", fake_evaluate)
+
+    cache = get_result_cache()
+    hits_before = cache.hits
+    assert services.evaluate_answer("cache-prompt", "Same answer") == (False, "Cached feedback", "Good answer")
+    assert services.evaluate_answer("cache-prompt", "  same ANSWER ") == (False, "Cached feedback", "Good answer")
+    assert len(calls) == 1
+    assert cache.hits == hits_before + 1
+
+    key = make_cache_key("Rubric", "Same answer", services.MODEL_NAME)
+    assert cache.backend.get(key) is not None
+    response = authenticated_client.post('/api/update-question/cache-prompt', data={'title': 'Edited'})
+    assert response.status_code == 200
+    assert cache.backend.get(key) is None
+
+
+def test_failed_and_fallback_evaluations_are_not_cached(db_session, monkeypatch):
+    """测试: 模型未加载、调用失败或流式结果缺少评级时都不写入缓存，下次会重新评估。"""
+    db_session.add(Question(prompt_id="cache-failure", title="Cache", question_text="Q", ai_prompt="Rubric"))
+    db_session.commit()
+
+    monkeypatch.setattr(services, "model", None)
+    assert services.evaluate_answer("cache-failure", "answer one") == (False, "AI model failed to load.", "N/A")
+    assert services.get_cached_evaluation("cache-failure", "answer one") is None
+
+    services.store_evaluation("cache-failure", "answer two",
+                              services.Result((False, "Partial feedback", "N/A"), services.TRANSIENT))
+    assert services.get_cached_evaluation("cache-failure", "answer two") is None
+    services.store_evaluation("cache-failure", "answer two", services.Result((False, "Feedback", "Good answer")))
+    assert services.get_cached_evaluation("cache-failure", "answer two") == (False, "Feedback", "Good answer")
+
+
+def test_database_backend_ttl_and_invalidation(db_session):
+    """测试: 数据库后端能保存结果、忽略过期条目，并按题目删除。"""
+    backend = DatabaseBackend(ttl=60)
+    backend.set("k1", "db-prompt", {"is_ai": False, "feedback": "f", "grade": "g"})
+    assert backend.get("k1") == {"is_ai": False, "feedback": "f", "grade": "g"}
+
+    db_session.get(LLMResultCache, "k1").created_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+    db_session.commit()
+    assert backend.get("k1") is None
+
+    assert backend.invalidate_prompt("db-prompt") == 1
+    assert db_session.get(LLMResultCache, "k1") is None
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+from app import clients
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_create_app_does_not_import_sdks():
+    """测试: create_app 不导入 Gemini、Cloudinary 和 OAuth 的 SDK（在全新进程中检查）。"""
+    code = (
+        "import sys\n"
+        "from app import create_app\n"
+        "from conftest import TestConfig\n"
+        "create_app(TestConfig)\n"
+        "print('loaded:' + ','.join(m for m in ('google.generativeai', 'cloudinary', 'authlib.integrations.flask_client')"
+        " if m in sys.modules))\n"
+    )
+    proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                          env=dict(os.environ, SECRET_KEY='x', PYTHONPATH=os.path.join(ROOT, 'tests')))
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip().splitlines()[-1] == 'loaded:'
+
+
+def test_oauth_client_is_created_on_first_use(test_app):
+    """测试: OAuth 客户端在第一次使用时才注册，之后复用同一个实例。"""
+    test_app.extensions.pop('oauth_client', None)
+    with test_app.app_context():
+        oauth = clients.get_oauth()
+        assert oauth.google is not None
+        assert clients.get_oauth() is oauth
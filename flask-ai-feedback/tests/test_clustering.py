@@ -0,0 +1,78 @@
+from app import clustering, services
+from app.models import Response
+
+Y_AXIS = "I think the worst part is the y-axis, the intervals are not even and it's very misleading."
+Y_AXIS_PARAPHRASE = "I think the worst part is the y axis: the intervals are not even, and it is very misleading!"
+COLORS = "The colors are too bright and the green arrow doesn't seem to mean anything."
+
+
+def _add(db_session, prompt_id, answer, student_id='s'):
+    row = Response(question=prompt_id, student_id=student_id, student_answer=answer, ai_feedback='f')
+    db_session.add(row)
+    db_session.commit()
+    return row
+
+
+def test_signature_similarity_tracks_overlap():
+    """测试: 改写后的答案估计相似度高，不同的答案相似度低。"""
+    same = clustering.similarity(clustering.signature(Y_AXIS), clustering.signature(Y_AXIS_PARAPHRASE))
+    different = clustering.similarity(clustering.signature(Y_AXIS), clustering.signature(COLORS))
+    assert same >= 0.6
+    assert different < 0.2
+    assert len(clustering.signature(Y_AXIS).tobytes()) == 256
+
+
+def test_clusters_are_built_incrementally(authenticated_client, db_session):
+    """测试: 新答案增量加入已有聚类；仪表盘按大小列出聚类和代表答案，并能列出成员。"""
+    first = _add(db_session, 'cluster-a', Y_AXIS, 's1')
+    _add(db_session, 'cluster-a', COLORS, 's2')
+    assert clustering.update_clusters('cluster-a') == 2
+
+    _add(db_session, 'cluster-a', Y_AXIS_PARAPHRASE, 's3')
+    _add(db_session, 'cluster-a', Y_AXIS, 's4')
+    # 读取接口不写数据库: 新答案在后台任务处理之前保持未聚类
+    pending = authenticated_client.get('/api/answer-clusters?prompt_id=cluster-a').get_json()
+    assert (pending['cluster_count'], pending['unclustered']) == (2, 2)
+
+    clustering.schedule_update('cluster-a')
+    data = authenticated_client.get('/api/answer-clusters?prompt_id=cluster-a').get_json()
+    assert data['total_responses'] == 4
+    assert (data['cluster_count'], data['unclustered']) == (2, 0)
+    top = data['clusters'][0]
+    assert (top['size'], top['representative_id'], top['representative_answer']) == (3, first.id, Y_AXIS)
+    assert clustering.update_clusters('cluster-a') == 0
+
+    members = authenticated_client.get(f"/api/answer-clusters/{top['id']}").get_json()['members']
+    assert [m['student_id'] for m in members] == ['s1', 's3', 's4']
+    assert authenticated_client.get('/api/answer-clusters').status_code == 400
+
+
+def test_summary_sends_one_representative_per_cluster(authenticated_client, db_session, monkeypatch):
+    """测试: 摘要只发送每个聚类的一条代表答案，并注明相似答案的数量。"""
+    for i in range(5):
+        _add(db_session, 'cluster-summary', Y_AXIS if i % 2 else Y_AXIS_PARAPHRASE)
+    _add(db_session, 'cluster-summary', COLORS)
+    clustering.schedule_update('cluster-summary')
+
+    summarized = []
+    monkeypatch.setattr(services, "get_summary_from_ai", lambda text: summarized.append(text) or "Summary")
+    authenticated_client.get('/api/get-summary?prompt_id=cluster-summary')
+    answers = summarized[0].split("\n\n---\n\n")
+    assert answers == [f"[5 similar answers] {Y_AXIS_PARAPHRASE}", COLORS]
+
+
+def test_clearing_a_prompt_removes_its_clusters(authenticated_client, db_session):
+    _add(db_session, 'cluster-clear', Y_AXIS)
+    clustering.update_clusters('cluster-clear')
+    authenticated_client.post('/api/clear-problem-feedback', json={'prompt_id': 'cluster-clear'})
+    assert clustering.cluster_sizes('cluster-clear') == []
+    assert clustering.prompt_totals('cluster-clear') == (0, 0)
+
+
+def test_saved_evaluations_are_clustered_on_write(test_client, db_session, monkeypatch):
+    """测试: /api/evaluate 保存回答后由后台任务（测试中同步执行）分配聚类。"""
+    monkeypatch.setattr(services, "evaluate_answer", lambda prompt_id, answer: (False, "f", "Good answer"))
+    for answer in (Y_AXIS, Y_AXIS_PARAPHRASE):
+        test_client.post('/api/evaluate', json={'answer': answer, 'prompt_id': 'cluster-write'})
+    rows = Response.query.filter_by(question='cluster-write').all()
+    assert len({row.cluster_id for row in rows}) == 1 and rows[0].cluster_id is not None
@@ -0,0 +1,53 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from app.models import Response
+
+
+def _add_rows(db_session, prefix):
+    db_session.add(Response(question=f"{prefix}-a", student_answer="Answer, with comma", ai_feedback="f1",
+                            timestamp=datetime(2026, 5, 1)))
+    db_session.add(Response(question=f"{prefix}-a", student_answer="Later answer", ai_feedback="f2",
+                            timestamp=datetime(2026, 6, 1)))
+    db_session.add(Response(question=f"{prefix}-b", student_answer="Other prompt", ai_feedback="f3",
+                            timestamp=datetime(2026, 5, 1)))
+    db_session.commit()
+
+
+def test_export_csv_with_filters(authenticated_client, db_session):
+    """测试: CSV 导出按题目和日期筛选，并只包含请求的列。"""
+    _add_rows(db_session, "csv")
+    response = authenticated_client.get(
+        '/api/export-responses?format=csv&prompt_id=csv-a&end=2026-05-31&fields=id,student_answer')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [r['student_answer'] for r in rows] == ["Answer, with comma"]
+    assert set(rows[0]) == {'id', 'student_answer'}
+
+
+def test_export_ndjson_gzip(authenticated_client, db_session):
+    """测试: NDJSON 导出可以用 gzip 压缩，解压后每行是一条记录。"""
+    _add_rows(db_session, "ndjson")
+    response = authenticated_client.get('/api/export-responses?format=ndjson&gzip=1&prompt_id=ndjson-b')
+    assert response.status_code == 200
+    lines = gzip.decompress(response.get_data()).decode('utf-8').splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r['student_answer'] for r in records] == ["Other prompt"]
+
+    assert authenticated_client.get('/api/export-responses?format=xml').status_code == 400
+
+
+def test_export_cli(test_app, db_session, tmp_path):
+    """测试: flask export-responses 命令把数据写入文件。"""
+    _add_rows(db_session, "cli")
+    output = tmp_path / "responses.csv"
+    result = test_app.test_cli_runner().invoke(args=[
+        'export-responses', '--prompt-id', 'cli-a', '--output', str(output)
+    ])
+    assert result.exit_code == 0, result.output
+    rows = list(csv.DictReader(output.open()))
+    assert [r['student_answer'] for r in rows] == ["Answer, with comma", "Later answer"]
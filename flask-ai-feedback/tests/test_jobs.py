@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from app import services, jobs
+from app.models import Question, Response
+
+
+def test_async_evaluate_returns_job_and_status(test_client, db_session, monkeypatch):
+    """测试: 异步模式立即返回任务 id，状态端点在完成后返回反馈。"""
+    db_session.add(Question(prompt_id="async-prompt", title="Async", question_text="Q", ai_prompt="A"))
+    db_session.commit()
+
+    # 使用桩模型：同一个 JSON 同时满足检测和评分的解析
+    mock_response = MagicMock()
+    mock_response.text = '{"classification": "Human", "grade": "Good answer", "feedback": "Queued feedback"}'
+    monkeypatch.setattr(services.model, "generate_content", MagicMock(return_value=mock_response))
+
+    response = test_client.post('/api/evaluate', json={
+        'answer': 'student answer', 'prompt_id': 'async-prompt', 'async': True
+    })
+    assert response.status_code == 202
+    body = response.get_json()
+    job_id = body['job_id']
+
+    status = test_client.get(f'/api/evaluation-status/{job_id}').get_json()
+    assert status['status'] == jobs.DONE
+    assert status['feedback'] == "Queued feedback"
+    assert db_session.get(Response, body['response_id']).performance_grade == "Good answer"
+
+    # 自增的行 id 不能用来查询任务状态
+    assert test_client.get(f"/api/evaluation-status/{body['response_id']}").status_code == 404
+
+
+def test_job_retries_failed_model_calls(test_client, db_session, monkeypatch):
+    """测试: 模型调用失败时任务会重试，直到成功或达到最大次数。"""
+    outcomes = [(False, "err", "Error"), (False, "err", "Error"), (False, "Finally", "Great answer")]
+    monkeypatch.setattr(services, "evaluate_answer", lambda p, a: outcomes.pop(0))
+
+    job = jobs.enqueue_evaluation("s1", "retry-prompt", "answer")
+    assert job.status == jobs.DONE
+    assert job.attempts == 3
+    assert job.ai_feedback == "Finally"
+
+    monkeypatch.setattr(services, "evaluate_answer", lambda p, a: (False, "still failing", "Error"))
+    failed = jobs.enqueue_evaluation("s2", "retry-prompt", "answer")
+    assert failed.status == jobs.FAILED
+    assert failed.attempts == 3
+
+
+def test_recover_unfinished_jobs(test_app, db_session, monkeypatch):
+    """测试: 崩溃遗留的任务（pending 或租约过期）会被重新执行，仍在租约内的不会。"""
+    monkeypatch.setattr(services, "evaluate_answer", lambda p, a: (False, "Recovered", "Good answer"))
+    now = datetime.now(timezone.utc)
+    stale = Response(question="q", student_answer="a", ai_feedback="", status=jobs.PROCESSING,
+                     locked_at=now - timedelta(hours=1))
+    fresh = Response(question="q", student_answer="a", ai_feedback="", status=jobs.PROCESSING,
+                     locked_at=now)
+    pending = Response(question="q", student_answer="a", ai_feedback="", status=jobs.PENDING)
+    db_session.add_all([stale, fresh, pending])
+    db_session.commit()
+
+    assert jobs.recover_unfinished_jobs() == 2
+    assert db_session.get(Response, stale.id).ai_feedback == "Recovered"
+    assert db_session.get(Response, pending.id).status == jobs.DONE
+    assert db_session.get(Response, fresh.id).status == jobs.PROCESSING
+
+
+
+def test_periodic_sweep_skips_recently_queued_jobs(test_app, db_session, monkeypatch):
+    """测试: 巡检时只接手长时间没有更新的 pending 任务，刚入队或等待重试的不抢。"""
+    monkeypatch.setattr(services, "evaluate_answer", lambda p, a: (False, "Swept", "Good answer"))
+    now = datetime.now(timezone.utc)
+    abandoned = Response(question="q", student_answer="a", ai_feedback="", status=jobs.PENDING,
+                         updated_at=now - timedelta(hours=1))
+    queued = Response(question="q", student_answer="a", ai_feedback="", status=jobs.PENDING)
+    db_session.add_all([abandoned, queued])
+    db_session.commit()
+
+    jobs.recover_unfinished_jobs(pending_grace=300)
+    assert db_session.get(Response, abandoned.id).ai_feedback == "Swept"
+    assert db_session.get(Response, queued.id).status == jobs.PENDING
+
+    jobs.recover_unfinished_jobs()
+    assert db_session.get(Response, queued.id).status == jobs.DONE
+
+def test_permanent_errors_are_not_retried(test_app, db_session, monkeypatch):
+    """测试: 题目不存在这类永久错误只尝试一次就标记为失败。"""
+    monkeypatch.setitem(test_app.config, 'EVALUATION_STRATEGY', 'sequential')
+    monkeypatch.setattr(services, "detect_ai_generated", lambda p, a: False)
+    job = jobs.enqueue_evaluation("s1", "no-such-prompt", "answer")
+    assert (job.status, job.attempts) == (jobs.FAILED, 1)
+
+
+def test_transient_failure_requeues_instead_of_sleeping(test_app, db_session, monkeypatch):
+    """测试: 非立即执行模式下，暂时性失败把任务放回 pending 并交给计时器，不在线程池中等待。"""
+    monkeypatch.setitem(test_app.config, 'JOBS_EAGER', False)
+    monkeypatch.setattr(services, "evaluate_answer", lambda p, a: (False, "err", "Error"))
+    scheduled = []
+    monkeypatch.setattr(jobs, "_retry_later", lambda app, job_id, delay: scheduled.append(job_id))
+    job = Response(question="requeue-prompt", student_answer="a", ai_feedback="", status=jobs.PENDING)
+    db_session.add(job)
+    db_session.commit()
+
+    jobs.process_job(job.id)
+    job = db_session.get(Response, job.id)
+    assert (job.status, job.attempts, job.locked_at) == (jobs.PENDING, 1, None)
+    assert scheduled == [job.id]
+
+
+def test_pending_rows_are_hidden_from_dashboard_queries(authenticated_client, db_session):
+    """测试: 还在评估中的回答默认不出现在列表和统计中，?status=pending 可以查到。"""
+    db_session.add(Response(question="pending-prompt", student_answer="a", ai_feedback="", status=jobs.PENDING))
+    db_session.commit()
+
+    assert authenticated_client.get('/api/get-all-feedback?prompt_id=pending-prompt').get_json() == []
+    assert authenticated_client.get('/api/feedback-stats?prompt_id=pending-prompt').get_json()['total'] == 0
+    pending = authenticated_client.get('/api/get-all-feedback?prompt_id=pending-prompt&status=pending').get_json()
+    assert [row['student_answer'] for row in pending] == ["a"]
@@ -0,0 +1,191 @@
+import time
+import pytest
+from app import llm_client
+from app.llm_client import ResilientModel, LLMUnavailableError
+
+
+class StubModel:
+    def __init__(self, name, behaviour):
+        self.name = name
+        self.behaviour = behaviour
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return self.behaviour(self.calls)
+
+
+def make_client(behaviours):
+    stubs = {name: StubModel(name, b) for name, b in behaviours.items()}
+    return ResilientModel(list(behaviours), factory=lambda name: stubs[name], max_workers=4), stubs
+
+
+@pytest.fixture
+def fast_settings(test_app, monkeypatch):
+    for name, value in {'LLM_REQUEST_TIMEOUT': 1.0, 'LLM_MAX_RETRIES': 1, 'LLM_RETRY_BASE_DELAY': 0,
+                        'LLM_BREAKER_FAILURE_THRESHOLD': 2, 'LLM_BREAKER_RESET_SECONDS': 60,
+                        'LLM_HEDGE_AFTER': 0}.items():
+        monkeypatch.setitem(test_app.config, name, value)
+    return test_app.config
+
+
+def fail(_):
+    raise RuntimeError("503 Service Unavailable")
+
+
+def test_retry_then_fallback_and_breaker_opens(fast_settings):
+    """测试: 主模型重试仍失败后使用备用模型；熔断后不再调用主模型。"""
+    client, stubs = make_client({'primary': fail, 'backup': lambda n: f"backup-{n}"})
+
+    assert client.generate_content("prompt") == "backup-1"
+    assert stubs['primary'].calls == 2  # 一次请求 + 一次重试
+    assert client.breakers['primary'].state == llm_client.OPEN
+
+    assert client.generate_content("prompt") == "backup-2"
+    assert stubs['primary'].calls == 2
+    stats = client.stats()
+    assert stats['fallbacks'] == 2 and stats['rejected'] == 1
+    assert stats['models'][1]['latency']['count'] == 2
+
+
+def test_timeout_and_unavailable(fast_settings, monkeypatch):
+    """测试: 超过单次请求超时的调用被放弃；所有模型都失败时抛出 LLMUnavailableError。"""
+    monkeypatch.setitem(fast_settings, 'LLM_REQUEST_TIMEOUT', 0.05)
+    monkeypatch.setitem(fast_settings, 'LLM_MAX_RETRIES', 0)
+    client, _ = make_client({'slow': lambda n: time.sleep(0.3) or "late"})
+
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        client.generate_content("prompt")
+    assert time.monotonic() - started < 0.25
+
+
+def test_hedged_request_returns_faster_copy(fast_settings, monkeypatch):
+    """测试: 第一个请求很慢时，对冲请求先返回。"""
+    monkeypatch.setitem(fast_settings, 'LLM_HEDGE_AFTER', 0.05)
+    client, stubs = make_client({'primary': lambda n: time.sleep(0.5) or "slow" if n == 1 else "fast"})
+
+    started = time.monotonic()
+    assert client.generate_content("prompt") == "fast"
+    assert time.monotonic() - started < 0.4
+    assert client.stats()['hedged'] == 1
+
+
+def test_breaker_half_open_probe(fast_settings, monkeypatch):
+    """测试: 冷却时间结束后放行一次试探请求，成功后熔断器关闭。"""
+    monkeypatch.setitem(fast_settings, 'LLM_BREAKER_RESET_SECONDS', 0)
+    client, _ = make_client({'primary': lambda n: fail(n) if n <= 2 else "recovered"})
+
+    with pytest.raises(LLMUnavailableError):
+        client.generate_content("prompt")
+    assert client.breakers['primary'].state == llm_client.OPEN
+    assert client.generate_content("prompt") == "recovered"
+    assert client.breakers['primary'].state == llm_client.CLOSED
+
+
+def test_deadline_caps_attempts_and_stops_retries(fast_settings, monkeypatch):
+    """测试: 整体截止时间限制单次请求的超时，时间用完后不再重试。"""
+    monkeypatch.setitem(fast_settings, 'LLM_MAX_RETRIES', 5)
+    client, stubs = make_client({'slow': lambda n: time.sleep(0.3) or "late"})
+
+    started = time.monotonic()
+    with llm_client.llm_deadline(0.1):
+        with pytest.raises(LLMUnavailableError):
+            client.generate_content("prompt")
+    assert time.monotonic() - started < 0.25
+    assert stubs['slow'].calls == 1
+
+
+def test_single_attempt_disables_client_retries(fast_settings):
+    """测试: llm_single_attempt 中失败的调用不在客户端重试，备用模型仍会尝试。"""
+    client, stubs = make_client({'primary': fail, 'backup': fail})
+
+    with llm_client.llm_single_attempt():
+        with pytest.raises(LLMUnavailableError):
+            client.generate_content("prompt")
+    assert stubs['primary'].calls == 1 and stubs['backup'].calls == 1
+
+
+def _half_open_ready(breaker):
+    """让熔断器处于冷却已结束的状态: 下一次 allow() 会放行试探请求"""
+    breaker.state = llm_client.OPEN
+    breaker.opened_at = time.monotonic() - 3600
+
+
+def test_probe_is_released_when_no_request_is_sent(fast_settings, monkeypatch):
+    """测试: 放行试探请求后因截止时间、退避或限流而没有发出请求时，模型之后仍能被使用。"""
+    client, stubs = make_client({'primary': lambda n: fail(n) if n == 1 else f"ok-{n}"})
+    breaker = client.breakers['primary']
+
+    # 截止时间在放行后已经用完
+    _half_open_ready(breaker)
+    with llm_client.llm_deadline(0.001):
+        time.sleep(0.01)
+        with pytest.raises(LLMUnavailableError):
+            client.generate_content("prompt")
+    assert stubs['primary'].calls == 0
+
+    # 第一次失败后，退避时间超过剩余时间
+    monkeypatch.setitem(fast_settings, 'LLM_BREAKER_RESET_SECONDS', 0)
+    monkeypatch.setitem(fast_settings, 'LLM_RETRY_BASE_DELAY', 10)
+    with llm_client.llm_deadline(5):
+        with pytest.raises(LLMUnavailableError):
+            client.generate_content("prompt")
+    assert stubs['primary'].calls == 1
+    assert client.generate_content("prompt") == "ok-2"
+    assert breaker.state == llm_client.CLOSED
+
+    # 限流器拒绝（普通调用和流式调用）
+    class RejectingLimiter:
+        wait_budgets = {}
+
+        def acquire(self, priority, tokens, wait_budget=None):
+            raise llm_client.RateLimitExceeded("no capacity")
+    monkeypatch.setitem(fast_settings, 'LLM_BREAKER_RESET_SECONDS', 60)
+    for stream in (False, True):
+        _half_open_ready(breaker)
+        monkeypatch.setattr(llm_client, 'get_rate_limiter', lambda: RejectingLimiter())
+        with pytest.raises(LLMUnavailableError):
+            client.generate_content("prompt", stream=stream)
+        monkeypatch.setattr(llm_client, 'get_rate_limiter', lambda: None)
+        expected = f"ok-{stubs['primary'].calls + 1}"
+        assert client.generate_content("prompt") == expected
+
+
+def test_abandoned_stream_releases_probe(fast_settings):
+    """测试: 调用方中途放弃流式结果时，熔断器不会一直停在试探状态。"""
+    client, stubs = make_client({'primary': lambda n: iter(["chunk-1", "chunk-2"])})
+    _half_open_ready(client.breakers['primary'])
+
+    chunks = client.generate_content("prompt", stream=True)
+    next(chunks)
+    chunks.close()
+    assert client.breakers['primary'].state == llm_client.OPEN
+    assert list(client.generate_content("prompt", stream=True)) == ["chunk-1", "chunk-2"]
+    assert stubs['primary'].calls == 2
+    assert client.breakers['primary'].state == llm_client.CLOSED
+
+
+def test_stalled_stream_times_out_and_counts_as_failure(fast_settings, monkeypatch):
+    """测试: 两个分块之间等待超过空闲超时或整体截止时间时抛出 TimeoutError，并记为模型失败。"""
+    monkeypatch.setitem(fast_settings, 'LLM_STREAM_IDLE_TIMEOUT', 0.05)
+
+    def stalled(_):
+        yield "chunk-1"
+        time.sleep(0.5)
+        yield "chunk-2"
+
+    client, _ = make_client({'primary': stalled})
+    chunks = client.generate_content("prompt", stream=True)
+    assert next(chunks) == "chunk-1"
+    with pytest.raises(TimeoutError):
+        next(chunks)
+    assert client.breakers['primary'].failures == 1
+
+    monkeypatch.setitem(fast_settings, 'LLM_STREAM_IDLE_TIMEOUT', 0)
+    with llm_client.llm_deadline(0.05):
+        chunks = client.generate_content("prompt", stream=True)
+    assert next(chunks) == "chunk-1"
+    with pytest.raises(TimeoutError):
+        next(chunks)
+    assert client.breakers['primary'].failures == 2
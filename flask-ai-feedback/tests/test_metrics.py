@@ -0,0 +1,80 @@
+import json
+from types import SimpleNamespace
+import pytest
+from app import create_app, db, metrics
+from app.llm_client import ResilientModel
+from conftest import TestConfig
+
+
+class MetricsConfig(TestConfig):
+    METRICS_ENABLED = True
+    METRICS_JSON_LOGS = True
+    METRICS_TOKEN = 'scrape-token'
+
+
+@pytest.fixture
+def metrics_app():
+    app = create_app(MetricsConfig)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+    metrics._registry = None
+
+
+def test_requests_and_queries_are_exported(metrics_app, capsys):
+    """测试: 请求和数据库查询的耗时出现在 /metrics 中，并输出一行 JSON 日志。"""
+    client = metrics_app.test_client()
+    assert client.get('/api/question-details/missing-prompt').status_code == 404
+
+    log = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert log['endpoint'] == 'api.get_question_details'
+    assert log['status'] == 404
+    assert log['db_queries'] >= 1
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    body = client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'}).get_data(as_text=True)
+    assert 'http_requests_total{endpoint="api.get_question_details",method="GET",status="404"} 1' in body
+    assert 'db_query_duration_seconds_count{endpoint="api.get_question_details"}' in body
+
+
+def test_llm_calls_are_labelled(metrics_app):
+    """测试: 模型调用按模型和 prompt_id 统计耗时和 token 数。"""
+    response = SimpleNamespace(text='{"grade": "Good answer"}',
+                               usage_metadata=SimpleNamespace(prompt_token_count=120, candidates_token_count=30))
+    stub = SimpleNamespace(generate_content=lambda prompt, **kwargs: response)
+    client = ResilientModel(['stub-model'], factory=lambda name: stub, max_workers=2)
+
+    with metrics_app.app_context(), metrics.llm_labels('metrics-prompt'):
+        client.generate_content("grade this")
+
+    body = metrics._registry.render()
+    labels = 'endpoint="none",kind="prompt",model="stub-model",prompt_id="metrics-prompt"'
+    assert f'llm_tokens_total{{{labels}}} 120' in body
+    assert 'llm_request_duration_seconds_count{endpoint="none",model="stub-model",outcome="ok",' \
+           'prompt_id="metrics-prompt"} 1' in body
+
+
+def test_disabled_metrics_register_nothing(test_app, test_client):
+    """测试: 未启用时没有 /metrics 路由，span() 不做任何事。"""
+    assert test_client.get('/metrics').status_code == 404
+    assert not metrics.enabled()
+    with metrics.span('noop'):
+        pass
+
+
+def test_unknown_prompt_ids_share_one_label(metrics_app, monkeypatch):
+    """测试: 匿名请求中不存在的 prompt_id 不会产生新的标签值。"""
+    from app import services
+    monkeypatch.setattr(services, "is_answer_ai_generated", lambda answer: services.model.generate_content(answer))
+    stub = SimpleNamespace(generate_content=lambda prompt, **kwargs: SimpleNamespace(text='{}'))
+    monkeypatch.setattr(services, "model", ResilientModel(['stub-model'], factory=lambda name: stub, max_workers=2))
+
+    with metrics_app.app_context():
+        services.detect_ai_generated("made-up-prompt-123", "some answer")
+
+    body = metrics._registry.render()
+    assert 'prompt_id="unknown"' in body
+    assert 'made-up-prompt-123' not in body
@@ -0,0 +1,72 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from app import purge
+from app.models import Response, PurgeJob
+
+
+def _add_rows(db_session, prompt_id, count):
+    rows = [Response(question=prompt_id, student_answer=f"answer {i}", ai_feedback="f") for i in range(count)]
+    db_session.add_all(rows)
+    db_session.commit()
+    return rows
+
+
+def test_clear_deletes_in_batches_and_archives(test_app, authenticated_client, db_session, monkeypatch, tmp_path):
+    """测试: 按批删除并在删除前归档；其它题目的回答不受影响，进度可以查询。"""
+    monkeypatch.setitem(test_app.config, 'PURGE_BATCH_SIZE', 2)
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_DIR', str(tmp_path))
+    _add_rows(db_session, 'purge-a', 5)
+    _add_rows(db_session, 'purge-keep', 1)
+
+    response = authenticated_client.post('/api/clear-problem-feedback', json={'prompt_id': 'purge-a', 'archive': True})
+    assert response.status_code == 200
+    job = response.get_json()['purge']
+    assert (job['status'], job['total'], job['deleted'], job['progress']) == ('done', 5, 5, 1.0)
+    assert Response.query.filter_by(question='purge-a').count() == 0
+    assert Response.query.filter_by(question='purge-keep').count() == 1
+
+    with gzip.open(job['archive_path'], 'rt', encoding='utf-8') as f:
+        archived = [json.loads(line) for line in f]
+    assert [r['student_answer'] for r in archived] == [f"answer {i}" for i in range(5)]
+    assert authenticated_client.get(f"/api/purge-jobs/{job['id']}").get_json()['status'] == 'done'
+
+
+def test_interrupted_purge_resumes_from_last_id(test_app, db_session):
+    """测试: 中断的任务（租约过期）从 last_id 继续；创建任务之后提交的回答会被保留。"""
+    rows = _add_rows(db_session, 'purge-resume', 4)
+    db_session.delete(rows[0])
+    job = PurgeJob(prompt_id='purge-resume', cutoff_id=rows[-1].id, last_id=rows[0].id, total=4, deleted=1,
+                   status=purge.RUNNING, locked_at=datetime.now() - timedelta(hours=1))
+    db_session.add(job)
+    db_session.commit()
+    late = _add_rows(db_session, 'purge-resume', 1)[0]
+
+    assert purge.recover_unfinished_purges() == 1
+    job = db_session.get(PurgeJob, job.id)
+    assert (job.status, job.deleted) == ('done', 4)
+    assert [r.id for r in Response.query.filter_by(question='purge-resume')] == [late.id]
+
+
+def test_background_purge_returns_202(authenticated_client, db_session, monkeypatch):
+    """测试: 不是立即执行时，端点马上返回 202 和任务地址。"""
+    _add_rows(db_session, 'purge-async', 2)
+    monkeypatch.setattr(purge, 'submit', lambda job_id: None)
+
+    response = authenticated_client.post('/api/clear-problem-feedback', json={'prompt_id': 'purge-async'})
+    assert response.status_code == 202
+    data = response.get_json()
+    assert data['purge']['status'] == 'pending'
+    assert authenticated_client.get(data['status_url']).get_json()['progress'] == 0.0
+    assert Response.query.filter_by(question='purge-async').count() == 2
+
+
+def test_archive_path_ignores_prompt_id(test_app, authenticated_client, db_session, monkeypatch, tmp_path):
+    """测试: 归档文件名只包含任务 id，带路径分隔符的 prompt_id 不会把文件写到归档目录之外。"""
+    monkeypatch.setitem(test_app.config, 'ARCHIVE_DIR', str(tmp_path / "archives"))
+    response = authenticated_client.post('/api/clear-problem-feedback',
+                                         json={'prompt_id': '../../escape', 'archive': True})
+    job = response.get_json()['purge']
+    assert os.path.dirname(job['archive_path']) == str(tmp_path / "archives")
+    assert os.path.basename(job['archive_path']) == f"purge-{job['id']}.jsonl.gz"
@@ -0,0 +1,64 @@
+from sqlalchemy import event
+from app import db
+from app.models import Question
+from app.question_cache import QuestionCache, bump_questions_version
+
+
+def _count_queries(engine):
+    statements = []
+    def before_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    return statements, lambda: event.remove(engine, 'before_cursor_execute', before_execute)
+
+
+def test_question_details_makes_no_queries_when_warm(test_client, db_session):
+    """测试: 缓存预热后，question-details 端点不再访问数据库。"""
+    db_session.add(Question(prompt_id="warm-prompt", title="Warm", question_text="Q", ai_prompt="A"))
+    db_session.commit()
+    assert test_client.get('/api/question-details/warm-prompt').status_code == 200
+
+    statements, stop = _count_queries(db.engine)
+    try:
+        for _ in range(3):
+            response = test_client.get('/api/question-details/warm-prompt')
+            assert response.get_json()['title'] == "Warm"
+    finally:
+        stop()
+    assert statements == []
+
+
+def test_other_worker_sees_update_via_version(authenticated_client, db_session):
+    """测试: 通过 update_question 修改题目后，其他 worker 的缓存根据版本号重新加载。"""
+    db_session.add(Question(prompt_id="versioned", title="Old title", question_text="Q", ai_prompt="A"))
+    db_session.commit()
+
+    other_worker = QuestionCache(check_interval=0)
+    assert other_worker.get("versioned").title == "Old title"
+
+    response = authenticated_client.post('/api/update-question/versioned', data={'title': 'New title'})
+    assert response.status_code == 200
+    assert other_worker.get("versioned").title == "New title"
+
+    response = authenticated_client.delete('/api/delete-question/versioned')
+    assert response.status_code == 200
+    assert other_worker.get("versioned") is None
+
+
+def test_unknown_prompt_ids_are_cached_until_version_changes(test_app, db_session):
+    """测试: 不存在的 prompt_id 只查询一次数据库；题目版本变化后重新查询。"""
+    cache = QuestionCache(check_interval=60)
+    assert cache.get("not-yet-created") is None
+
+    statements, stop = _count_queries(db.engine)
+    try:
+        assert cache.get("not-yet-created") is None
+    finally:
+        stop()
+    assert statements == []
+
+    db_session.add(Question(prompt_id="not-yet-created", title="Now exists", question_text="Q", ai_prompt="A"))
+    bump_questions_version()
+    db_session.commit()
+    cache.check_interval = 0
+    assert cache.get("not-yet-created").title == "Now exists"
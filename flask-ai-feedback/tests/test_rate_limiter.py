@@ -0,0 +1,35 @@
+import time
+import pytest
+from app.rate_limiter import RateLimiter, RateLimitExceeded, GRADING, DETECTION, SUMMARY
+
+
+def make_limiter(path, rpm=10, tpm=100000):
+    return RateLimiter(str(path), rpm, tpm,
+                       reserves={GRADING: 0.0, DETECTION: 0.1, SUMMARY: 0.3},
+                       wait_budgets={GRADING: 0, DETECTION: 0, SUMMARY: 0})
+
+
+def test_summary_cannot_use_capacity_reserved_for_grading(tmp_path):
+    """测试: 摘要请求只能用掉 70% 的容量，剩下的仍可用于学生评分。"""
+    limiter = make_limiter(tmp_path / "rate.sqlite")
+    for _ in range(7):
+        limiter.acquire(SUMMARY, 10)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(SUMMARY, 10)
+    for _ in range(3):
+        limiter.acquire(GRADING, 10)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(GRADING, 10)
+
+
+def test_state_is_shared_and_requests_queue_within_budget(tmp_path):
+    """测试: 两个限流器（模拟两个 worker）共享同一个文件；配额不足时在等待预算内排队。"""
+    path = tmp_path / "rate.sqlite"
+    worker_a, worker_b = make_limiter(path, tpm=600), make_limiter(path, tpm=600)
+
+    worker_a.acquire(GRADING, 600)  # 用完 token 桶，每秒补充 10 个
+    assert not worker_b.try_acquire(GRADING, 5)
+
+    started = time.monotonic()
+    worker_b.acquire(GRADING, 5, wait_budget=2)
+    assert 0.3 < time.monotonic() - started < 1.5
@@ -0,0 +1,64 @@
+from app import db, search
+from app.models import Response
+
+
+def _add(db_session, prompt_id, answer, feedback="Keep going."):
+    row = Response(question=prompt_id, student_id='searcher', student_answer=answer, ai_feedback=feedback)
+    db_session.add(row)
+    db_session.commit()
+    return row
+
+
+def test_search_ranks_and_highlights(authenticated_client, db_session):
+    """测试: 搜索按相关性排序，支持题目筛选，片段中的命中词被 <mark> 标出且其余内容已转义。"""
+    _add(db_session, 'search-a', "The <b>y-axis</b> starts at 50M, so the y-axis exaggerates the growth.")
+    _add(db_session, 'search-a', "The colours are too bright.", feedback="Look again at the y-axis.")
+    _add(db_session, 'search-b', "The y-axis is misleading here too.")
+
+    response = authenticated_client.get('/api/search-responses?q=y-axis&prompt_id=search-a')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['backend'] == 'fts5'
+    items = data['items']
+    assert [item['question'] for item in items] == ['search-a', 'search-a']
+    # 回答中出现两次的排在只在反馈中出现的前面
+    assert items[0]['score'] > items[1]['score']
+    assert '&lt;b&gt;<mark>y-axis</mark>&lt;/b&gt;' in items[0]['answer_snippet']
+    assert '<mark>y-axis</mark>' in items[1]['feedback_snippet']
+
+
+def test_search_index_follows_updates_and_deletes(authenticated_client, db_session):
+    """测试: 修改和删除回答后索引随之更新；词干匹配（placebos -> placebo）。"""
+    row = _add(db_session, 'search-sync', "The trial had no placebos at all.", feedback="")
+    assert len(search.search_responses('placebo', 'search-sync')['items']) == 1
+
+    row.ai_feedback = "Consider the control group."
+    db_session.commit()
+    hits = search.search_responses('control', 'search-sync')['items']
+    assert [hit['id'] for hit in hits] == [row.id]
+
+    db_session.delete(row)
+    db_session.commit()
+    assert search.search_responses('placebo', 'search-sync')['items'] == []
+
+
+def test_search_requires_query(authenticated_client):
+    """测试: 没有 q 参数时返回 400；特殊字符不会导致 FTS 语法错误。"""
+    assert authenticated_client.get('/api/search-responses').status_code == 400
+    response = authenticated_client.get('/api/search-responses', query_string={'q': '"AND (* -'})
+    assert response.status_code == 200
+    assert response.get_json()['items'] == []
+
+
+def test_fts5_query_quotes_terms():
+    assert search.fts5_query('y-axis plac*') == '"y-axis" "plac"*'
+    assert search.fts5_query('NOT OR') == '"NOT" "OR"'
+    assert search.fts5_query('(( --') is None
+
+
+def test_search_ranks_only_newest_candidates(test_app, db_session, monkeypatch):
+    """测试: 命中超过 SEARCH_MAX_CANDIDATES 条时只在最新的命中中排序。"""
+    rows = [_add(db_session, 'search-cap', f"Histogram bins number {i}.") for i in range(3)]
+    monkeypatch.setitem(test_app.config, 'SEARCH_MAX_CANDIDATES', 2)
+    hits = search.search_responses('histogram', 'search-cap')['items']
+    assert sorted(hit['id'] for hit in hits) == [rows[1].id, rows[2].id]
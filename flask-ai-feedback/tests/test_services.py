@@ -1,4 +1,5 @@
 import json
+import time
 from unittest.mock import MagicMock
 import pytest
 from app import services
@@ -68,4 +69,98 @@ def test_get_feedback_and_grade(monkeypatch, db_session):
     feedback, grade = services.get_feedback_and_grade("test-prompt-1", "The answer is 4.")
 
     assert feedback == expected_feedback
-    assert grade == expected_grade
\ No newline at end of file
+    assert grade == expected_grade
+
+def test_evaluate_answer_runs_calls_concurrently(monkeypatch, test_app):
+    """
+    测试: 并发模式下，AI 检测和评分同时执行，总耗时约等于较慢的那个调用。
+    """
+    def slow_detection(answer):
+        time.sleep(0.3)
+        return True
+
+    def slow_grading(prompt_id, answer):
+        time.sleep(0.3)
+        return "Concurrent feedback", "Good answer"
+
+    monkeypatch.setattr(services, "is_answer_ai_generated", slow_detection)
+    monkeypatch.setattr(services, "get_feedback_and_grade", slow_grading)
+    monkeypatch.setitem(test_app.config, "EVALUATION_STRATEGY", "concurrent")
+
+    start = time.monotonic()
+    result = services.evaluate_answer("any-prompt", "some answer")
+    elapsed = time.monotonic() - start
+
+    assert result == (True, "Concurrent feedback", "Good answer")
+    assert elapsed < 0.55
+
+
+def test_evaluate_answer_timeout_and_sequential_mode(monkeypatch, test_app):
+    """
+    测试: 超时的调用返回安全的默认值；sequential 模式仍按原来的顺序调用。
+    """
+    calls = []
+
+    def hanging_grading(prompt_id, answer):
+        calls.append("grade")
+        time.sleep(0.5)
+        return "late", "Good answer"
+
+    def detection(answer):
+        calls.append("detect")
+        return False
+
+    monkeypatch.setattr(services, "is_answer_ai_generated", detection)
+    monkeypatch.setattr(services, "get_feedback_and_grade", hanging_grading)
+    monkeypatch.setitem(test_app.config, "EVALUATION_STRATEGY", "concurrent")
+    monkeypatch.setitem(test_app.config, "LLM_CALL_TIMEOUT", 0.1)
+
+    is_ai, feedback, grade = services.evaluate_answer("any-prompt", "answer")
+    assert is_ai is False
+    assert grade == "Error"
+
+    calls.clear()
+    monkeypatch.setitem(test_app.config, "EVALUATION_STRATEGY", "sequential")
+    monkeypatch.setitem(test_app.config, "LLM_CALL_TIMEOUT", 30)
+    assert services.evaluate_answer("any-prompt", "answer") == (False, "late", "Good answer")
+    assert calls == ["detect", "grade"]
+
+
+def test_evaluate_answer_combined_mode(monkeypatch, test_app, db_session):
+    """
+    测试: combined 模式只调用一次模型；返回的 JSON 缺少字段时退回到两次调用。
+    """
+    db_session.add(Question(prompt_id="combined-prompt", title="Combined", question_text="Q?",
+                            ai_prompt="Please evaluate the answer."))
+    db_session.commit()
+    monkeypatch.setitem(test_app.config, "EVALUATION_STRATEGY", "combined")
+
+    mock_response = MagicMock()
+    mock_response.text = '{"classification": "Human", "grade": "Great answer", "feedback": "Well done!"}'
+    mock_generate_content = MagicMock(return_value=mock_response)
+    monkeypatch.setattr(services.model, "generate_content", mock_generate_content)
+
+    result = services.evaluate_answer("combined-prompt", "The y-axis is misleading.")
+    assert result == (False, "Well done!", "Great answer")
+    assert mock_generate_content.call_count == 1
+
+    # 缺少 classification，退回到分开的检测和评分
+    mock_response.text = '{"grade": "Good answer", "feedback": "Nice."}'
+    monkeypatch.setattr(services, "is_answer_ai_generated", lambda answer: True)
+    monkeypatch.setattr(services, "get_feedback_and_grade",
+                        lambda prompt_id, answer: ("Fallback feedback", "Good answer"))
+
+    result = services.evaluate_answer("combined-prompt", "The colors are too bright.")
+    assert result == (True, "Fallback feedback", "Good answer")
+
+
+def test_init_app_configures_model_from_app_config(monkeypatch, test_app):
+    """测试: 备用模型列表在 init_app 时从应用配置读取，而不是在导入模块时读取。"""
+    monkeypatch.setitem(test_app.config, 'LLM_FALLBACK_MODELS', 'backup-a, backup-b')
+    services.init_app(test_app)
+    try:
+        assert services.model.model_names == [services.MODEL_NAME, 'backup-a', 'backup-b']
+    finally:
+        monkeypatch.setitem(test_app.config, 'LLM_FALLBACK_MODELS', '')
+        services.init_app(test_app)
+    assert services.model.model_names == [services.MODEL_NAME]
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import Counter
+from unittest.mock import MagicMock
+from app import services, summarizer
+from app.models import Response, PromptSummary
+
+
+def test_chunk_answers_respects_token_budget():
+    """测试: 每一块都不超过 token 预算，并且所有答案都按顺序保留。"""
+    answers = [f"answer {i} " + "x" * 200 for i in range(30)]
+    chunks = summarizer.chunk_answers(answers, token_budget=300)
+
+    assert len(chunks) > 1
+    assert all(summarizer.estimate_tokens(c) <= 300 for c in chunks)
+    rejoined = summarizer.ANSWER_SEPARATOR.join(chunks).split(summarizer.ANSWER_SEPARATOR)
+    assert rejoined == answers
+
+
+def test_map_reduce_with_stubbed_model(test_app, monkeypatch):
+    """测试: 超出预算时各块并行总结（不超过并发上限），再合并为最终报告。"""
+    monkeypatch.setitem(test_app.config, "SUMMARY_CHUNK_TOKENS", 200)
+    monkeypatch.setitem(test_app.config, "SUMMARY_MAX_CONCURRENCY", 2)
+
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def fake_generate(prompt):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        response = MagicMock()
+        response.text = "FINAL REPORT" if "partial summaries" in prompt else "- partial notes"
+        return response
+
+    monkeypatch.setattr(services.model, "generate_content", fake_generate)
+
+    answers = [f"Student answer number {i} about the misleading y-axis." for i in range(60)]
+    assert summarizer.summarize_answers(answers) == "FINAL REPORT"
+    assert peak[0] <= 2
+
+
+def test_single_chunk_uses_one_call(test_app, monkeypatch):
+    """测试: 答案较少时与原来一样只调用一次 get_summary_from_ai。"""
+    calls = []
+    monkeypatch.setattr(services, "get_summary_from_ai", lambda text: calls.append(text) or "Summary")
+    assert summarizer.summarize_answers(["a", "b"]) == "Summary"
+    assert calls == ["a" + summarizer.ANSWER_SEPARATOR + "b"]
+
+
+def test_stratified_sample_keeps_every_grade():
+    """测试: 分层抽样按比例分配名额，少见的评级也至少保留一条。"""
+    rows = [(f"great {i}", "Great answer") for i in range(90)] + [("rare", "Misunderstood / incorrect")] \
+        + [(f"good {i}", "Good answer") for i in range(9)]
+    sample = summarizer.stratified_sample(rows, 20, seed=1)
+
+    assert len(sample) == 20
+    assert "rare" in sample
+    kinds = Counter(s.split()[0] for s in sample)
+    assert kinds["great"] > kinds["good"]
+
+
+def test_stratified_sample_never_exceeds_sample_size():
+    """测试: 评级数多于样本数时，结果不超过 sample_size，保留的是最常见的评级。"""
+    rows = [(f"great {i}", "Great answer") for i in range(5)] + [(f"good {i}", "Good answer") for i in range(3)] \
+        + [("rare", "Misunderstood / incorrect"), ("odd", None)]
+    sample = summarizer.stratified_sample(rows, 2, seed=1)
+
+    assert len(sample) == 2
+    assert sorted(s.split()[0] for s in sample) == ["good", "great"]
+
+
+def test_summary_is_persisted_and_updated_incrementally(authenticated_client, db_session, monkeypatch):
+    """测试: 没有新答案时直接返回已保存的摘要；有新答案时只总结新增部分并合并。"""
+    db_session.add(Response(question="inc-summary", student_answer="First answer", ai_feedback="f"))
+    db_session.commit()
+
+    summarized, merged = [], []
+    monkeypatch.setattr(services, "get_summary_from_ai", lambda text: summarized.append(text) or f"S({text})")
+    monkeypatch.setattr(services, "update_summary_with_ai",
+                        lambda old, new, old_n, new_n: merged.append((old, new, old_n, new_n)) or "Merged")
+
+    first = authenticated_client.get('/api/get-summary?prompt_id=inc-summary').get_json()
+    assert first == {'summary': 'S(First answer)', 'cached': False}
+
+    second = authenticated_client.get('/api/get-summary?prompt_id=inc-summary').get_json()
+    assert second == {'summary': 'S(First answer)', 'cached': True}
+    assert len(summarized) == 1
+
+    db_session.add(Response(question="inc-summary", student_answer="Second answer", ai_feedback="f"))
+    db_session.commit()
+    third = authenticated_client.get('/api/get-summary?prompt_id=inc-summary').get_json()
+    assert third['summary'] == "Merged"
+    assert summarized[-1] == "Second answer"
+    assert merged == [("S(First answer)", "S(Second answer)", 1, 1)]
+
+    stored = db_session.get(PromptSummary, "inc-summary")
+    assert stored.response_count == 2
+
+    authenticated_client.post('/api/clear-problem-feedback', json={'prompt_id': 'inc-summary'})
+    assert db_session.get(PromptSummary, "inc-summary") is None